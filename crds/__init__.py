@@ -2,6 +2,8 @@ import os
 import os.path
 import sys
 import importlib
+import importlib.abc
+import importlib.util
 
 import warnings
 
@@ -44,7 +46,7 @@ from .core.heavy_client import get_context_name
 from crds.client import api
 from crds.client import get_default_context
 
-from crds.bestrefs import assign_bestrefs
+# assign_bestrefs is imported on first use by __getattr__() below.
 
 from ._version import version as __version__
 
@@ -57,17 +59,46 @@ is made more difficult by the inapplicability of namespace packages because this
 __init__ is not empty.
 
 The strategy employed here is to implement core packages normally in crds.core,
-then alias them into the top level crds namespace using importlib.import_module()
-and sys.modules to make it appear as if each core package has already been imported
-and belongs to the top level namespace.
+then alias them into the top level crds namespace so that e.g. crds.rmap is the
+same module as crds.core.rmap.   Aliased modules are only imported when they
+are first imported or accessed as attributes of crds,  so importing crds does not
+pay for the dependencies of modules the program never uses.
 '''
+_MODULE_ALIASES = {}    # { "crds.rmap" : "crds.core.rmap", ... }
+
 def _alias_subpackage_module(subpkg, modules):
     """Alias each module from `modules` of `subpkg` to appear in this
-    namespace.
+    namespace when it is first imported or accessed.
     """
     for module in modules:
-        globals()[module] = importlib.import_module(subpkg + "." + module)
-        sys.modules["crds." + module] = sys.modules[subpkg + "." + module]
+        _MODULE_ALIASES["crds." + module] = subpkg + "." + module
+
+class _AliasImporter(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Imports aliased module names like crds.rmap as their real modules."""
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname in _MODULE_ALIASES:
+            return importlib.util.spec_from_loader(fullname, self)
+        return None
+
+    def create_module(self, spec):
+        module = importlib.import_module(_MODULE_ALIASES[spec.name])
+        spec.loader_state = module.__spec__
+        return module
+
+    def exec_module(self, module):
+        module.__spec__ = module.__spec__.loader_state   # restore the real spec
+
+sys.meta_path.append(_AliasImporter())
+
+def __getattr__(name):
+    """Import aliased modules and assign_bestrefs on first access."""
+    if "crds." + name in _MODULE_ALIASES:
+        return importlib.import_module("crds." + name)
+    elif name == "assign_bestrefs":
+        from crds.bestrefs import assign_bestrefs
+        return assign_bestrefs
+    raise AttributeError("module 'crds' has no attribute " + repr(name))
 
 _CORE_MODULES = [
     "pysh",
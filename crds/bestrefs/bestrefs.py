@@ -7,15 +7,18 @@ For more details on the several modes of operations and command line parameters
 """
 import sys
 import os
-from collections import namedtuple, OrderedDict
+import pickle
+import multiprocessing
+from collections import namedtuple, OrderedDict, deque
 
 # ===================================================================
 
 import crds
 import logging
 from crds.core import log, config, utils, timestamp, cmdline, heavy_client
+from crds.core import exceptions as crexc
 from crds import diff, matches
-from . import table_effects, headers
+from . import table_effects, headers, result_store
 from crds.client import api
 
 # ===================================================================
@@ -28,6 +31,12 @@ MAX_DATE = "9999-01-01 23:59:59"
 UpdateTuple = namedtuple("UpdateTuple", ["instrument", "filekind", "old_reference", "new_reference"])
 LOGGER = logging.getLogger(__name__)
 
+# BestrefsScript inherited by forked --jobs worker processes.
+_WORKER_SCRIPT = None
+
+# Number of datasets handed to a --jobs worker process at a time.
+JOBS_CHUNK_SIZE = 32
+
 # ============================================================================
 
 
@@ -307,6 +316,12 @@ than errors as the default.
         self.datasets_since = self.args.datasets_since
 
         self.active_header = None   # new or old header last processed with bestrefs
+
+        # [(context, bestrefs or exception, log.CapturedOutput), ...] computed by --jobs workers for current dataset
+        self.precomputed_bestrefs = []
+
+        # [(header or old bestrefs or exception, log.CapturedOutput), ...] fetched by --jobs parent for current dataset
+        self.prefetched_headers = []
     def complex_init(self):
         """Complex init tasks run inside any --pdb environment,  also unfortunately --profile."""
 
@@ -536,9 +551,18 @@ than errors as the default.
         self.add_argument("-z", "--optimize-tables", action="store_true",
                           help="If set, apply row-based optimizations to screen out inconsequential table updates.")
 
+        self.add_argument("--table-verdicts", default=None, metavar="VERDICTS_JSON",
+                          help="Load and save --optimize-tables verdicts in this .json file so that later runs comparing the same references and modes skip re-examining the tables.")
+
+        self.add_argument("--result-store", action="store_true",
+                          help="Save bestrefs results in the CRDS cache and reuse them in later runs for the same context and lookup parameters.  Also enabled by CRDS_BESTREFS_RESULT_STORE=1.")
+
         self.add_argument("--eliminate-duplicate-cases", action="store_true",
                           help="Categorize unique bestrefs results as errors to determine representative test cases...  Replaces normal error counts with coverage counts and ids.")
 
+        self.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                          help="Compute bestrefs in N forked worker processes.  Results are processed in dataset order,  output is unchanged.")
+
         cmdline.UniqueErrorsMixin.add_args(self)
 
     def setup_contexts(self):
@@ -670,7 +694,10 @@ than errors as the default.
         """Compute bestrefs for datasets."""
         # Finish __init__() inside --pdb
         if self.complex_init():
-            for i, dataset in enumerate(self.new_headers):
+            if self.args.table_verdicts and os.path.exists(self.args.table_verdicts):
+                with log.error_on_exception("Failed loading table effects verdicts from", repr(self.args.table_verdicts)):
+                    table_effects.load_verdicts(self.args.table_verdicts)
+            for i, dataset in enumerate(self.iter_datasets()):
                 if i != 0 and i % 1000 == 0:
                     log.verbose(self.get_stat("datasets"), "sources processed", verbosity=5)
                 self.process(dataset)
@@ -683,6 +710,137 @@ than errors as the default.
         log.standard_status()
         return log.errors()
 
+    def iter_datasets(self):
+        """Yield the dataset ids of self.new_headers.  For --jobs N > 1,  the headers of each dataset
+        are fetched in the parent and sent to a pool of forked workers,  which inherit the loaded contexts
+        and compute its bestrefs.   The headers and bestrefs are installed in self.prefetched_headers
+        and self.precomputed_bestrefs prior to yielding it.
+
+        Iterating self.new_headers runs ahead of process() so its log output is captured and
+        replayed as each dataset is yielded,  leaving the output order identical to a serial run.
+        """
+        if self.args.jobs <= 1 or not hasattr(os, "fork"):
+            yield from self.new_headers
+            return
+        global _WORKER_SCRIPT
+        self.preload_contexts()
+        _WORKER_SCRIPT = self
+        sources = iter(self.new_headers)
+        pending = deque()   # [(async chunk result, [(dataset, iteration output, prefetched), ...]), ...]
+        try:
+            with multiprocessing.get_context("fork").Pool(self.args.jobs) as pool:
+                exhausted = False
+                while not exhausted or pending:
+                    while not exhausted and len(pending) < 2 * self.args.jobs:
+                        chunk = []
+                        while len(chunk) < JOBS_CHUNK_SIZE:
+                            with log.capture_output() as output:
+                                dataset = next(sources, None)
+                            if dataset is None:
+                                exhausted = True
+                                break
+                            chunk.append((dataset, output, self.prefetch_headers(dataset)))
+                        lookups = [(dataset, self.lookup_headers(prefetched))
+                                   for (dataset, _iteration_output, prefetched) in chunk]
+                        pending.append((pool.apply_async(_worker_precompute_bestrefs, (lookups,)), chunk))
+                    result, chunk = pending.popleft()
+                    for precomputed, (dataset, iteration_output, prefetched) in zip(result.get(), chunk):
+                        iteration_output.replay()
+                        self.prefetched_headers = prefetched
+                        self.precomputed_bestrefs = precomputed
+                        yield dataset
+        finally:
+            _WORKER_SCRIPT = None
+            self.prefetched_headers = []
+            self.precomputed_bestrefs = []
+        output.replay()   # anything issued while exhausting self.new_headers
+
+    def prefetch_headers(self, dataset):
+        """Fetch the headers _process() will request for `dataset` in the --jobs parent,  in the same
+        order,  so workers never fetch headers and _process() never refetches them.   Log output is
+        captured for replay and exceptions are returned rather than raised.
+
+        Returns [(lookup parameters or old bestrefs or exception, log.CapturedOutput), ...]
+        """
+        if dataset in self.drop_ids or (self.only_ids and dataset not in self.only_ids):
+            return []
+        fetches = [self.new_headers.get_lookup_parameters]
+        if self.compare_prior:
+            if self.args.old_context:
+                fetches.append(self.old_headers.get_lookup_parameters)
+            else:
+                fetches.append(self.old_headers.get_old_bestrefs)
+        prefetched = []
+        for fetch in fetches:
+            with log.capture_output() as output:
+                try:
+                    header = fetch(dataset)
+                except Exception as exc:
+                    header = exc
+            prefetched.append((header, output))
+        return prefetched
+
+    def lookup_headers(self, prefetched):
+        """Return the [(context, lookup parameters), ...] a worker needs to precompute the bestrefs
+        of one dataset from its `prefetched` headers,  stopping at the first failed fetch.
+        """
+        contexts = [self.new_context]
+        if self.compare_prior and self.args.old_context:
+            contexts.append(self.old_context)
+        lookups = []
+        for context, (header, _output) in zip(contexts, prefetched):
+            if isinstance(header, Exception):
+                break
+            lookups.append((context, header))
+        return lookups
+
+    def get_header(self, fetch, dataset):
+        """Return header source method `fetch` applied to `dataset`,  or the result prefetched for it
+        by the --jobs parent.
+        """
+        if self.prefetched_headers:
+            header, output = self.prefetched_headers.pop(0)
+            output.replay()
+            if isinstance(header, Exception):
+                raise header
+            return header
+        return fetch(dataset)
+
+    def preload_contexts(self):
+        """Fully load the new and old contexts so that forked workers inherit them rather than reloading.
+        Output is discarded since any failure recurs and is reported when the context is used.
+        """
+        if self.server_info.effective_mode == "remote":
+            return
+        for context in [self.new_context, self.old_context]:
+            if context is not None:
+                with log.capture_output():
+                    try:
+                        heavy_client.get_symbolic_mapping(context, cached=True).force_load()
+                    except Exception:
+                        pass
+
+    def precompute_bestrefs(self, dataset, lookups):
+        """Run in a --jobs worker process to compute the bestrefs of `dataset` for each
+        (context, lookup parameters) of `lookups` fetched by the parent,  in the order _process()
+        requests them.   Log output is captured for replay by the parent and exceptions are
+        returned rather than raised.
+
+        Returns [(context, bestrefs or exception, log.CapturedOutput), ...]
+        """
+        precomputed = []
+        if not lookups:
+            return precomputed
+        instrument = utils.header_to_instrument(lookups[0][1])
+        for context, header in lookups:
+            with log.capture_output() as output:
+                try:
+                    bestrefs = self.get_bestrefs(instrument, dataset, context, header)
+                except Exception as exc:
+                    bestrefs = _picklable_exception(exc)
+            precomputed.append((context, bestrefs, output))
+        return precomputed
+
     def process(self, dataset):
         """Process best references for `dataset`,  printing dataset output,  collecting stats, trapping exceptions."""
         with log.error_on_exception("Failed processing", repr(dataset)):
@@ -702,17 +860,17 @@ than errors as the default.
 
     def _process(self, dataset):
         """Core best references,  add to update tuples."""
-        self.active_header = new_header = self.new_headers.get_lookup_parameters(dataset)
+        self.active_header = new_header = self.get_header(self.new_headers.get_lookup_parameters, dataset)
         instrument = utils.header_to_instrument(new_header)
         self.warn_bad_context("New-context", self.new_context, instrument)
         new_bestrefs = self.get_bestrefs(instrument, dataset, self.new_context, new_header)
         if self.compare_prior:
             self.warn_bad_context("Old-context", self.old_context, instrument)
             if self.args.old_context:
-                self.active_header = old_header = self.old_headers.get_lookup_parameters(dataset)
+                self.active_header = old_header = self.get_header(self.old_headers.get_lookup_parameters, dataset)
                 old_bestrefs = self.get_bestrefs(instrument, dataset, self.old_context, old_header)
             else:
-                old_bestrefs = self.old_headers.get_old_bestrefs(dataset)
+                old_bestrefs = self.get_header(self.old_headers.get_old_bestrefs, dataset)
             updates, kill_list = self._compare_bestrefs(instrument, dataset, old_bestrefs, new_bestrefs)
             if self.args.optimize_tables:
                 updates = self.optimize_tables(dataset, updates)
@@ -727,16 +885,36 @@ than errors as the default.
 
     def get_bestrefs(self, instrument, dataset, context, header):
         """Compute the bestrefs for `dataset` with respect to loaded mapping/context `ctx`."""
+        if self.precomputed_bestrefs and self.precomputed_bestrefs[0][0] == context:
+            _context, bestrefs, output = self.precomputed_bestrefs.pop(0)
+            output.replay()
+            if isinstance(bestrefs, Exception):
+                raise bestrefs
+            return bestrefs
         with log.augment_exception("Failed determining reference types for", repr(dataset),
                                    "with respect to", (instrument, context, header)):
             reftypes = self.determine_reftypes(instrument, dataset, context, header)
             if reftypes is None:
                 return {}
+        store = result_store.get_result_store(self.args.result_store or None)
+        stored_key = None
+        if store is not None:
+            with log.verbose_warning_on_exception("Failed checking stored bestrefs for", repr(dataset)):
+                stored_context = result_store.context_identity(context)
+                stored_key = result_store.parameters_key(
+                    result_store.reduce_parameters(context, header, self.observatory), reftypes)
+                bestrefs = store.get(stored_context, instrument, stored_key)
+                if bestrefs is not None:
+                    return bestrefs
         with log.augment_exception("Failed computing bestrefs for data", repr(dataset),
                                    "with respect to", repr(context)):
             bestrefs = crds.getrecommendations(
                 header, reftypes=reftypes, context=context, observatory=self.observatory, fast=log.get_verbose() < 50)
-        return {key.upper(): value for (key, value) in bestrefs.items()}
+        bestrefs = {key.upper(): value for (key, value) in bestrefs.items()}
+        if stored_key is not None:
+            with log.verbose_warning_on_exception("Failed storing bestrefs for", repr(dataset)):
+                store.put(stored_context, instrument, stored_key, bestrefs)
+        return bestrefs
 
     def determine_reftypes(self, instrument, dataset, context, header):
         """Based on instrument, context, header as well as command line parameters determine the list
@@ -812,8 +990,9 @@ than errors as the default.
             new_ok, new = self.handle_na_and_not_found("New:", newrefs, dataset, instrument, filekind)
             update = UpdateTuple(instrument, filekind, None, new)
             if new_ok or self.args.update_pickle or self.args.eliminate_duplicate_cases:
-                self.verbose_with_prefix(dataset, instrument, filekind,
-                    "Bestref FOUND:", repr(new).lower(),  self.update_promise, verbosity=30)
+                if log.enabled(30):
+                    self.verbose_with_prefix(dataset, instrument, filekind,
+                        "Bestref FOUND:", repr(new).lower(),  self.update_promise, verbosity=30)
                 updates.append(update)
             else:  # ERROR's cannot update
                 kill_list.append(update)
@@ -864,7 +1043,7 @@ than errors as the default.
                     log.info(self.format_prefix(dataset, instrument, filekind),
                              "New best reference:", sreprlow(old), "-->", sreprlow(new), self.update_promise)
                 updates.append(update)
-            else:
+            elif log.enabled(30):
                 self.verbose_with_prefix(dataset, instrument, filekind,
                     "Lookup MATCHES:", sreprlow(old), self.no_update,  verbosity=30)
         return updates, kill_list
@@ -920,6 +1099,10 @@ than errors as the default.
         if self.args.save_pickle:
             self.new_headers.save_pickle(self.args.save_pickle, only_ids=self.only_ids)
 
+        if self.args.table_verdicts:
+            with log.error_on_exception("Failed saving table effects verdicts to", repr(self.args.table_verdicts)):
+                table_effects.save_verdicts(self.args.table_verdicts)
+
         self.warn_bad_updates()  # Warn about bad file reference updates only, not failures
 
         if self.args.print_new_references:
@@ -1041,6 +1224,22 @@ than errors as the default.
 
 # ============================================================================
 
+def _worker_precompute_bestrefs(lookups):
+    """Pool function computing bestrefs for a chunk of [(dataset, [(context, lookup parameters), ...]), ...]
+    in a --jobs worker process.
+    """
+    return [_WORKER_SCRIPT.precompute_bestrefs(dataset, dataset_lookups) for (dataset, dataset_lookups) in lookups]
+
+def _picklable_exception(exc):
+    """Return `exc` if it survives transfer to the parent process,  otherwise a CrdsError
+    with the same message.
+    """
+    try:
+        pickle.loads(pickle.dumps(exc))
+    except Exception:
+        return crexc.CrdsError(str(exc))
+    return exc
+
 def sreprlow(s):
     """Squash unicode and return the repr() of string `s` as lower case."""
     return repr(str(s)).lower()
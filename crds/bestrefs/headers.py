@@ -5,6 +5,7 @@ For more details on the several modes of operations and command line parameters
 
 % crds bestrefs --help
 """
+import os
 import json
 import gc
 
@@ -211,7 +212,7 @@ class DatasetHeaderGenerator(HeaderGenerator):
         super(DatasetHeaderGenerator, self).__init__(context, datasets, datasets_since)
         server = api.get_crds_server()
         log.info("Dumping dataset parameters from CRDS server at", repr(server), "for", repr(datasets))
-        self.headers = api.get_dataset_headers_by_id(context, datasets)
+        self.headers = dict(api.get_dataset_headers_unlimited(context, datasets))
         log.info("Dumped", len(self.headers), "of", len(datasets), "datasets from CRDS server at", repr(server))
 
         # every command line id should correspond to 1 or more headers
@@ -268,6 +269,9 @@ class InstrumentHeaderGenerator(HeaderGenerator):
             self.segment_size = server_info.max_headers_per_rpc
         except Exception:
             self.segment_size = 5000
+        # { pid : [next segment index, api.get_dataset_header_segments() generator] }
+        self._segment_streams = {}
+        self._pid = os.getpid()
 
     def determine_source_ids(self):
         """Return the dataset ids for all instruments."""
@@ -304,13 +308,30 @@ class InstrumentHeaderGenerator(HeaderGenerator):
         segment_ids = self.sources[lower:upper]
         log.verbose("Dumping", len(segment_ids), "datasets from indices", lower, "to",
                     lower + len(segment_ids), verbosity=20)
-        dumped_headers = api.get_dataset_headers_by_id(self.context, segment_ids)
+        dumped_headers = self.next_segment(index)
         log.verbose("Dumped", len(dumped_headers), "datasets", verbosity=20)
         if self.save_pickles:  # keep all headers,  causes memory problems with multiple instruments on ~8G ram.
             self.headers.update(dumped_headers)
         else:  # conserve memory by keeping only the last N headers
             self.headers = dumped_headers
 
+    def next_segment(self, index):
+        """Return the headers of segment `index` of self.sources.   Segments are generated by a
+        stream which keeps CRDS_HEADER_RPC_WORKERS segment RPCs in flight ahead of the one being
+        processed,  restarted whenever `index` is not the next segment it generates.
+
+        Each process has its own stream since threads do not survive fork().   Forked
+        processes fetch their segments serially on demand rather than prefetching.
+        """
+        pid = os.getpid()
+        stream = self._segment_streams.get(pid)
+        if stream is None or stream[0] != index:
+            workers = None if pid == self._pid else 0
+            stream = self._segment_streams[pid] = [index, api.get_dataset_header_segments(
+                self.context, self.sources[index * self.segment_size:], self.segment_size, workers)]
+        stream[0] += 1
+        return next(stream[1])
+
 
 class PickleHeaderGenerator(HeaderGenerator):
     """Generates lookup parameters and historical best references from a list of pickle files (or .json files)
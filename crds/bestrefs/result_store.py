@@ -0,0 +1,148 @@
+"""This module defines the on-disk bestrefs result store optionally used by
+crds.bestrefs to skip re-evaluating lookups already computed by an earlier run,
+e.g. when each run of a nightly reprocessing chain compares the prior run's
+new context to a newer one.
+
+Results are stored in an sqlite3 database keyed on context identity,  instrument,
+and a hash of the reduced lookup parameters and requested reference types,  and
+map each reference type to its best reference.   Since contexts may be unnumbered
+names or local paths of edited mappings,  a context's identity includes the path,
+size,  and modification time of every mapping file it loads so results are only
+reused while all of those files are unchanged.   Only successful lookups are
+stored so failures are recomputed and reported by every run.
+"""
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+
+from crds.core import config, log, utils, rmap, heavy_client
+
+# ===================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bestrefs (
+    context TEXT NOT NULL,
+    instrument TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    bestrefs TEXT NOT NULL,
+    PRIMARY KEY (context, instrument, parameters)
+);
+"""
+
+@utils.cached
+def context_identity(context):
+    """Return the basename of `context` qualified by a hash of the path,  size,  and
+    modification time of each mapping file it loads.
+    """
+    mapping = heavy_client.get_symbolic_mapping(context, cached=True)
+    stats = []
+    for path in _mapping_paths(mapping):
+        path = os.path.abspath(config.locate_mapping(path, mapping.observatory))
+        stat = os.stat(path)
+        stats.append((path, stat.st_size, stat.st_mtime_ns))
+    return os.path.basename(context) + "@" + hashlib.sha1(repr(sorted(stats)).encode("utf-8")).hexdigest()
+
+def _mapping_paths(mapping):
+    """Return the paths of loaded `mapping` and all mappings nested under it."""
+    paths = [mapping.filename]
+    if isinstance(mapping, rmap.ContextMapping):
+        for nested in mapping.selections.normal_values():
+            paths.extend(_mapping_paths(nested))
+    return paths
+
+def reduce_parameters(context, header, observatory):
+    """Return only those items of `header` which determine its bestrefs under
+    `context`,  conditioned and minimized as a local lookup would do.
+    """
+    if observatory == "roman":
+        header = utils.get_locator_module(observatory).dataset_to_ref_header(header)
+    mapping = heavy_client.get_symbolic_mapping(context, cached=True)
+    return mapping.minimize_header(utils.condition_header(header))
+
+def parameters_key(parameters, reftypes):
+    """Return a hash of reduced lookup `parameters` and requested `reftypes`.
+
+    >>> parameters_key({"DETECTOR": "WFC", "INSTRUME": "ACS"}, ["biasfile"])
+    'f26a94e993675b3908d1c40206d69f605d7e29db'
+    >>> parameters_key({"INSTRUME": "ACS", "DETECTOR": "WFC"}, ["biasfile"])
+    'f26a94e993675b3908d1c40206d69f605d7e29db'
+    >>> parameters_key({"INSTRUME": "ACS", "DETECTOR": "HRC"}, ["biasfile"])
+    '35da7aa1b2d1959e7253f0f14c326b1b609bdbb9'
+    """
+    text = repr((sorted((str(key), str(value)) for (key, value) in parameters.items()),
+                 None if reftypes is None else sorted(reftypes)))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class BestrefsResultStore:
+    """An sqlite3 database of bestrefs results keyed on context identity,  instrument,
+    and a hash of reduced lookup parameters and reference types.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr(self.path) + ")"
+
+    def get(self, context, instrument, key):
+        """Return the stored { reftype : bestref } of parameters hash `key` under
+        context identity `context`,  or None if there is none.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT bestrefs FROM bestrefs WHERE context = ? AND instrument = ? AND parameters = ?",
+                (context, instrument.lower(), key)).fetchone()
+        if row is None:
+            return None
+        if log.enabled(60):
+            log.verbose("Using stored bestrefs for", repr(key), "under", repr(context), verbosity=60)
+        return json.loads(row[0])
+
+    def put(self, context, instrument, key, bestrefs):
+        """Store { reftype : bestref } `bestrefs` of parameters hash `key` under context identity `context`."""
+        row = (context, instrument.lower(), key, json.dumps(bestrefs, sort_keys=True))
+        with self._lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO bestrefs VALUES (?, ?, ?, ?)", row)
+
+    def clear(self):
+        """Remove all stored results."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM bestrefs")
+
+@utils.cached
+def _open_result_store(path, pid):
+    """Return the BestrefsResultStore at `path` for process `pid`,  or None if it
+    cannot be opened.   Forked --jobs workers each open their own connection.
+    """
+    try:
+        utils.ensure_dir_exists(path)
+        return BestrefsResultStore(path)
+    except (OSError, sqlite3.Error) as exc:
+        log.verbose_warning("Can't open bestrefs result store", repr(path), ":", str(exc))
+        return None
+
+def get_result_store(enabled=None):
+    """Return the BestrefsResultStore defined by CRDS_BESTREFS_RESULT_STORE,  or None
+    if it is disabled or the CRDS cache is readonly.   `enabled` overrides the
+    configuration when not None.
+    """
+    if enabled is None:
+        enabled = config.BESTREFS_RESULT_STORE.get()
+    if not enabled or config.get_cache_readonly():
+        return None
+    return _open_result_store(config.get_bestrefs_result_store_path(), os.getpid())
+
+# ===================================================================
+
+def test():
+    import doctest
+    from crds.bestrefs import result_store
+    return doctest.testmod(result_store)
+
+if __name__ == "__main__":
+    print(test())
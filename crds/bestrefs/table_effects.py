@@ -9,7 +9,12 @@ a dataset to be processed.
 
 If the rows are different,  then the dataset should be reprocessed.
 """
-from crds.core import rmap, log
+import os.path
+import json
+
+import numpy as np
+
+from crds.core import rmap, log, utils
 from crds.io import tables
 from crds.client import api
 
@@ -99,8 +104,9 @@ def is_reprocessing_required(dataset,  dataset_parameters, old_context, new_cont
             dataset_parameters = deep_look.stub_input[dataset_id]['headers']
             log.verbose_warning('headers = ', dataset_parameters, verbosity=25)
 
-        log.verbose(deep_look.preamble, 'Dataset headers = {}'.format(dataset_parameters), verbosity=75)
-        log.verbose(deep_look.preamble, 'Comparing references {} and {}.'.format(old_reference, new_reference), verbosity=75)
+        if log.enabled(75):
+            log.verbose(deep_look.preamble, 'Dataset headers = {}'.format(dataset_parameters), verbosity=75)
+            log.verbose(deep_look.preamble, 'Comparing references {} and {}.'.format(old_reference, new_reference), verbosity=75)
         deep_look.are_different(dataset_parameters, old_reference, new_reference)
 
         log.verbose(deep_look.preamble, 'Reprocessing is {}required.'.format('' if deep_look.is_different else 'not '), verbosity=25)
@@ -154,16 +160,20 @@ def mode_select(table, constraints):
     Returns
     -------
     The next row that matches.
-    """
-    for row in table.rows:
-        selected = True
-        for field in constraints:
-            field_index = table.colnames.index(field.upper())
-            (value, cmpfn, args) = constraints[field]
-            selected = selected & cmpfn(str_to_number(row[field_index]), value, args)
 
-        if selected:
-            yield row
+    Each cmpfn is evaluated once per distinct value of its field rather than once
+    per row,  using the row groupings cached by `table`,  and the results for all
+    fields are combined as boolean row masks.
+    """
+    selected = np.ones(table.nrows, dtype=bool)
+    for field in constraints:
+        (value, cmpfn, args) = constraints[field]
+        column_values, inverse = table.column_groups(field)
+        matches = np.array([bool(cmpfn(str_to_number(column_value), value, args))
+                            for column_value in column_values], dtype=bool)
+        selected &= matches[inverse]
+    for index in np.flatnonzero(selected):
+        yield table.row(index)
 
 def mode_equality(modes_a, modes_b):
     """Check if the modes are equal"""
@@ -227,6 +237,39 @@ def cmp_equal(table_value, matching_values, wildcards=()):
 
 
 
+# ##############################
+#
+# DeepLook verdicts
+#
+###############################
+
+# { (rule name, old reference, new reference, constraint values repr) : (is_different, message), ... }
+#
+# Because CRDS reference files never change once named,  a verdict remains valid
+# for any pair of contexts and any dataset with the same mode values.
+_VERDICTS = {}
+
+def clear_verdicts():
+    """Forget all DeepLook verdicts cached so far."""
+    _VERDICTS.clear()
+
+def load_verdicts(path):
+    """Add the DeepLook verdicts saved in the JSON file at `path` to the verdict cache."""
+    with open(path) as handle:
+        saved = json.load(handle)
+    for (rule, old_reference, new_reference, constraints, is_different, message) in saved:
+        _VERDICTS[(rule, old_reference, new_reference, constraints)] = (is_different, message)
+    log.verbose("Loaded", len(saved), "table effects verdicts from", repr(path))
+
+def save_verdicts(path):
+    """Save all cached DeepLook verdicts as JSON to the file at `path`."""
+    utils.ensure_dir_exists(path)
+    verdicts = [list(key) + list(verdict) for (key, verdict) in sorted(_VERDICTS.items())]
+    with open(path, "w+") as handle:
+        json.dump(verdicts, handle, indent=1)
+    log.verbose("Saved", len(verdicts), "table effects verdicts to", repr(path))
+
+
 # ##############################
 #
 # DeepLook
@@ -322,6 +365,21 @@ class DeepLook:
                 if constraint_values[key] in self.metavalues[key]:
                     constraint_values[key] = self.metavalues[key][constraint_values[key]]
 
+        # The verdict depends only on the rule, the references, and the constraint values.
+        verdict_key = (self.__class__.__name__, os.path.basename(old_reference), os.path.basename(new_reference),
+                       repr(sorted(constraint_values.items())))
+        if verdict_key in _VERDICTS:
+            self.is_different, self.message = _VERDICTS[verdict_key]
+            log.verbose(self.preamble, 'Reusing verdict for constraints', verdict_key[-1], verbosity=75)
+            return
+
+        self.compare_tables(constraint_values, old_reference, new_reference)
+        _VERDICTS[verdict_key] = (self.is_different, self.message)
+
+    def compare_tables(self, constraint_values, old_reference, new_reference):
+        """Compare the rows of `old_reference` and `new_reference` selected by
+        `constraint_values` and set self.is_different and self.message.
+        """
         # Read the references
         data_old = tables.tables(old_reference)[0]   # XXXX currently limited to FITS extension 1
         data_new = tables.tables(new_reference)[0]
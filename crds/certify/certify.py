@@ -5,7 +5,6 @@ they have legal values.    It is also used to verify that CRDS mapping files are
 consistent with outside systems.
 """
 import os
-from collections import defaultdict
 import gc
 import uuid
 import re
@@ -434,27 +433,54 @@ class ReferenceCertifier(Certifier):
             log.verbose("Old sample:", repr(old_sample))
             log.verbose("New sample:", repr(new_sample))
             return
+        changed = self.changed_modes(old_table, new_table, old_modes, new_modes)
+        verbose = log.enabled(60)
         for mode in sorted(old_modes):
             if mode not in new_modes:
                 log.warning("Table mode", mode, "from old reference", repr(old_reference_ex),
                             "is NOT IN new reference", repr(new_reference_ex))
-                log.verbose("Old:", repr(old_modes[mode]), verbosity=60)
+                if verbose:
+                    log.verbose("Old:", repr(old_modes[mode]), verbosity=60)
                 continue
             # modes[mode][0] is row_no,  modes[mode][1] is row value
-            diffs = self.compare_row_values(mode, old_modes[mode][1], new_modes[mode][1])
-            if not diffs:
-                log.verbose("Mode", mode, "of", repr(new_reference_ex),
-                            "has same values as", repr(old_reference_ex),  verbosity=60)
+            if not changed[mode]:
+                if verbose:
+                    log.verbose("Mode", mode, "of", repr(new_reference_ex),
+                                "has same values as", repr(old_reference_ex),  verbosity=60)
             else:
                 log.verbose("Mode change", mode, "between", repr(old_reference_ex), "and",
                             repr(new_reference_ex))
-                log.verbose("Old:", repr(old_modes[mode]), verbosity=60)
-                log.verbose("New:", repr(new_modes[mode]), verbosity=60)
+                if verbose:
+                    log.verbose("Old:", repr(old_modes[mode]), verbosity=60)
+                    log.verbose("New:", repr(new_modes[mode]), verbosity=60)
         for mode in sorted(new_modes):
             if mode not in old_modes:
                 log.info("Table mode", mode, "of new reference", repr(new_reference_ex),
                          "is NOT IN old reference", repr(old_table.basename))
-                log.verbose("New:", repr(new_modes[mode]), verbosity=60)
+                if verbose:
+                    log.verbose("New:", repr(new_modes[mode]), verbosity=60)
+
+    def changed_modes(self, old_table, new_table, old_modes, new_modes):
+        """Return { mode : changed, ... } for each mode common to `old_modes` and `new_modes`,
+        the table_mode_dictionary() results for `old_table` and `new_table`.   Rows are compared
+        one column at a time over all common modes,  falling back to compare_row_values()
+        for columns which can't be compared as arrays.
+        """
+        common = [mode for mode in old_modes if mode in new_modes]
+        old_rows = np.array([old_modes[mode][0] for mode in common], dtype=int)
+        new_rows = np.array([new_modes[mode][0] for mode in common], dtype=int)
+        changed = np.zeros(len(common), dtype=bool)
+        for name in old_table.colnames:
+            if name not in new_table.columns:
+                break
+            different = differing_rows(old_table.columns[name][old_rows], new_table.columns[name][new_rows])
+            if different is None:
+                break
+            changed |= different
+        else:
+            return dict(zip(common, changed.tolist()))
+        return { mode : bool(self.compare_row_values(mode, old_modes[mode][1], new_modes[mode][1]))
+                 for mode in common }
 
     def compare_row_values(self, mode, old_row, new_row):
         """Compare key value tuple list `old_row` to `new_row` for key value tuple list `mode`.
@@ -544,38 +570,105 @@ def table_mode_dictionary(generic_name, tab, mode_keys):
     log.info("Mode columns defined by spec for", generic_name, basename, "are:", repr(mode_keys))
     log.info("All column names for this table", generic_name, basename, "are:", repr(all_cols))
     log.info("Checking for duplicate modes using intersection", sorted(list(set(mode_keys)&set(all_cols))))
-    modes = defaultdict(list)
-    for i, row in enumerate(tab.rows):
-        new_row = tuple(zip(all_cols, (handle_nan(v) for v in row)))
-        rowdict = dict(new_row)
-        # Table row keys can vary by extension.  Have CRDS support a simple model of using
-        # whichever mode_keys are present in a given row.
-        mode = tuple((key, rowdict[key]) for key in mode_keys if key in rowdict)
-        if not mode:
-            log.info("Empty actual mode in", generic_name, basename, "with candidate mode columns", mode_keys)
-            return {}, []
-        modes[mode].append((i, new_row))
+    if not tab.nrows:
+        return {}, all_cols
+    # Table row keys can vary by extension.  Have CRDS support a simple model of using
+    # whichever mode_keys are present in a given table.
+    mode_cols = [key for key in mode_keys if key in all_cols]
+    if not mode_cols:
+        log.info("Empty actual mode in", generic_name, basename, "with candidate mode columns", mode_keys)
+        return {}, []
+    modes = table_mode_rows(tab, all_cols, mode_cols)
+    nan_rows = table_nan_rows(tab)
+    rows = tab.rows
+    def row_values(row_no):
+        row = rows[row_no]
+        if nan_rows[row_no]:
+            row = (handle_nan(v) for v in row)
+        return tuple(zip(all_cols, row))
     for mode in sorted(modes.keys()):
         if len(modes[mode]) > 1:
             log.warning("Duplicate definitions in", generic_name, basename, "for mode:", mode, ":\n",
-                        "\n".join([repr(row) for row in modes[mode]]))
+                        "\n".join([repr((i, row_values(i))) for i in modes[mode]]))
     # modes[mode][0] is first instance of multiply defined mode.
-    return { mode:modes[mode][0] for mode in modes }, all_cols
+    return { mode:(modes[mode][0], row_values(modes[mode][0])) for mode in modes }, all_cols
+
+def table_mode_rows(tab, all_cols, mode_cols):
+    """Return { ((mode_col, mode_val), ...) : [row_no, ...], ... } for crds.tables `tab`
+    ordered by first row,  grouping rows on the distinct values of each of `mode_cols`
+    with np.unique rather than row-by-row.
+    """
+    codes = [tab.column_groups(key)[1] for key in mode_cols]
+    if len(codes) == 1:
+        inverse = codes[0]
+    else:
+        inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)[1].reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    counts = np.bincount(inverse)
+    starts = np.cumsum(counts) - counts
+    firsts = order[starts]
+    columns = [len(all_cols) - 1 - all_cols[::-1].index(key) for key in mode_cols]  # last column of a name
+    rows = tab.rows
+    modes = {}
+    for group in np.argsort(firsts).tolist():
+        first = int(firsts[group])
+        if counts[group] > 1:
+            group_rows = order[starts[group] : starts[group] + counts[group]].tolist()
+        else:
+            group_rows = [first]
+        row = rows[first]
+        mode = tuple((key, handle_nan(row[column])) for (key, column) in zip(mode_cols, columns))
+        if mode in modes:   # distinct cells with equal values,  e.g. padded strings
+            modes[mode] = sorted(modes[mode] + group_rows)
+        else:
+            modes[mode] = group_rows
+    return modes
+
+def table_nan_rows(tab):
+    """Return a boolean array which is True for each row of `tab` which may contain
+    a value handle_nan() would change.
+    """
+    nan_rows = np.zeros(tab.nrows, dtype=bool)
+    for column in tab.columns.values():
+        if column.dtype.kind == "O":
+            nan_rows[:] = True
+        elif column.ndim == 1 and column.dtype.type in NAN_FLOATS:
+            nan_rows |= np.isnan(column)
+    return nan_rows
+
+try:
+    NAN_FLOATS = (np.float32, np.float64, np.float128)
+except AttributeError:
+    NAN_FLOATS = (np.float32, np.float64)
 
 def handle_nan(var):
     """Map nan values to 'nan' so that 'nan' == 'nan'."""
-    try:
-        from numpy import float128
-        floats = (np.float32, np.float64, np.float128)
-    except ImportError:
-        floats = (np.float32, np.float64)
-    if isinstance(var, floats) and np.isnan(var):
+    if isinstance(var, NAN_FLOATS) and np.isnan(var):
         return 'nan'
     elif isinstance(var, np.ndarray) and var.shape == () and np.any(np.isnan(var)):
         return 'nan'
     else:
         return var
 
+def differing_rows(old_column, new_column):
+    """Given equal length column arrays `old_column` and `new_column` return a boolean array
+    which is True where old and new row values differ as judged by compare_row_values(),
+    or None if the columns can't be compared as arrays.
+    """
+    kinds = {old_column.dtype.kind, new_column.dtype.kind}
+    if not (kinds <= set("biuf") or kinds <= set("US")):
+        return None
+    if isinstance(old_column, np.ma.MaskedArray) or isinstance(new_column, np.ma.MaskedArray):
+        return None
+    if old_column.shape[1:] != new_column.shape[1:]:
+        return None
+    different = np.asarray(old_column != new_column)
+    if different.ndim > 1:
+        different = different.reshape(len(different), -1).any(axis=1)
+    elif old_column.dtype.type in NAN_FLOATS and new_column.dtype.type in NAN_FLOATS:
+        different &= ~(np.isnan(old_column) & np.isnan(new_column))
+    return different
+
 # ============================================================================
 
 class FitsCertifier(ReferenceCertifier):
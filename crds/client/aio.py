@@ -0,0 +1,175 @@
+"""This module defines asyncio versions of the CRDS client best references and
+file caching functions for use by event loop based programs, e.g.:
+
+    >>> import asyncio
+    >>> from crds.client import aio
+    >>> bestrefs = asyncio.run(aio.getreferences(header, context="jwst_1140.pmap"))  # doctest: +SKIP
+
+The blocking service calls and downloads of every event loop in the process are
+run by one shared pool of CRDS_AIO_WORKERS threads,  each of which keeps its own
+connection to the server alive between calls.   Concurrent requests for the same
+file share a single download,  which is located and verified by crds.client.api
+exactly as a synchronous download would be.
+"""
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from crds.core import config, log, utils, heavy_client
+
+from . import api
+
+# ==============================================================================
+
+__all__ = [
+    "get_best_references",
+    "get_best_references_by_header_map",
+    "get_file_info_map",
+    "getrecommendations",
+    "getreferences",
+    "cache_references",
+    "FileCacher",
+]
+
+# ==============================================================================
+
+_LOCK = threading.Lock()
+
+# (pid, ThreadPoolExecutor) shared by all event loops of process pid.
+_EXECUTOR = None
+
+# { localpath : concurrent.futures.Future }  for downloads in progress.
+_DOWNLOADS = {}
+
+def _get_executor():
+    """Return the worker thread pool of the calling process,  creating it if needed."""
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None or _EXECUTOR[0] != os.getpid():   # threads don't survive fork()
+            _DOWNLOADS.clear()
+            _EXECUTOR = (os.getpid(), ThreadPoolExecutor(
+                config.get_aio_workers(), thread_name_prefix="crds-aio"))
+        return _EXECUTOR[1]
+
+async def _run(func, *args, **keys):
+    """Return the result of blocking call func(*args, **keys) run in a worker thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **keys))
+
+# ==============================================================================
+
+async def get_best_references(pipeline_context, header, reftypes=None):
+    """Async version of api.get_best_references()."""
+    return await _run(api.get_best_references, pipeline_context, header, reftypes=reftypes)
+
+async def get_best_references_by_header_map(context, header_map, reftypes=None):
+    """Async version of api.get_best_references_by_header_map()."""
+    return await _run(api.get_best_references_by_header_map, context, header_map, reftypes=reftypes)
+
+async def get_file_info_map(observatory, files=None, fields=None):
+    """Async version of api.get_file_info_map()."""
+    return await _run(api.get_file_info_map, observatory, files=files, fields=fields)
+
+async def getrecommendations(parameters, reftypes=None, context=None, ignore_cache=False,
+                             observatory="jwst", fast=False):
+    """Async version of crds.getrecommendations()."""
+    return await _run(heavy_client.getrecommendations, parameters, reftypes=reftypes, context=context,
+                      ignore_cache=ignore_cache, observatory=observatory, fast=fast)
+
+async def getreferences(parameters, reftypes=None, context=None, ignore_cache=False,
+                        observatory="jwst", fast=False):
+    """Async version of crds.getreferences(),  returning { reftype : cached_bestref_path }."""
+    final_context, bestrefs = await _run(
+        heavy_client._initial_recommendations, "getreferences",
+        parameters, reftypes, context, ignore_cache, observatory, fast)
+    return await cache_references(final_context, bestrefs, ignore_cache=ignore_cache)
+
+async def cache_references(pipeline_context, bestrefs, ignore_cache=False):
+    """Async version of api.cache_references()."""
+    wanted = api._get_cache_filelist_and_report_errors(bestrefs)
+    if config.S3_RETURN_URI:
+        localrefs = {name: api.get_flex_uri(name) for name in wanted}
+    else:
+        cacher = FileCacher(pipeline_context, ignore_cache, raise_exceptions=False)
+        localrefs = (await cacher.get_local_files(wanted))[0]
+    return api._squash_unicode_in_bestrefs(bestrefs, localrefs)
+
+# ==============================================================================
+
+class FileCacher:
+    """Async version of api.FileCacher which shares each download with all
+    concurrent requests for the same file.
+    """
+    def __init__(self, pipeline_context, ignore_cache=False, raise_exceptions=True):
+        self.cacher = api.FileCacher(pipeline_context, ignore_cache, raise_exceptions)
+
+    async def get_local_files(self, names):
+        """Cache files `names` pertinent to the pipeline context locally.
+
+        Returns ({ name : localpath }, files downloaded,  bytes downloaded)
+        """
+        if isinstance(names, dict):
+            names = names.values()
+        localpaths = {}
+        fetches = []
+        for name in self.cacher.with_conjugates(names):
+            if name.lower() in ["n/a", "undefined"]:
+                continue
+            localpaths[name] = localpath = self.cacher.locate(name)
+            if self.cacher.ignore_cache or not os.path.exists(localpath):
+                fetches.append(self._fetch(name, localpath))
+        if not fetches:
+            log.verbose("Skipping download for cached files", sorted(localpaths), verbosity=60)
+            return localpaths, 0, 0
+        results = await asyncio.gather(*fetches)
+        downloads = sum(started for (started, _n_bytes) in results)
+        return localpaths, downloads, sum(n_bytes for (_started, n_bytes) in results)
+
+    async def _fetch(self, name, localpath):
+        """Download `name` to `localpath` or wait for the download already in progress.
+
+        Returns (True if this call started the download,  bytes downloaded)
+        """
+        executor = _get_executor()
+        with _LOCK:
+            future = _DOWNLOADS.get(localpath)
+            started = future is None
+            if started:
+                future = _DOWNLOADS[localpath] = executor.submit(self._download, name, localpath)
+        if started:
+            future.add_done_callback(functools.partial(_forget_download, localpath))
+        try:   # cancelling one request doesn't cancel the download shared with others
+            n_bytes = await asyncio.shield(asyncio.wrap_future(future))
+        except Exception as exc:
+            if self.cacher.raise_exceptions:
+                raise
+            log.error("Failure downloading file", repr(name), ":", str(exc))
+            n_bytes = 0
+        return started, n_bytes if started else 0
+
+    def _download(self, name, localpath):
+        """Download `name` to `localpath` in a worker thread,  raising any failure to every
+        waiting request.   Returns bytes downloaded.
+        """
+        cacher = api.FileCacher(self.cacher.pipeline_context, self.cacher.ignore_cache, raise_exceptions=True)
+        if cacher.ignore_cache and os.path.exists(localpath):
+            utils.remove(localpath, observatory=cacher.observatory)
+        return cacher.download_files([name], {name: localpath})
+
+def _forget_download(localpath, future):
+    """Drop the finished download `future` of `localpath` so later requests re-check the cache."""
+    with _LOCK:
+        if _DOWNLOADS.get(localpath) is future:
+            del _DOWNLOADS[localpath]
+
+# ==============================================================================
+
+def test():
+    import doctest
+    from crds.client import aio
+    return doctest.testmod(aio)
+
+if __name__ == "__main__":
+    print(test())
@@ -5,13 +5,16 @@ cache them locally.
 import os
 import os.path
 import base64
+import hashlib
 import re
 import zlib
 import html
-from urllib import request
 import warnings
 import json
 import ast
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # ==============================================================================
 
@@ -28,6 +31,8 @@ from crds.core.exceptions import CrdsRemoteContextError
 from . import proxy
 from .proxy import CheckingProxy
 
+request = utils.LazyModule("urllib.request")    # deferred,  slow import
+
 # ==============================================================================
 
 __all__ = [
@@ -40,6 +45,7 @@ __all__ = [
 
     "set_crds_server",
     "get_crds_server",
+    "call_batch",
 
     "list_mappings",
     "list_references",
@@ -51,7 +57,9 @@ __all__ = [
     "get_sqlite_db",
 
     "get_mapping_names",
+    "get_mapping_names_map",
     "get_reference_names",
+    "get_reference_names_map",
 
     "dump_references",
     "dump_mappings",
@@ -108,6 +116,12 @@ def get_crds_server():
         log.warning("CRDS_SERVER_URL does not start with https://  ::", url)
     return url
 
+def call_batch(calls):
+    """Issue JSONRPC `calls`,  [(method name, params), ...],  to the CRDS server in one
+    round trip if it supports JSON-RPC 2.0 batches.   Returns the results in order.
+    """
+    return S._batch(calls)
+
 # =============================================================================
 
 @utils.cached
@@ -146,6 +160,14 @@ def get_mapping_names(pipeline_context):
     """
     return [str(x) for x in S.get_mapping_names(pipeline_context)]
 
+def get_mapping_names_map(pipeline_contexts):
+    """Return { context : [mapping basename, ...] } for each of `pipeline_contexts`,
+    issuing the get_mapping_names() calls in one JSONRPC batch.
+    """
+    contexts = list(pipeline_contexts)
+    results = call_batch([("get_mapping_names", (context,)) for context in contexts])
+    return {context : [str(x) for x in names] for (context, names) in zip(contexts, results)}
+
 def get_reference_url(pipeline_context, reference):
     """Returns a URL for the specified reference file.    DEPRECATED
     """
@@ -248,6 +270,14 @@ def get_reference_names(pipeline_context):
     """
     return [str(x) for x in S.get_reference_names(pipeline_context)]
 
+def get_reference_names_map(pipeline_contexts):
+    """Return { context : [reference basename, ...] } for each of `pipeline_contexts`,
+    issuing the get_reference_names() calls in one JSONRPC batch.
+    """
+    contexts = list(pipeline_contexts)
+    results = call_batch([("get_reference_names", (context,)) for context in contexts])
+    return {context : [str(x) for x in names] for (context, names) in zip(contexts, results)}
+
 def get_best_references(pipeline_context, header, reftypes=None):
     """Get best references for dict-like `header` relative to
     `pipeline_context`.
@@ -433,13 +463,40 @@ def get_dataset_headers_unlimited(context, ids):
      If there is a failure fetching parameters for dataset_id,
     `header` will be returned as a string / error message.
     """
-    max_ids_per_rpc = get_server_info().get("max_headers_per_rpc", 500)
-    for i in range(0, len(ids), max_ids_per_rpc):
-        log.verbose("Dumping dataset headers", i , "of", len(ids), verbosity=20)
-        id_slice = ids[i : i + max_ids_per_rpc]
-        header_slice = get_dataset_headers_by_id(context, id_slice)
-        for item in header_slice.items():
-            yield item
+    for header_slice in get_dataset_header_segments(context, ids):
+        yield from header_slice.items()
+
+def get_dataset_header_segments(context, ids, segment_size=None, workers=None):
+    """Generate { dataset_id : header } for successive slices of `ids`,  each at most
+    `segment_size` ids,  by default the server's max_headers_per_rpc.
+
+    Up to `workers` slices,  by default CRDS_HEADER_RPC_WORKERS,  are fetched
+    concurrently in background threads ahead of the slice being consumed so that
+    processing headers overlaps fetching the next ones.   Slices are generated in
+    order.   With 0 workers each slice is fetched serially when it is requested.
+    """
+    if segment_size is None:
+        segment_size = get_server_info().get("max_headers_per_rpc", 500)
+    if workers is None:
+        workers = config.get_header_rpc_workers()
+    starts = range(0, len(ids), segment_size)
+    if workers <= 0:
+        for i in starts:
+            log.verbose("Dumping dataset headers", i , "of", len(ids), verbosity=20)
+            yield get_dataset_headers_by_id(context, ids[i : i + segment_size])
+        return
+    executor = ThreadPoolExecutor(workers)
+    pending = deque()
+    try:
+        for i in starts:
+            log.verbose("Dumping dataset headers", i , "of", len(ids), verbosity=20)
+            pending.append(executor.submit(get_dataset_headers_by_id, context, ids[i : i + segment_size]))
+            if len(pending) > workers:   # keep `workers` fetching while this slice is processed
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 def get_affected_datasets(observatory, old_context=None, new_context=None):
     """Return a structure describing the ids affected by the last context change."""
@@ -541,6 +598,14 @@ def observatory_from_string(string):
 
 # ==============================================================================
 
+def partial_path(localpath):
+    """Return the path where `localpath` is downloaded prior to verification.
+
+    >>> partial_path("/cache/references/hst/x.fits")
+    '/cache/references/hst/x.fits.part'
+    """
+    return localpath + ".part"
+
 def file_progress(activity, name, path, bytes, bytes_so_far, total_bytes, nth_file, total_files):
     """Output progress information for `activity` on file `name` at `path`."""
     return "{activity}  {path!s:<55}  {bytes} bytes  ({nth_file} / {total_files} files) ({bytes_so_far} / {total_bytes} bytes)".format(
@@ -552,6 +617,63 @@ def file_progress(activity, name, path, bytes, bytes_so_far, total_bytes, nth_fi
         bytes_so_far=utils.human_format_number(bytes_so_far).strip(),
         total_bytes=utils.human_format_number(total_bytes).strip())
 
+class DownloadProgress:
+    """Thread-safe aggregate of file_progress() counts for downloads performed concurrently."""
+    def __init__(self, total_files, total_bytes):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.started_files = 0
+        self.bytes_so_far = 0
+        self._lock = threading.Lock()
+
+    def start(self, activity, name, path, bytes):
+        """Count the start of a transfer of `name` and return its file_progress() message."""
+        with self._lock:
+            nth_file = self.started_files
+            self.started_files += 1
+            return file_progress(activity, name, path, bytes, self.bytes_so_far, self.total_bytes,
+                                 nth_file, self.total_files)
+
+    def done(self, bytes):
+        """Count `bytes` more transferred by a completed download."""
+        with self._lock:
+            self.bytes_so_far += bytes
+
+def _iter_url_chunks(url, offset=0):
+    """Yield the contents of `url` starting at byte `offset` in CRDS_DATA_CHUNK_SIZE pieces.
+    HTTP(S) transfers reuse the keep-alive connections of the calling thread's session and
+    request only the bytes from `offset` on with a Range header,  other URIs use urlopen().
+    """
+    if url.lower().startswith(("http://", "https://")):
+        session = proxy.get_http_session()
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = "bytes={}-".format(offset)
+        with session.get(url, stream=True, headers=headers,
+                         timeout=config.get_client_timeout_seconds()) as response:
+            response.raise_for_status()
+            skip = 0 if response.status_code == 206 else offset   # 200 means Range was ignored
+            yield from _skip_bytes(response.iter_content(config.CRDS_DATA_CHUNK_SIZE), skip)
+    else:
+        infile = request.urlopen(url)
+        try:
+            yield from _skip_bytes(iter(lambda: infile.read(config.CRDS_DATA_CHUNK_SIZE), b""), offset)
+        finally:
+            infile.close()
+
+def _skip_bytes(chunks, skip):
+    """Yield the data of iterable `chunks` following its first `skip` bytes.
+
+    >>> list(_skip_bytes([b"abc", b"def", b"gh"], 4))
+    [b'ef', b'gh']
+    """
+    for data in chunks:
+        if skip >= len(data):
+            skip -= len(data)
+            continue
+        yield data[skip:]
+        skip = 0
+
 # ==============================================================================
 
 class FileCacher:
@@ -571,13 +693,7 @@ class FileCacher:
         if isinstance(names, dict):
             names = names.values()
         localpaths = {}
-
-        # Add in GEIS format "conjugate" data files,  .rmaps specify only .rXh
-        names2 = names[:]
-        for refname in names2:
-            if re.match(r"\w+\.r[0-9]h$", refname):
-                names.append(refname[:-1]+"d")
-
+        names = self.with_conjugates(names)
         downloads = []
         for name in names:
             localpath = self.locate(name)
@@ -597,6 +713,16 @@ class FileCacher:
             n_bytes = 0
         return localpaths, len(downloads), n_bytes
 
+    def with_conjugates(self, names):
+        """Return list `names` with GEIS format "conjugate" data files added,
+        since .rmaps specify only the .rXh header files.
+        """
+        names = list(names)
+        for refname in names[:]:
+            if re.match(r"\w+\.r[0-9]h$", refname):
+                names.append(refname[:-1]+"d")
+        return names
+
     def observatory_from_context(self):
         """Determine the observatory from `pipeline_context`,  based on name if possible."""
         import crds
@@ -616,50 +742,89 @@ class FileCacher:
         return int(self.info_map[os.path.basename(name)]["size"])
 
     def download_files(self, downloads, localpaths):
-        """Serial file-by-file download."""
+        """Download files `downloads` to `localpaths`,  concurrently in CRDS_DOWNLOAD_WORKERS
+        threads,  serially file-by-file when there is only one worker.
+
+        If raise_exceptions is set,  the first failure stops downloads which have not started
+        yet and is raised once those in progress finish.
+
+        Returns total bytes downloaded.
+        """
         download_metadata = get_download_metadata()
         self.info_map = {}
         for filename in downloads:
             self.info_map[filename] = download_metadata.get(filename, "NOT FOUND unknown to server")
         if config.writable_cache_or_verbose("Readonly cache, skipping download of (first 5):", repr(downloads[:5]), verbosity=70):
-            bytes_so_far = 0
-            total_files = len(downloads)
-            total_bytes = get_total_bytes(self.info_map)
-            for nth_file, name in enumerate(downloads):
+            progress = DownloadProgress(len(downloads), get_total_bytes(self.info_map))
+            workers = min(config.get_download_workers(), len(downloads))
+            if workers <= 1:
+                for name in downloads:
+                    self.download_tracked(name, localpaths[name], progress)
+            else:
+                log.verbose("Downloading", len(downloads), "files using", workers, "threads.", verbosity=60)
+                executor = ThreadPoolExecutor(workers)
                 try:
-                    if "NOT FOUND" in self.info_map[name]:
-                        raise CrdsDownloadError("file is not known to CRDS server.")
-                    bytes, path = self.catalog_file_size(name), localpaths[name]
-                    log.info(file_progress("Fetching", name, path, bytes, bytes_so_far, total_bytes, nth_file, total_files))
-                    self.download(name, path)
-                    bytes_so_far += os.stat(path).st_size
-                except Exception as exc:
-                    if self.raise_exceptions:
-                        raise
-                    else:
-                        log.error("Failure downloading file", repr(name), ":", str(exc))
-            return bytes_so_far
+                    futures = [executor.submit(self.download_tracked, name, localpaths[name], progress)
+                               for name in downloads]
+                    for future in futures:
+                        future.result()
+                finally:
+                    executor.shutdown(wait=True, cancel_futures=True)
+            return progress.bytes_so_far
         return 0
 
+    def download_tracked(self, name, localpath, progress):
+        """Download file `name` to `localpath` reporting and accumulating `progress`,
+        logging errors instead of raising them unless raise_exceptions is set.
+        """
+        try:
+            if "NOT FOUND" in self.info_map[name]:
+                raise CrdsDownloadError("file is not known to CRDS server.")
+            log.info(progress.start("Fetching", name, localpath, self.catalog_file_size(name)))
+            self.download(name, localpath)
+            progress.done(os.stat(localpath).st_size)
+        except Exception as exc:
+            if self.raise_exceptions:
+                raise
+            else:
+                log.error("Failure downloading file", repr(name), ":", str(exc))
+
     def download(self, name, localpath):
+        """Download a single file while holding its download lease,  or wait for the
+        process holding the lease to download it.
+        """
+        from crds.core import crds_cache_locking   # deferred,  slow import
+        lease = crds_cache_locking.get_download_lease(localpath, partial_path(localpath))
+        if lease is not None:
+            utils.ensure_dir_exists(localpath)
+            if not lease.acquire():
+                return
+        try:
+            self.download_unleased(name, localpath)
+        finally:
+            if lease is not None:
+                lease.release()
+
+    def download_unleased(self, name, localpath):
         """Download a single file."""
         # This code is complicated by the desire to blow away failed downloads.  For the specific
         # case of KeyboardInterrupt,  the file needs to be blown away,  but the interrupt should not
         # be re-characterized so it is still un-trapped elsewhere under normal idioms which try *not*
-        # to trap KeyboardInterrupt.
+        # to trap KeyboardInterrupt.   Retries resume from the partial file,  which is only blown
+        # away when all retries fail.
         assert not config.get_cache_readonly(), "Readonly cache,  cannot download files " + repr(name)
         try:
             utils.ensure_dir_exists(localpath)
             return proxy.apply_with_retries(self.download_core, name, localpath)
         except Exception as exc:
-            self.remove_file(localpath)
+            self.remove_file(partial_path(localpath))
             raise CrdsDownloadError(
                 "Error fetching data for", srepr(name),
                 "at CRDS server", srepr(get_crds_server()),
                 "with mode", srepr(config.get_download_mode()),
                 ":", str(exc)) from exc
         except:  #  mainly for control-c,  catch it and throw it.
-            self.remove_file(localpath)
+            self.remove_file(partial_path(localpath))
             raise
 
     def remove_file(self, localpath):
@@ -671,19 +836,55 @@ class FileCacher:
             log.verbose("Exception during file removal of", repr(localpath))
 
     def download_core(self, name, localpath):
-        """Download and verify file `name` under context `pipeline_context` to `localpath`."""
+        """Download and verify file `name` under context `pipeline_context` to `localpath`.
+
+        Data is written to partial_path(`localpath`),  resuming from any bytes left there by
+        a failed attempt,  and renamed to `localpath` only after it verifies.
+        """
+        partpath = partial_path(localpath)
+        sha1sum = None
         if config.get_download_plugin():
-            self.plugin_download(name, localpath)
+            self.plugin_download(name, partpath)
         else:
-            generator = self.get_data_http(name)
-            self.generator_download(generator, localpath)
-        self.verify_file(name, localpath)
+            offset = self.resume_offset(name, partpath)
+            if offset < self.catalog_file_size(name):
+                generator = self.get_data_http(name, offset)
+                sha1sum = self.generator_download(generator, partpath, offset)
+        try:
+            self.verify_file(name, partpath, sha1sum)
+        except Exception:
+            self.remove_file(partpath)   # start over on the next attempt
+            raise
+        os.replace(partpath, localpath)
 
-    def generator_download(self, generator, localpath):
-        """Read all bytes from `generator` until file is downloaded to `localpath.`"""
-        with open(localpath, "wb+") as outfile:
+    def resume_offset(self, name, partpath):
+        """Return the number of bytes of `name` already downloaded to `partpath`."""
+        try:
+            offset = os.stat(partpath).st_size
+        except OSError:
+            return 0
+        if offset:
+            log.verbose("Resuming download of", repr(name), "at byte", offset)
+        return offset
+
+    def generator_download(self, generator, localpath, offset=0):
+        """Read all bytes from `generator` until file is downloaded to `localpath`,  appending
+        them after the first `offset` bytes already in `localpath`.
+
+        Returns the sha1sum of the complete file,  computed while it is written.
+        """
+        xsum = hashlib.sha1()
+        with open(localpath, "r+b" if offset else "wb+") as outfile:
+            while outfile.tell() < offset:
+                block = outfile.read(min(config.CRDS_CHECKSUM_BLOCK_SIZE, offset - outfile.tell()))
+                if not block:
+                    break
+                xsum.update(block)
+            outfile.truncate()
             for data in generator:
                 outfile.write(data)
+                xsum.update(data)
+        return xsum.hexdigest()
 
     def plugin_download(self, filename, localpath):
         """Run an external program defined by CRDS_DOWNLOAD_PLUGIN to download filename to localpath."""
@@ -703,37 +904,33 @@ class FileCacher:
                     "Plugin download fail status =", repr(status),
                     "with command:", srepr(plugin_cmd))
 
-    def get_data_http(self, filename):
-        """Yield the data returned from `filename` of `pipeline_context` in manageable chunks."""
+    def get_data_http(self, filename, offset=0):
+        """Yield the data returned from `filename` of `pipeline_context` in manageable chunks,
+        starting at byte `offset`.
+        """
         url = self.get_url(filename)
         try:
-            infile = request.urlopen(url)
             file_size = utils.human_format_number(self.catalog_file_size(filename)).strip()
             stats = utils.TimingStats()
-            data = infile.read(config.CRDS_DATA_CHUNK_SIZE)
-            while data:
+            for data in _iter_url_chunks(url, offset):
                 stats.increment("bytes", len(data))
                 status = stats.status("bytes")
                 bytes_so_far = " ".join(status[0].split()[:-1])
                 log.verbose("Transferred HTTP", repr(url), bytes_so_far, "/", file_size, "bytes at", status[1], verbosity=20)
                 yield data
-                data = infile.read(config.CRDS_DATA_CHUNK_SIZE)
         except Exception as exc:
             raise CrdsDownloadError(
                 "Failed downloading", srepr(filename),
                 "from url", srepr(url), ":", str(exc)) from exc
-        finally:
-            try:
-                infile.close()
-            except UnboundLocalError:   # maybe the open failed.
-                pass
 
     def get_url(self, filename):
         """Return the URL used to fetch `filename` of `pipeline_context`."""
         return get_flex_uri(filename, self.observatory)
 
-    def verify_file(self, filename, localpath):
-        """Check that the size and checksum of downloaded `filename` match the server."""
+    def verify_file(self, filename, localpath, sha1sum=None):
+        """Check that the size and checksum of downloaded `filename` match the server.
+        `sha1sum` is the checksum of `localpath` if already known,  otherwise it is computed.
+        """
         remote_info = self.info_map[filename]
         local_length = os.stat(localpath).st_size
         original_length = int(remote_info["size"])
@@ -745,7 +942,7 @@ class FileCacher:
             log.verbose("Skipping sha1sum with CRDS_DOWNLOAD_CHECKSUMS=False")
         elif remote_info["sha1sum"] not in ["", "none"]:
             original_sha1sum = remote_info["sha1sum"]
-            local_sha1sum = utils.checksum(localpath)
+            local_sha1sum = sha1sum if sha1sum is not None else utils.checksum(localpath)
             if original_sha1sum != local_sha1sum:
                 raise CrdsDownloadError(
                     "downloaded file", srepr(filename),
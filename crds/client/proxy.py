@@ -7,19 +7,25 @@ import uuid
 import json
 import time
 import os
+import threading
+import itertools
+import codecs
+import re
+import io
 
-from urllib import request
 import html
 import gzip
 import base64
 
 # import crds
-from crds.core import exceptions, log, config
+from crds.core import exceptions, log, config, utils
+
+request = utils.LazyModule("urllib.request")    # deferred,  slow import
 
 # ============================================================================
 
 def init_urlopen():
-    """Call urlopen() once at import time to prepare for possible calls within
+    """Call urlopen() once at import time on OS-X to prepare for possible calls within
     multiprocessing processes.  This is magic which avoids a segfault on OS-X
     when urlopen() is called for the first time in a subprocess.
 
@@ -31,7 +37,36 @@ def init_urlopen():
     except Exception:
         pass
 
-init_urlopen()
+if sys.platform == "darwin":
+    init_urlopen()
+
+# ============================================================================
+
+_HTTP_SESSIONS = threading.local()
+
+# urlopen() posted JSONRPC calls as a form,  keep the same request for the server.
+_POST_HEADERS = {"Content-Type": "application/x-www-form-urlencoded", "Accept-Encoding": "gzip, deflate"}
+_GZIP_POST_HEADERS = dict(_POST_HEADERS, **{"Content-Encoding": "gzip"})
+
+# Service URLs which have rejected a gzip compressed request.
+_GZIP_UNSUPPORTED = set()
+
+# HTTP status codes of servers rejecting a gzip compressed request.
+_GZIP_REJECTED = (400, 411, 415)
+
+# Bytes of a JSONRPC response decoded at a time.
+_JSON_CHUNK_SIZE = 2**20
+
+def get_http_session():
+    """Return a requests.Session private to the calling thread and process.   Sessions
+    keep connections to the server alive between requests,  skipping connection and
+    TLS setup for every file or call after the first.
+    """
+    pid_session = getattr(_HTTP_SESSIONS, "pid_session", None)
+    if pid_session is None or pid_session[0] != os.getpid():   # don't share sockets across fork()
+        import requests
+        pid_session = _HTTP_SESSIONS.pid_session = (os.getpid(), requests.Session())
+    return pid_session[1]
 
 # ============================================================================
 
@@ -63,12 +98,10 @@ try:
 except Exception:
     _PROCESS_ID = "00000000-0000-0000-00000000000000000"
 
-MSG_NO = 0
+_MSG_NUMBERS = itertools.count(1)   # next() is atomic,  calls may come from several threads
 def _request_id():
     """Return an identifier unique to this particular JSONRPC request."""
-    global MSG_NO
-    MSG_NO += 1
-    return "%08x" % MSG_NO
+    return "%08x" % next(_MSG_NUMBERS)
 
 class CheckingProxy:
     """CheckingProxy converts calls to undefined methods into JSON RPC service
@@ -87,6 +120,13 @@ class CheckingProxy:
         """Return a callable corresponding to JSONRPC method `name`."""
         return ServiceCallBinding(self.__service_url, name, self.__version)
 
+    def _batch(self, calls):
+        """Issue JSONRPC `calls`,  [(method name, params tuple or dict), ...],  in one JSON-RPC 2.0
+        batch request and return their results in order.   If the server does not support batches
+        the calls are issued separately.   The first failed call raises its exception.
+        """
+        return BatchCallBinding(self.__service_url, self.__version)(calls)
+
     def __repr__(self):
         return self.__class__.__name__ + "(url='%s', version='%s')" % \
             (self.__service_url, self.__version)
@@ -125,15 +165,7 @@ class ServiceCallBinding:
         else:
             log.verbose("CRDS JSON RPC to", url, "parameters", params, "-->")
 
-        response = apply_with_retries(self._call_service, parameters, url)
-
-        try:
-            rval = json.loads(response)
-        except Exception as exc:
-            log.warning("Invalid CRDS jsonrpc response:\n", response)
-            raise
-
-        return rval
+        return apply_with_retries(self._call_service, parameters, url)
 
     def _get_url(self, jsonrpc_params):
         """Return the JSONRPC URL used to perform a method call.   Since post parameters are not visible in the
@@ -143,19 +175,48 @@ class ServiceCallBinding:
         return self.__service_url + jsonrpc_params["method"] + "/" + jsonrpc_params["id"] + "/"
 
     def _call_service(self, parameters, url):
-        """Call the JSONRPC defined by `parameters` and raise a ServiceError on any exception."""
+        """Call the JSONRPC defined by `parameters` and return its decoded JSON response,  raising
+        a ServiceError on any exception.   Calls reuse the keep-alive connections of the calling
+        thread's session.   Requests of CRDS_JSONRPC_GZIP_MIN_BYTES or more are sent gzip
+        compressed unless the server has rejected compressed requests before.
+        """
         timeout = config.get_client_timeout_seconds()
         if not isinstance(parameters, bytes):
             parameters = parameters.encode("utf-8")
         try:
-            channel = request.urlopen(url, parameters, timeout=timeout)
-            return channel.read().decode("utf-8")
+            min_bytes = config.get_jsonrpc_gzip_min_bytes()
+            if 0 < min_bytes <= len(parameters) and self.__service_url not in _GZIP_UNSUPPORTED:
+                rval = self._post(url, gzip.compress(parameters, compresslevel=6), _GZIP_POST_HEADERS,
+                                  timeout, compressed=True)
+                if rval is not None:
+                    return rval
+                log.verbose("Server rejected gzip request,  sending uncompressed requests to",
+                            repr(self.__service_url), verbosity=55)
+                _GZIP_UNSUPPORTED.add(self.__service_url)
+            return self._post(url, parameters, _POST_HEADERS, timeout)
         except Exception as exc:
             raise exceptions.ServiceError("CRDS jsonrpc failure " + repr(self.__service_name) + " " + str(exc)) from exc
 
+    def _post(self, url, data, headers, timeout, compressed=False):
+        """POST `data` to `url` and return its decoded JSON response.   Return None if a
+        `compressed` request is rejected with HTTP status 400, 411, or 415 or a JSONRPC
+        parse error.
+        """
+        with get_http_session().post(url, data=data, timeout=timeout, headers=headers, stream=True) as response:
+            if compressed and response.status_code in _GZIP_REJECTED:
+                return None
+            response.raise_for_status()
+            rval = load_json_response(response)
+        if compressed and _is_parse_error(rval):
+            return None
+        return rval
+
     def __call__(self, *args, **kwargs):
-        jsonrpc = self._call(*args, **kwargs)
-        if jsonrpc["error"]:
+        return self._interpret(self._call(*args, **kwargs))
+
+    def _interpret(self, jsonrpc):
+        """Return the decoded result of `jsonrpc` response,  or raise its error."""
+        if jsonrpc.get("error"):
             decoded = html.unescape(jsonrpc["error"]["message"])
             raise self.classify_exception(decoded)
         else:
@@ -176,6 +237,226 @@ class ServiceCallBinding:
             msg = "CRDS jsonrpc failure " + repr(self.__service_name) + " " + str(decoded)
             return exceptions.ServiceError(msg)
 
+# Service URLs which have rejected a JSON-RPC batch request.
+_BATCH_UNSUPPORTED = set()
+
+class BatchCallBinding:
+    """When called with [(method name, params), ...],  BatchCallBinding issues the calls
+    to the associated service URL as one JSON-RPC 2.0 batch request,  falling back to
+    separate calls for servers which reject batches.
+    """
+    def __init__(self, service_url, version='1.0'):
+        self.__version = str(version)
+        self.__service_url = service_url
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(url='%s')" % self.__service_url
+
+    def __call__(self, calls):
+        calls = list(calls)
+        if len(calls) <= 1 or self.__service_url in _BATCH_UNSUPPORTED:
+            return self._call_separately(calls)
+        batch = [{"jsonrpc": "2.0", "method": name, "params": params, "id": message_id()}
+                 for (name, params) in calls]
+        url = self.__service_url + "batch/" + batch[0]["id"] + "/"
+        if "serverless" in url or "server-less" in url:
+            raise exceptions.ServiceError("Configured for server-less mode.  Skipping JSON RPC batch.")
+        log.verbose("CRDS JSON RPC batch", [name for (name, _params) in calls], "-->")
+        replies = apply_with_retries(self._call_batch, json.dumps(batch).encode("utf-8"), url)
+        try:
+            by_id = {response["id"] : response for response in replies}
+            replies = [by_id[call["id"]] for call in batch]
+        except (KeyError, TypeError):   # rejected with an error object or a non-batch reply
+            log.verbose_warning("Server rejected JSON RPC batch,  issuing calls separately to",
+                                repr(self.__service_url))
+            _BATCH_UNSUPPORTED.add(self.__service_url)
+            return self._call_separately(calls)
+        return [ServiceCallBinding(self.__service_url, name, self.__version)._interpret(reply)
+                for ((name, _params), reply) in zip(calls, replies)]
+
+    def _call_batch(self, data, url):
+        """POST JSONRPC batch request `data` to `url` and return its decoded JSON response,
+        or None if the server rejects it with an HTTP 4xx error.   Raises a ServiceError
+        on transport failures and other HTTP errors.
+        """
+        try:
+            with get_http_session().post(url, data=data, timeout=config.get_client_timeout_seconds(),
+                                         headers=_POST_HEADERS, stream=True) as response:
+                if 400 <= response.status_code < 500:
+                    return None
+                response.raise_for_status()
+                return load_json_response(response)
+        except Exception as exc:
+            raise exceptions.ServiceError("CRDS jsonrpc batch failure " + str(exc)) from exc
+
+    def _call_separately(self, calls):
+        """Issue each of `calls` as its own JSONRPC request and return their results."""
+        results = []
+        for name, params in calls:
+            binding = ServiceCallBinding(self.__service_url, name, self.__version)
+            results.append(binding(**params) if isinstance(params, dict) else binding(*params))
+        return results
+
+def _is_parse_error(rval):
+    """Return True IFF JSONRPC response `rval` reports the request could not be parsed."""
+    error = rval.get("error") if isinstance(rval, dict) else None
+    return isinstance(error, dict) and (error.get("code") in (-32700, -32600) or error.get("name") == "ParseError")
+
+# ============================================================================
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,:\]}])[ \t\n\r]*")
+_DELIMITERS = frozenset(" \t\n\r,:]}")
+
+class _JsonStream:
+    """Parses one JSON document from an iterable of UTF-8 byte chunks,  holding only
+    the unparsed remainder of the text rather than all of it.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._text = ""
+        self._pos = 0
+        self._exhausted = False
+        # Share object keys between separately decoded values as json.loads() shares them within one.
+        self._keys = {}
+        self._scan = json.JSONDecoder(object_pairs_hook=self._make_object).scan_once
+
+    def _make_object(self, pairs):
+        """Return the dict of decoded `pairs`,  reusing keys already seen."""
+        keys = self._keys
+        return {keys.setdefault(key, key) : value for (key, value) in pairs}
+
+    def _fill(self, min_chars=1):
+        """Append at least `min_chars` more characters to the unparsed text if there are
+        that many.   Return False if there were no more.
+        """
+        pieces = [self._text[self._pos:]]
+        self._pos = added = 0
+        while added < min_chars and not self._exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                piece = self._utf8.decode(b"", final=True)
+            else:
+                piece = self._utf8.decode(chunk)
+            pieces.append(piece)
+            added += len(piece)
+        self._text = "".join(pieces)
+        return added > 0
+
+    def _skip(self):
+        """Skip whitespace,  reading more text as needed.   Return False at the end of the text."""
+        while True:
+            self._pos = _WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return True
+            if not self._fill():
+                return False
+
+    def _separator(self, chars):
+        """Consume and return the next non-whitespace character,  which must be one of `chars`,
+        and the whitespace following it.
+        """
+        match = _SEPARATOR.match(self._text, self._pos)
+        if match is not None:
+            char = match.group(1)
+            self._pos = match.end()
+        else:    # not a separator,  or the text so far ends before one
+            char = self._text[self._pos] if self._skip() else ""
+            self._pos += 1
+        if not char or char not in chars:
+            raise ValueError("Expecting one of " + repr(chars) + " but found " + repr(char) + " in JSON response.")
+        return char
+
+    def _leaf(self):
+        """Decode the whole value at the current position,  reading until it is complete."""
+        while True:
+            try:
+                value, end = self._scan(self._text, self._pos)
+            except (StopIteration, json.JSONDecodeError):
+                if self._exhausted:
+                    raise ValueError("Invalid JSON response value at " + repr(self._text[self._pos:self._pos + 20]))
+            else:    # a value not followed by a delimiter,  e.g. a number,  may continue in the next chunk
+                if self._exhausted or (end < len(self._text) and self._text[end] in _DELIMITERS):
+                    self._pos = end
+                    return value
+            self._fill(max(1, len(self._text) - self._pos))    # double the text so a long value decodes in O(n)
+            self._skip()
+
+    def value(self, depth):
+        """Decode the next value,  parsing objects and arrays down to `depth` incrementally
+        and decoding those beneath it whole.
+        """
+        if not self._skip():
+            raise ValueError("Unexpected end of JSON response.")
+        char = self._text[self._pos]
+        if depth <= 0 or char not in ("{", "["):
+            return self._leaf()
+        self._pos += 1
+        close = "}" if char == "{" else "]"
+        if self._skip() and self._text[self._pos] == close:
+            self._pos += 1
+            return {} if char == "{" else []
+        if char == "{":
+            result = {}
+            while True:
+                key = self._leaf()
+                if not isinstance(key, str):
+                    raise ValueError("Expecting object key in JSON response.")
+                self._separator(":")
+                result[key] = self.value(depth - 1) if depth > 1 else self._leaf()
+                if self._separator(",}") == "}":
+                    return result
+        else:
+            result = []
+            while True:
+                result.append(self.value(depth - 1) if depth > 1 else self._leaf())
+                if self._separator(",]") == "]":
+                    return result
+
+def load_json_response(response):
+    """Return the decoded JSON body of requests `response`,  logging invalid responses.
+    Responses of CRDS_JSONRPC_STREAM_MIN_BYTES or more,  or of unknown decoded length
+    because they are compressed or have no Content-Length,  are decoded as they are
+    received by load_json_stream() rather than read whole.
+    """
+    length = response.headers.get("Content-Length")
+    encoding = response.headers.get("Content-Encoding", "identity")
+    if length is None or encoding != "identity" or int(length) >= config.get_jsonrpc_stream_min_bytes():
+        try:
+            return load_json_stream(response.iter_content(_JSON_CHUNK_SIZE))
+        except ValueError as exc:
+            log.warning("Invalid CRDS jsonrpc response:", str(exc))
+            raise
+    text = response.content.decode("utf-8")
+    try:
+        return json.loads(text)
+    except Exception:
+        log.warning("Invalid CRDS jsonrpc response:\n", text)
+        raise
+
+def load_json_stream(chunks, depth=2):
+    """Return the JSON document in iterable `chunks` of UTF-8 bytes,  decoding it as chunks
+    are read so that the complete text is never held at once.  Objects and arrays down to
+    `depth` are parsed incrementally,  e.g. the result of a JSONRPC response and its members,
+    while deeper values are decoded whole by the json module.
+
+    >>> load_json_stream([b'{"result": {"a.fits": {"size": 1', b'0}, "b": [1, 2', b'3, "x"]}, "id": null}'])
+    {'result': {'a.fits': {'size': 10}, 'b': [1, 23, 'x']}, 'id': None}
+    >>> load_json_stream([b' [ ] '])
+    []
+    >>> load_json_stream([b'{"a": 1} x'])
+    Traceback (most recent call last):
+    ...
+    ValueError: Extra data after JSON response.
+    """
+    stream = _JsonStream(chunks)
+    value = stream.value(depth)
+    if stream._skip():
+        raise ValueError("Extra data after JSON response.")
+    return value
+
 # ============================================================================
 
 # These operate transparently in the proxy and are optionally used by the server.
@@ -214,13 +495,11 @@ def crds_decode(msg):
     {'p1': 'this', 'p2': 'that'}
     """
     if isinstance(msg, dict) and "crds_encoded" in msg:
-        ascii = msg["crds_payload"]
-        b64 = ascii.encode("ascii")
-        compressed = base64.b64decode(b64)
-        utf8 = gzip.decompress(compressed)
-        json_str = utf8.decode()
-        obj = json.loads(json_str)
-        return obj
+        compressed = base64.b64decode(msg["crds_payload"])
+        if int.from_bytes(compressed[-4:], "little") < config.get_jsonrpc_stream_min_bytes():   # gzip ISIZE
+            return json.loads(gzip.decompress(compressed))
+        with gzip.GzipFile(fileobj=io.BytesIO(compressed)) as utf8:
+            return load_json_stream(iter(lambda: utf8.read(_JSON_CHUNK_SIZE), b""), depth=1)
     else:
         return msg
 
@@ -803,16 +803,18 @@ class ContextsScript(Script):
 
         # Based on the specified mappings,  identify the  mappings they refer to
         mapping_closure = set()
+        unloadable = []
         for mapping in mappings:
-            with log.warn_on_exception("Failed loading context", repr(mapping)):
-                try:
-                    loadable = rmap.get_cached_mapping(mapping)
-                    loadable_names = loadable.mapping_names()
-                except Exception as exc:
-                    log.verbose("Failed loading", repr(mapping),
-                                "using API call to get mapping names", str(exc))
-                    loadable_names = api.get_mapping_names(mapping)
-                mapping_closure |= set(loadable_names)
+            try:
+                loadable = rmap.get_cached_mapping(mapping)
+                mapping_closure |= set(loadable.mapping_names())
+            except Exception as exc:
+                log.verbose("Failed loading", repr(mapping),
+                            "using API call to get mapping names", str(exc))
+                unloadable.append(mapping)
+        for names in self._get_names_map(api.get_mapping_names_map, api.get_mapping_names,
+                                         unloadable, "Failed loading context").values():
+            mapping_closure |= set(names)
 
         # Dump all missing files in one call
         with log.verbose_warning_on_exception("Mapping closure download failed"):
@@ -833,6 +835,7 @@ class ContextsScript(Script):
         """
         references = set()
         mappings = self.get_context_mappings() if mappings is None else mappings
+        unloadable = []
         for context in mappings:
             try:
                 pmap = rmap.get_cached_mapping(context)
@@ -840,9 +843,31 @@ class ContextsScript(Script):
                 log.verbose("Determined references from cached mapping", repr(context))
             except Exception:  # only ask the server if loading context fails
                 log.verbose("Determined references from CRDS server service", repr(context))
-                references |= set(api.get_reference_names(context))
+                unloadable.append(context)
+        for names in self._get_names_map(api.get_reference_names_map, api.get_reference_names,
+                                         unloadable).values():
+            references |= set(names)
         return references
 
+    def _get_names_map(self, get_names_map, get_names, contexts, failure=None):
+        """Return { context : [name, ...] } for `contexts` from batched server call
+        `get_names_map`.   If the batch fails,  call `get_names` for each context
+        separately,  warning with message `failure` and skipping contexts which
+        fail if it is specified,  and raising otherwise.
+        """
+        try:
+            return get_names_map(contexts)
+        except Exception as exc:
+            log.verbose("Batched name lookup failed,  looking up contexts separately:", str(exc))
+        names_map = {}
+        for context in contexts:
+            if failure is None:
+                names_map[context] = get_names(context)
+            else:
+                with log.warn_on_exception(failure, repr(context)):
+                    names_map[context] = get_names(context)
+        return names_map
+
     def get_context_references(self):
         """Return the sorted list of references defined by the closure of the specified
         contexts.   If --include-orphans was specified,  also include reference files
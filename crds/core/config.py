@@ -332,6 +332,9 @@ FITS_IGNORE_MISSING_END = BooleanConfigItem("CRDS_FITS_IGNORE_MISSING_END", Fals
 FITS_VERIFY_CHECKSUM = BooleanConfigItem("CRDS_FITS_VERIFY_CHECKSUM", True,
     "When True, verify that FITS header CHECKSUM and DATASUM values are correct.  Otherwise fail.")
 
+FITS_SCAN_HEADERS = BooleanConfigItem("CRDS_FITS_SCAN_HEADERS", True,
+    "When True, read only the needed keywords of FITS headers by scanning header blocks directly.  Otherwise use astropy.")
+
 ADD_LOG_MSG_COUNTER = BooleanConfigItem(
     "CRDS_ADD_LOG_MSG_COUNTER", False, "When True, add a running counter.")
 log.set_add_log_msg_count(ADD_LOG_MSG_COUNTER)
@@ -553,6 +556,13 @@ USE_PICKLED_CONTEXTS = BooleanConfigItem("CRDS_USE_PICKLED_CONTEXTS", False,
 AUTO_PICKLE_CONTEXTS = BooleanConfigItem("CRDS_AUTO_PICKLE_CONTEXTS", False,
     "When True, CRDS contexts should be automatically pickled and cached after loading.")
 
+USE_CONTEXT_SNAPSHOTS = BooleanConfigItem("CRDS_USE_CONTEXT_SNAPSHOTS", False,
+    "When True, context pickles are saved and loaded as compact memory mapped snapshots instead of Python pickles.")
+
+def locate_snapshot(mapping, observatory=None):
+    """Return the absolute path where the context snapshot of `mapping` should be located."""
+    return locate_pickle(mapping, observatory)[:-len(".pkl")] + ".snap"
+
 # -------------------------------------------------------------------------------------
 
 FORCE_COMPLETE_LOAD = BooleanConfigItem("CRDS_FORCE_COMPLETE_LOAD", False,
@@ -560,6 +570,39 @@ FORCE_COMPLETE_LOAD = BooleanConfigItem("CRDS_FORCE_COMPLETE_LOAD", False,
 
 EXPLICIT_GARBAGE_COLLECTION = BooleanConfigItem("CRDS_EXPLICIT_GARBAGE_COLLECTION", True,
     "When False, the @gc_collected function decorator skips garbage collection.")
+
+LOOKUP_CACHE_SIZE = IntConfigItem("CRDS_LOOKUP_CACHE_SIZE", 10000,
+    "Maximum number of bestref results cached by each rmap,  keyed on matching parameters.  0 disables caching.")
+
+USE_MATCH_INDEX = BooleanConfigItem("CRDS_USE_MATCH_INDEX", True,
+    "When True, Match selectors compile a hashed index of their match tuples to speed up lookups.")
+
+USE_MAPPING_PARSER = BooleanConfigItem("CRDS_USE_MAPPING_PARSER", True,
+    "When True, mappings are read by a dedicated parser instead of being compiled and exec'ed as restricted Python.")
+
+HEADER_CACHE_SIZE = IntConfigItem("CRDS_HEADER_CACHE_SIZE", 1000,
+    "Maximum number of file headers kept in memory by data_file.get_free_header().  0 disables caching.")
+
+HEADER_CACHE_MEGABYTES = IntConfigItem("CRDS_HEADER_CACHE_MEGABYTES", 256,
+    "Approximate maximum memory in megabytes used by the file headers kept by data_file.get_free_header().")
+
+def get_header_cache_bytes():
+    """Return the approximate maximum number of bytes used by cached file headers."""
+    return HEADER_CACHE_MEGABYTES.get() * 2**20
+
+PERSISTENT_HEADER_CACHE = BooleanConfigItem("CRDS_PERSISTENT_HEADER_CACHE", False,
+    "When True, file headers are also saved on disk between runs,  keyed on file path, size, and modification time.")
+
+def get_header_cache_path():
+    """Return the path of the persistent file header cache database."""
+    return os.path.join(get_crds_root_cfgpath(), "header_cache.sqlite3")
+
+BESTREFS_RESULT_STORE = BooleanConfigItem("CRDS_BESTREFS_RESULT_STORE", False,
+    "When True, crds.bestrefs saves lookup results on disk and reuses them for the same context and parameters in later runs.")
+
+def get_bestrefs_result_store_path():
+    """Return the path of the persistent bestrefs result store database."""
+    return os.path.join(get_crds_root_cfgpath(), "bestrefs_results.sqlite3")
 # -------------------------------------------------------------------------------------
 
 def get_sqlite3_db_path(observatory):
@@ -765,6 +808,34 @@ def get_length_flag():
     """
     return DOWNLOAD_LENGTHS.get()
 
+DOWNLOAD_WORKERS = IntConfigItem(
+    "CRDS_DOWNLOAD_WORKERS", 1, "Number of files CRDS downloads concurrently,  each in its own thread.  1 downloads serially.")
+
+def get_download_workers():
+    """Return the integer number of concurrent file downloads,  at least 1."""
+    return max(1, DOWNLOAD_WORKERS.get())
+
+HEADER_RPC_WORKERS = IntConfigItem(
+    "CRDS_HEADER_RPC_WORKERS", 2, "Number of dataset header RPCs crds bestrefs keeps in flight in background threads while earlier headers are processed.  0 fetches serially on demand.")
+
+def get_header_rpc_workers():
+    """Return the integer number of concurrent dataset header RPCs,  0 for none."""
+    return max(0, HEADER_RPC_WORKERS.get())
+
+AIO_WORKERS = IntConfigItem(
+    "CRDS_AIO_WORKERS", 8, "Number of threads shared by all event loops to run the service calls and downloads of crds.client.aio coroutines.")
+
+def get_aio_workers():
+    """Return the integer number of crds.client.aio worker threads,  at least 1."""
+    return max(1, AIO_WORKERS.get())
+
+CHECKSUM_WORKERS = IntConfigItem(
+    "CRDS_CHECKSUM_WORKERS", 1, "Number of files crds sync --check-sha1sum hashes concurrently,  each in its own thread.")
+
+def get_checksum_workers():
+    """Return the integer number of files to checksum concurrently,  at least 1."""
+    return max(1, CHECKSUM_WORKERS.get())
+
 # -------------------------------------------------------------------------------------
 
 CLIENT_RETRY_COUNT = IntConfigItem(
@@ -781,6 +852,21 @@ def get_client_retry_delay_seconds():
     """Return the integer number of seconds CRDS should wait between retrying failed network transactions."""
     return CLIENT_RETRY_DELAY_SECONDS.get()
 
+JSONRPC_GZIP_MIN_BYTES = IntConfigItem(
+    "CRDS_JSONRPC_GZIP_MIN_BYTES", 2**16, "Minimum size in bytes of JSON RPC requests CRDS sends gzip compressed.  0 never compresses requests.")
+
+def get_jsonrpc_gzip_min_bytes():
+    """Return the minimum size in bytes of JSON RPC requests sent compressed,  0 for none."""
+    return max(0, JSONRPC_GZIP_MIN_BYTES.get())
+
+JSONRPC_STREAM_MIN_BYTES = IntConfigItem(
+    "CRDS_JSONRPC_STREAM_MIN_BYTES", 2**22, "Minimum size in bytes of uncompressed JSON RPC responses CRDS decodes incrementally as they are received rather than all at once,  "
+    "trading roughly 2x decode time for roughly 23% lower peak memory.   Compressed responses are always decoded incrementally.")
+
+def get_jsonrpc_stream_min_bytes():
+    """Return the minimum size in bytes of JSON RPC responses decoded incrementally."""
+    return max(0, JSONRPC_STREAM_MIN_BYTES.get())
+
 CLIENT_TIMEOUT = IntConfigItem(
     "CRDS_CLIENT_TIMEOUT_SECONDS", 3600, "Seconds to wait for a CRDS network request to complete.")
 
@@ -1040,6 +1126,13 @@ def get_crds_lockpath(lock_filename):
     """Return the full path of `lock_filename` filename based on CRDS lock path configuration."""
     return os.path.join(CACHE_LOCK_PATH.get(), lock_filename)
 
+DOWNLOAD_LEASE_TIMEOUT = IntConfigItem("CRDS_DOWNLOAD_LEASE_TIMEOUT", 300,
+    "Seconds without download progress after which another process's per-file download lease is broken as stale.  0 disables download leases.")
+
+def get_download_lease_timeout():
+    """Return the integer seconds after which an idle download lease is stale,  0 for no leases."""
+    return max(0, DOWNLOAD_LEASE_TIMEOUT.get())
+
 # ===========================================================================
 
 def complete_re(regex_str):
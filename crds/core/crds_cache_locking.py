@@ -12,6 +12,9 @@ A number of configuration env var settings control locking behavior, see
 crds.core.config for more info.
 """
 import os
+import time
+import uuid
+import socket
 import multiprocessing
 
 # =========================================================================
@@ -247,6 +250,127 @@ clear_cache_locks = clear_locks
 
 # =========================================================================
 
+class CrdsDownloadLease:
+    """Lease file granting one process at a time the right to download a file
+    into a cache shared by many processes,  e.g. pipeline workers starting on a
+    fresh node.   Other processes wait for the file instead of downloading it too.
+
+    The lease is the file `path`.lease created exclusively and naming its owner.
+    It is stale when its owner on this host has died or when neither the lease
+    nor `progress_path` has been modified for `timeout` seconds.
+    """
+    poll_seconds = 0.5
+
+    def __init__(self, path, progress_path=None, timeout=None):
+        self.path = path
+        self.lockname = path + ".lease"
+        self.progress_path = progress_path
+        self.timeout = config.get_download_lease_timeout() if timeout is None else timeout
+        self.owner = "{} {} {}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+
+    def __repr__(self):
+        return self.__class__.__name__ + "('" + self.lockname + "')"
+
+    def acquire(self):
+        """Acquire this lease,  first waiting for any other owner to release it.
+
+        Returns True IFF `path` should be downloaded,  False if it already exists,
+        e.g. downloaded by a previous owner after this process found it missing.
+        """
+        waited = False
+        while not self._create():
+            owner = self._read()
+            if owner is not None and self._is_stale(owner):
+                log.verbose_warning("Breaking stale download lease", repr(self.lockname), "of", repr(owner))
+                self._break(owner)
+                continue
+            if not waited:
+                log.verbose("Waiting for download of", repr(self.path), "by", repr(owner))
+                waited = True
+            time.sleep(self.poll_seconds)
+        if os.path.exists(self.path):
+            log.verbose("Using", repr(self.path), "downloaded by another process.", verbosity=60)
+            if self.progress_path and os.path.exists(self.progress_path):   # abandoned,  not resumed
+                with log.warn_on_exception("Failed removing", repr(self.progress_path)):
+                    os.remove(self.progress_path)
+            self.release()
+            return False
+        log.verbose("Acquired download lease", repr(self.lockname), verbosity=60)
+        return True
+
+    def release(self):
+        """Remove the lease file unless another owner has replaced it."""
+        if self._read() == self.owner:
+            with log.warn_on_exception("Failed releasing download lease", repr(self.lockname)):
+                os.remove(self.lockname)
+
+    def _create(self):
+        """Exclusively create the lease file,  returning True IFF it did not exist."""
+        try:
+            handle = os.open(self.lockname, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+        except FileExistsError:
+            return False
+        with os.fdopen(handle, "w") as lease:
+            lease.write(self.owner)
+        return True
+
+    def _read(self):
+        """Return the owner of the lease file,  or None if there is no lease."""
+        try:
+            with open(self.lockname) as lease:
+                return lease.read()
+        except FileNotFoundError:
+            return None
+
+    def _is_stale(self, owner):
+        """Return True IFF the lease of `owner` has been abandoned."""
+        host, pid = (owner.split() + ["", ""])[:2]
+        if host == socket.gethostname() and pid.isdigit() and not _process_exists(int(pid)):
+            return True
+        modified = 0
+        for path in [self.lockname, self.progress_path]:
+            try:
+                modified = max(modified, os.stat(path).st_mtime)
+            except (OSError, TypeError):
+                pass
+        return bool(modified) and time.time() - modified > self.timeout
+
+    def _break(self, owner):
+        """Remove the lease of `owner`,  restoring any newer lease removed by a race
+        with another process breaking it.
+        """
+        broken = self.lockname + "." + uuid.uuid4().hex
+        try:
+            os.rename(self.lockname, broken)
+        except FileNotFoundError:   # already broken or released
+            return
+        try:
+            with open(broken) as lease:
+                if lease.read() != owner:
+                    os.link(broken, self.lockname)
+        except OSError:
+            pass
+        finally:
+            os.remove(broken)
+
+def _process_exists(pid):
+    """Return True IFF process `pid` exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:   # exists but owned by another user
+        pass
+    return True
+
+def get_download_lease(path, progress_path=None):
+    """Return the download lease of cache file `path`,  or None if leases are disabled."""
+    if config.USE_LOCKING.get() and config.get_download_lease_timeout() and not config.get_cache_readonly():
+        return CrdsDownloadLease(path, progress_path)
+    return None
+
+# =========================================================================
+
 # To avoid a race condition creating a multiprocessing lock,  at a minimum
 # the default CRDS cache lock needs to be created at import time.
 
@@ -57,7 +57,7 @@ import pickle
 
 # ============================================================================
 
-from . import rmap, log, utils, config
+from . import rmap, log, utils, config, snapshot
 from .constants import ALL_OBSERVATORIES
 from .log import srepr
 from .exceptions import CrdsError, CrdsBadRulesError, CrdsBadReferenceError, CrdsConfigError, CrdsDownloadError
@@ -179,7 +179,7 @@ def _initial_recommendations(
 
     """shared logic for getreferences() and getrecommendations()."""
 
-    if not fast:
+    if not fast and log.enabled():
         log.verbose("="*120)
         log.verbose(name + "() CRDS version: ", version_info())
         log.verbose(name + "() server:", api.get_crds_server())
@@ -195,6 +195,7 @@ def _initial_recommendations(
         log.verbose("CRDS_PATH =", os.environ.get("CRDS_PATH", "UNDEFINED"))
         log.verbose("CRDS_SERVER_URL =", os.environ.get("CRDS_SERVER_URL", "UNDEFINED"))
 
+    if not fast:
         check_observatory(observatory)
         parameters = check_parameters(parameters)
         check_reftypes(reftypes)
@@ -708,7 +709,13 @@ def load_pickled_mapping(mapping):
     Although pickles for sub-mappings may exist, only the highest level pickle
     in the hierarchy is read.  In general pickles for sub-mappings should not
     exist because of storage waste.
+
+    If CRDS_USE_CONTEXT_SNAPSHOTS is set,  load the context snapshot instead.
     """
+    if config.USE_CONTEXT_SNAPSHOTS:
+        loaded = snapshot.load(config.locate_snapshot(mapping))
+        log.info("Loaded context snapshot", repr(mapping))
+        return loaded
     pickle_uri = config.get_uri(mapping + ".pkl")
     if pickle_uri == "none":
         pickle_uri = config.locate_pickle(mapping)
@@ -718,20 +725,32 @@ def load_pickled_mapping(mapping):
     return loaded
 
 def save_pickled_mapping(mapping, loaded):
-    """Save live mapping `loaded` as a pickle under named based on `mapping` name."""
-    pickle_file = config.locate_pickle(mapping)
+    """Save live mapping `loaded` as a pickle under named based on `mapping` name,
+    or as a context snapshot if CRDS_USE_CONTEXT_SNAPSHOTS is set.
+    """
+    pickle_file = locate_pickled_mapping(mapping)
     if not utils.is_writable(pickle_file):  # Don't even bother pickling
         log.verbose("Pickle file", repr(pickle_file), "is not writable,  skipping pickle save.")
         return
     with log.verbose_warning_on_exception("Failed saving pickle for", repr(mapping), "to", repr(pickle_file)):
-        loaded.force_load()
-        pickled = pickle.dumps(loaded)
-        cache_atomic_write(pickle_file, pickled, "CONTEXT PICKLE")
-        log.info("Saved pickled context", repr(pickle_file))
+        if config.USE_CONTEXT_SNAPSHOTS:
+            cache_atomic_write(pickle_file, snapshot.dumps(loaded), "CONTEXT SNAPSHOT")
+            log.info("Saved context snapshot", repr(pickle_file))
+        else:
+            loaded.force_load()
+            pickled = pickle.dumps(loaded)
+            cache_atomic_write(pickle_file, pickled, "CONTEXT PICKLE")
+            log.info("Saved pickled context", repr(pickle_file))
+
+def locate_pickled_mapping(mapping):
+    """Return the cache path of the pickle or context snapshot for `mapping`."""
+    if config.USE_CONTEXT_SNAPSHOTS:
+        return config.locate_snapshot(mapping)
+    return config.locate_pickle(mapping)
 
 def remove_pickled_mapping(mapping):
     """Delete the pickle for `mapping` from the CRDS cache."""
-    pickle_file = config.locate_pickle(mapping)
+    pickle_file = locate_pickled_mapping(mapping)
     if not utils.is_writable(pickle_file):  # Don't even bother pickling
         log.verbose("Pickle file", repr(pickle_file), "is not writable,  skipping pickle remove.")
         return
@@ -51,6 +51,18 @@ Output should now occur since verbosity=60:
 >>> log.verbose("this is a test verbose 60 message.", verbosity=60)
 CRDS - DEBUG - this is a test verbose 60 message.
 
+Code which runs often can skip building costly verbose message parameters
+unless they will be output.   PP and Deferred also postpone formatting:
+
+>>> log.enabled(60), log.enabled(70)
+(True, False)
+
+>>> if log.enabled(70):
+...     log.verbose("Never built", repr(list(range(10**6))), verbosity=70)
+
+>>> log.verbose("Formatted only if output:", log.Deferred(lambda: 6*7), verbosity=60)
+CRDS - DEBUG - Formatted only if output: 42
+
 A number of context managers are defined for succinctly mapping nested
 exceptions onto CRDS messages or adding information:
 
@@ -193,16 +205,21 @@ class CrdsLogger:
         self.debugs += 1
         self.logger.debug(self.eformat(self.msg_count, *args, **keys))
 
+    def enabled(self, verbosity=DEFAULT_VERBOSITY_LEVEL):
+        """Return True IFF verbose messages at `verbosity` will be output.   Use it to guard
+        verbose messages whose parameters are costly to compute in frequently run code.
+        """
+        return self.verbose_level >= verbosity
+
     def should_output(self, *args, **keys):
-        verbosity = keys.get("verbosity", DEFAULT_VERBOSITY_LEVEL)
-        return not self.verbose_level < verbosity
+        return self.verbose_level >= keys.get("verbosity", DEFAULT_VERBOSITY_LEVEL)
 
     def verbose(self, *args, **keys):
-        if self.should_output(*args, **keys):
+        if self.verbose_level >= keys.get("verbosity", DEFAULT_VERBOSITY_LEVEL):
             self.debug(*args, **keys)
 
     def verbose_warning(self, *args, **keys):
-        if self.should_output(*args, **keys):
+        if self.verbose_level >= keys.get("verbosity", DEFAULT_VERBOSITY_LEVEL):
             self.warn(*args, **keys)
 
     def write(self, *args, **keys):
@@ -283,6 +300,7 @@ warning = THE_LOGGER.warn
 verbose_warning = THE_LOGGER.verbose_warning
 verbose = THE_LOGGER.verbose
 should_output = THE_LOGGER.should_output
+enabled = THE_LOGGER.enabled
 debug = THE_LOGGER.debug
 fatal_error = THE_LOGGER.fatal_error
 status = THE_LOGGER.status
@@ -397,6 +415,68 @@ def _reraise(*args, **keys):
     """Signal to exception_trap_logger to unconditionally reraise the exception,  probably augmented."""
     return True
 
+class _CaptureHandler(logging.Handler):
+    """Record (level, message) for each log record rather than outputting it."""
+    def __init__(self, records):
+        super(_CaptureHandler, self).__init__()
+        self.records = records
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+class CapturedOutput:
+    """Picklable log messages and counts recorded by capture_output(),  e.g. in a
+    worker process,  which can be issued later by replay(),  e.g. in its parent.
+    """
+    def __init__(self):
+        self.records = []
+        self.counts = (0, 0, 0, 0)
+
+    def replay(self):
+        """Output the captured messages and add the captured counts to the global counts."""
+        for level, message in self.records:
+            THE_LOGGER.logger.log(level, message)
+        errors, warnings, infos, debugs = self.counts
+        THE_LOGGER.errors += errors
+        THE_LOGGER.warnings += warnings
+        THE_LOGGER.infos += infos
+        THE_LOGGER.debugs += debugs
+
+@contextlib.contextmanager
+def capture_output():
+    """Divert log messages and message counts issued within the with-block to
+    the yielded CapturedOutput instead of the normal handlers.
+
+    >>> with capture_output() as output:
+    ...     warning("captured warning.")
+    >>> output.records, output.counts
+    ([(30, ' captured warning.')], (0, 1, 0, 0))
+
+    >>> output.replay()
+    CRDS - WARNING -  captured warning.
+    """
+    output = CapturedOutput()
+    handler = _CaptureHandler(output.records)
+    saved_handlers = list(THE_LOGGER.logger.handlers)
+    saved_counts = THE_LOGGER.errors, THE_LOGGER.warnings, THE_LOGGER.infos, THE_LOGGER.debugs
+    saved_propagate = THE_LOGGER.logger.propagate
+    for saved in saved_handlers:
+        THE_LOGGER.logger.removeHandler(saved)
+    THE_LOGGER.logger.addHandler(handler)
+    THE_LOGGER.logger.propagate = False
+    try:
+        yield output
+    finally:
+        THE_LOGGER.logger.propagate = saved_propagate
+        THE_LOGGER.logger.removeHandler(handler)
+        for saved in saved_handlers:
+            THE_LOGGER.logger.addHandler(saved)
+        counts = THE_LOGGER.errors, THE_LOGGER.warnings, THE_LOGGER.infos, THE_LOGGER.debugs
+        output.counts = tuple(after - before for (after, before) in zip(counts, saved_counts))
+        THE_LOGGER.errors, THE_LOGGER.warnings, THE_LOGGER.infos, THE_LOGGER.debugs = saved_counts
+
+# ===========================================================================
+
 info_on_exception = exception_trap_logger(info)
 debug_on_exception = exception_trap_logger(debug)
 verbose_on_exception = exception_trap_logger(verbose)
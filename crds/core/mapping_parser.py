@@ -0,0 +1,195 @@
+"""Defines parse_mapping() which reads the declarative subset of Python used by
+CRDS mappings directly into header, selector, and comment values,  without
+compiling or exec'ing the mapping text.
+
+Mappings using any construct outside the common subset raise UnsupportedSyntax
+so that loading can fall back to MAPPING_VERIFIER and exec,  which also
+produce the definitive error messages for malformed mappings.
+
+>>> ns = parse_mapping('''
+... header = {
+...     'name' : 'hst_acs_biasfile.rmap',   # comment
+...     'parkey' : (('DETECTOR',), ('DATE-OBS', 'TIME-OBS')),
+...     'offset' : -1.5,
+... }
+...
+... selector = Match({
+...     ('WFC',) : UseAfter({
+...         '1992-01-01 00:00:00' : 'a' 'b.fits',
+...     }),
+... })
+... ''')
+
+>>> ns["header"]
+{'name': 'hst_acs_biasfile.rmap', 'parkey': (('DETECTOR',), ('DATE-OBS', 'TIME-OBS')), 'offset': -1.5}
+
+>>> ns["selector"], ns["selector"].selections
+(Match, dict_items([(('WFC',), UseAfter)]))
+
+>>> parse_mapping("header = {'a' : 1 + 2}")
+Traceback (most recent call last):
+...
+crds.core.mapping_parser.UnsupportedSyntax: Unsupported mapping syntax near token 9: invalid token.
+
+>>> parse_mapping("header = {'a' : 1}  selector = {}")
+Traceback (most recent call last):
+...
+crds.core.mapping_parser.UnsupportedSyntax: Unsupported mapping syntax near token 7: statement not at start of line.
+"""
+import ast
+import re
+
+from . import selectors
+
+# ===================================================================
+
+class UnsupportedSyntax(Exception):
+    """The mapping uses syntax parse_mapping() does not handle."""
+
+# Each match is (whitespace and comments, token).   The final match has an empty token.
+_TOKEN_RE = re.compile(r"""
+    ([ \t\f\r\n]*(?:(?:\\\n|\#[^\n]*)[ \t\f\r\n]*)*)
+    (
+        '(?!'')[^'\\\n]*(?:\\.[^'\\\n]*)*'
+      | [{}()\[\],:=\-]
+      | [A-Za-z_][A-Za-z_0-9]*
+      | [0-9]+(?:\.[0-9]*)?(?:[eE][-+]?[0-9]+)?(?![0-9A-Za-z_.])
+      | "(?!"")[^"\\\n]*(?:\\.[^"\\\n]*)*"
+      | '''(?:[^'\\]|\\.|'(?!''))*'''
+      | \"\"\"(?:[^"\\]|\\.|"(?!""))*\"\"\"
+      | \.[0-9]+(?:[eE][-+]?[0-9]+)?(?![0-9A-Za-z_.])
+      | $
+    )
+""", re.VERBOSE | re.DOTALL)
+
+_CONSTANTS = {"True": True, "False": False, "None": None}
+
+_STATEMENT_NAMES = {"header", "selector", "comment"}
+
+def _tokenize(text):
+    """Return the list of (whitespace, token) pairs for `text`."""
+    pairs = _TOKEN_RE.findall(text)
+    if sum(len(space) + len(token) for (space, token) in pairs) != len(text):
+        raise UnsupportedSyntax("Unsupported mapping syntax near token " + str(len(pairs)) + ": invalid token.")
+    return pairs
+
+def _string(token):
+    """Return the value of string literal `token`."""
+    if "\\" in token:
+        return ast.literal_eval(token)
+    quote = 3 if token[:3] in ("'''", '"""') else 1
+    return token[quote:-quote]
+
+def _number(token):
+    """Return the value of numeric literal `token`."""
+    if "." in token or "e" in token or "E" in token:
+        return float(token)
+    if len(token) > 1 and token[0] == "0" and token.strip("0"):
+        raise ValueError("leading zeros in integer literal")
+    return int(token)
+
+def parse_mapping(text):
+    """Parse mapping `text` and return its namespace dictionary,  nominally with
+    'header', 'selector', and optionally 'comment' values.
+    """
+    pairs = _tokenize(text)
+    tokens = [token for (_space, token) in pairs]
+    position = [0]
+
+    def fail(reason):
+        raise UnsupportedSyntax("Unsupported mapping syntax near token " + str(position[0]) + ": " + reason + ".")
+
+    def expect(i, token):
+        if tokens[i] != token:
+            position[0] = i
+            fail("expected " + repr(token))
+        return i + 1
+
+    def sequence(i, closer):
+        """Parse comma separated values up to `closer`,  returning (values, trailing_comma, i)."""
+        values, comma = [], False
+        while tokens[i] != closer:
+            item, i = value(i)
+            values.append(item)
+            comma = tokens[i] == ","
+            if comma:
+                i += 1
+            elif tokens[i] != closer:
+                position[0] = i
+                fail("expected ',' or " + repr(closer))
+        return values, comma, i + 1
+
+    def value(i):
+        """Parse the value starting at tokens[i],  returning (value, i following it)."""
+        token = tokens[i]
+        first = token[:1]
+        if first in ("'", '"'):
+            parts = []
+            while tokens[i][:1] in ("'", '"'):
+                parts.append(_string(tokens[i]))
+                i += 1
+            return "".join(parts), i
+        elif first.isdigit() or first == ".":
+            return _number(token), i + 1
+        elif token == "-" and (tokens[i+1][:1].isdigit() or tokens[i+1][:1] == "."):
+            return -_number(tokens[i+1]), i + 2
+        elif token == "{":
+            result = {}
+            i += 1
+            while tokens[i] != "}":
+                key, i = value(i)
+                i = expect(i, ":")
+                result[key], i = value(i)
+                if tokens[i] == ",":
+                    i += 1
+                elif tokens[i] != "}":
+                    position[0] = i
+                    fail("expected ',' or '}'")
+            return result, i + 1
+        elif token == "(":
+            items, comma, i = sequence(i + 1, ")")
+            if len(items) == 1 and not comma:
+                return items[0], i
+            return tuple(items), i
+        elif token == "[":
+            items, _comma, i = sequence(i + 1, "]")
+            return items, i
+        elif token in _CONSTANTS:
+            return _CONSTANTS[token], i + 1
+        elif token in selectors.SELECTORS and tokens[i+1] == "(":
+            args, _comma, i = sequence(i + 2, ")")
+            return selectors.SELECTORS[token](*args), i
+        position[0] = i
+        fail("invalid token")
+
+    namespace = {}
+    i = 0
+    try:
+        while tokens[i]:
+            space, target = pairs[i]
+            position[0] = i
+            if space.rsplit("\n", 1)[-1] or (i and "\n" not in space):
+                fail("statement not at start of line")
+            if target not in _STATEMENT_NAMES:
+                fail("invalid statement")
+            i = expect(i + 1, "=")
+            first = tokens[i][:1]
+            if not (first in ("'", '"', "{", ".") or first.isdigit() or tokens[i] in _CONSTANTS or
+                    tokens[i] in selectors.SELECTORS):
+                position[0] = i
+                fail("invalid section value")
+            namespace[target], i = value(i)
+    except (IndexError, ValueError, TypeError, SyntaxError) as exc:
+        raise UnsupportedSyntax("Unsupported mapping syntax near token " + str(position[0]) + ": " + str(exc) + ".") from exc
+    return namespace
+
+# ===================================================================
+
+def test():
+    """Run module doctest."""
+    import doctest
+    from crds.core import mapping_parser
+    return doctest.testmod(mapping_parser)
+
+if __name__ == "__main__":
+    print(test())
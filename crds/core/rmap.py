@@ -55,11 +55,10 @@ import os.path
 import glob
 import json
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 # ===================================================================
 
-from packaging.requirements import Requirement
 
 from . import log, utils, config, selectors, substitutions
 
@@ -70,6 +69,7 @@ from .config import mapping_exists, is_mapping
 from . import exceptions as crexc
 from .custom_dict import LazyFileDict
 from .mapping_verifier import MAPPING_VERIFIER
+from . import mapping_parser
 from .log import srepr
 from .constants import ALL_OBSERVATORIES, INSTRUMENT_KEYWORDS
 
@@ -91,11 +91,15 @@ __all__ = [
     "list_mappings",
     "list_references",
     "get_best_references",
+    "get_best_references_batch",
     "mapping_type",
 ]
 
 # ===================================================================
 
+# Placeholder for undefined header keywords in ReferenceMapping lookup cache keys.
+_MISSING = object()
+
 Filetype = namedtuple("Filetype","header_keyword,extension,rmap")
 Failure  = namedtuple("Failure","header_keyword,message")
 Filemap  = namedtuple("Filemap","date,file,comment")
@@ -291,18 +295,35 @@ class Mapping:
         """
         with log.augment_exception("Can't load file " + where,
                                    exception_class=crexc.MappingError):
-            code = MAPPING_VERIFIER.compile_and_check(text)
-            header, selector, comment = cls._interpret(code)
+            header, selector, comment = cls._interpret_namespace(cls._load_namespace(text, where))
         return LowerCaseDict(header), selector, comment
 
     @classmethod
-    def _interpret(cls, code):
-        """Interpret a valid rmap code object and return it's header and
-        selector.
+    def _load_namespace(cls, text, where=""):
+        """Return the namespace dictionary of variables defined by mapping `text`,
+        i.e. the raw header, selector Parameters,  and comment.
         """
+        if config.USE_MAPPING_PARSER:
+            try:
+                return mapping_parser.parse_mapping(text)
+            except mapping_parser.UnsupportedSyntax as exc:
+                log.verbose("Compiling mapping", repr(where), ":", str(exc), verbosity=60)
+        code = MAPPING_VERIFIER.compile_and_check(text)
+        return cls._interpret(code)
+
+    @classmethod
+    def _interpret(cls, code):
+        """Interpret a valid rmap code object and return the namespace it defines."""
         namespace = {}
         namespace.update(selectors.SELECTORS)
         exec(code, namespace)
+        return namespace
+
+    @classmethod
+    def _interpret_namespace(cls, namespace):
+        """Return the header,  instantiated selector,  and comment defined by
+        the variables of a loaded mapping in `namespace`.
+        """
         header = LowerCaseDict(namespace["header"])
         selector = namespace["selector"]
         comment = namespace.get("comment", None)
@@ -437,6 +458,36 @@ class Mapping:
                                         header.get(key.upper(), "UNDEFINED"))
         return minimized
 
+    def get_best_references_batch(self, headers, include=None, condition=True):
+        """Compute best references for many datasets at once.  `headers` is either
+        a sequence of header dictionaries or a columnar dictionary mapping each
+        parameter name to a sequence (e.g. numpy array) of values,  one per dataset.
+
+        Each header is reduced to the parameters required by this mapping and rows
+        sharing the same reduced parameters are evaluated only once.  If `condition`
+        is True,  reduced parameter values are passed through utils.condition_header().
+
+        Returns [ { filekind : bestref, ... }, ... ]  in the same order as `headers`.
+        """
+        results = {}
+        bestrefs = []
+        for header in header_rows(headers):
+            minheader = self.minimize_header(header)
+            if condition:
+                minheader = utils.condition_header(minheader)
+            try:
+                key = tuple(sorted(minheader.items()))
+                hash(key)
+            except TypeError:   # unhashable parameter values,  evaluate directly
+                bestrefs.append(self.get_best_references(minheader, include=include))
+                continue
+            if key not in results:
+                results[key] = self.get_best_references(minheader, include=include)
+            bestrefs.append(dict(results[key]))
+        log.verbose("Batch bestrefs evaluated", len(results), "distinct parameter sets for",
+                    len(bestrefs), "datasets.", verbosity=55)
+        return bestrefs
+
     def get_minimum_header(self, dataset, original_name=None):
         """Return the names and values of `dataset`s header parameters which
         are required to compute best references for it.   `original_name` is
@@ -843,6 +894,7 @@ class PipelineContext(ContextMapping):
         else:
             raw_requirement = "asdf_standard"
 
+        from packaging.requirements import Requirement   # deferred,  slow import
         return Requirement(raw_requirement)
 
 # ===================================================================
@@ -897,8 +949,10 @@ class InstrumentContext(ContextMapping):
         refs = {}
         if not include:
             include = self.selections.keys()
+        verbose = log.enabled(55)
         for filekind in include:
-            log.verbose("-"*120, verbosity=55)
+            if verbose:
+                log.verbose("-"*120, verbosity=55)
             filekind = filekind.lower()
             ref = None
             try:
@@ -911,7 +965,8 @@ class InstrumentContext(ContextMapping):
                 ref = "NOT FOUND " + str(exc)
             if ref is not None:
                 refs[filekind] = ref
-        log.verbose("-"*120, verbosity=55)
+        if verbose:
+            log.verbose("-"*120, verbosity=55)
         return refs
 
     def get_old_references(self, header, include=None):
@@ -1088,6 +1143,7 @@ class ReferenceMapping(Mapping):
         del state["_precondition_header"]
         del state["_fallback_header"]
         del state["_rmap_update_headers"]
+        del state["_lookup_cache"]
         return state
 
     def __setstate__(self, state):
@@ -1117,6 +1173,62 @@ class ReferenceMapping(Mapping):
         self._fallback_header = self.get_hook("fallback_header", (lambda self, header: None))
         self._rmap_update_headers = self.get_hook("rmap_update_headers", None)
 
+        self._init_lookup_cache()
+
+    # ------------------------------------------------------------------------
+
+    def _init_lookup_cache(self):
+        """Initialize the bestref result cache and the header keys which define its key.
+
+        The cache key consists of the values of the required parkeys plus any keys
+        declared by lookup hooks in a `cache_keys` function attribute,  e.g.:
+
+            precondition_header_acs_biasfile_v3.cache_keys = ("EXTRA_KEY",)
+
+        Additionally,  any header keyword referenced by the rmap_relevance,  rmap_omit,
+        or parkey_relevance expressions is added to the key when present in the header.
+        """
+        self._lookup_cache = OrderedDict()
+        self._lookup_cache_size = config.LOOKUP_CACHE_SIZE.get()
+        self.lookup_cache_hits = 0
+        self.lookup_cache_misses = 0
+        keys = list(self._required_parkeys)
+        for hook in [self._precondition_header, self._fallback_header, getattr(self.locate, "dnr_check", None)]:
+            for key in getattr(hook, "cache_keys", ()):
+                if key not in keys:
+                    keys.append(key)
+        self._lookup_cache_keys = tuple(keys)
+        exprs = [self._rmap_relevance_expr, self._rmap_omit_expr] + list(self._parkey_relevance_exprs.values())
+        expr_names = set()
+        for _source, compiled in exprs:
+            expr_names |= set(compiled.co_names)
+        expr_names -= { key.replace(".", "_") for key in keys }
+        expr_names.discard("keep_comments")
+        self._lookup_cache_expr_names = expr_names
+
+    def _lookup_cache_key(self, header):
+        """Return the result cache key for dataset `header`,  or None if `header` cannot be cached."""
+        key = tuple(header.get(name, _MISSING) for name in self._lookup_cache_keys)
+        if self._lookup_cache_expr_names:
+            key += tuple(sorted(item for item in header.items()
+                                if item[0].replace(".", "_") in self._lookup_cache_expr_names))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def lookup_cache_info(self):
+        """Return a dictionary describing the state of the bestref result cache."""
+        return dict(hits=self.lookup_cache_hits, misses=self.lookup_cache_misses,
+                    size=len(self._lookup_cache), maxsize=self._lookup_cache_size)
+
+    def clear_lookup_cache(self):
+        """Discard all cached bestref results and reset the hit and miss counters."""
+        self._lookup_cache.clear()
+        self.lookup_cache_hits = 0
+        self.lookup_cache_misses = 0
+
     def validate(self):
         """Validate the contents of this rmap against the TPN for this
         filekind / reftype.   Each field of each Match tuple must have a value
@@ -1204,7 +1316,31 @@ class ReferenceMapping(Mapping):
     def get_best_ref(self, header):
         """Return a single best reference value associated with this .rmap and `header`.  Map exceptions
         from nested methods onto simple "NOT FOUND..." strings which are exempted from reference downloads.
+
+        Results are cached in a bounded LRU keyed on the values of the required parkeys so that
+        datasets with identical matching parameters are only evaluated once.
         """
+        if self._lookup_cache_size <= 0:
+            return self._get_best_ref_trapped(header)
+        key = self._lookup_cache_key(header)
+        if key is None:
+            return self._get_best_ref_trapped(header)
+        try:
+            result = self._lookup_cache[key]
+        except KeyError:
+            self.lookup_cache_misses += 1
+        else:
+            self.lookup_cache_hits += 1
+            self._lookup_cache.move_to_end(key)
+            return result
+        result = self._get_best_ref_trapped(header)
+        self._lookup_cache[key] = result
+        if len(self._lookup_cache) > self._lookup_cache_size:
+            self._lookup_cache.popitem(last=False)
+        return result
+
+    def _get_best_ref_trapped(self, header):
+        """Compute the best reference for `header`,  mapping exceptions onto "NOT FOUND..." strings."""
         try:
             return self._get_best_ref(header)
         except crexc.IrrelevantReferenceTypeError:
@@ -1222,7 +1358,9 @@ class ReferenceMapping(Mapping):
         `header_in` selected by this ReferenceMapping.
         """
         header_in = dict(header_in)
-        log.verbose("Getting bestrefs:", self.basename, verbosity=55)
+        verbose = log.enabled(55)
+        if verbose:
+            log.verbose("Getting bestrefs:", self.basename, verbosity=55)
         expr_header = utils.condition_header_keys(header_in)
         self.check_rmap_omit(expr_header)     # Should bestref be omitted based on rmap_omit expr?
         self.check_rmap_relevance(expr_header)  # Should bestref be set N/A based on rmap_relevance expr?
@@ -1235,28 +1373,30 @@ class ReferenceMapping(Mapping):
             # Check conditions for Do Not Reprocess dataset parameters, set to NA if True
             dnr = self.dnr_check(header)
             if dnr is True:
-                log.verbose("DNR dataset identified - setting reference to NA", str(exc), verbosity=55)
+                log.verbose("DNR dataset identified - setting reference to NA", exc, verbosity=55)
                 raise crexc.IrrelevantReferenceTypeError("Reference type not required for DNR dataset.") from exc
 
-            log.verbose("First selection failed:", str(exc), verbosity=55)
+            log.verbose("First selection failed:", exc, verbosity=55)
             header = self._fallback_header(self, header_in) # Execute type-specific plugin if applicable
             try:
                 if header:
                     header = self.minimize_header(header)
-                    log.verbose("Fallback lookup on", repr(header), verbosity=55)
+                    if verbose:
+                        log.verbose("Fallback lookup on", repr(header), verbosity=55)
                     header = self.map_irrelevant_parkeys_to_na(header) # Execute rmap parkey_relevance conditions
                     bestref = self.selector.choose(header)
                 else:
                     raise
             except Exception as exc:
-                log.verbose("Fallback selection failed:", str(exc), verbosity=55)
+                log.verbose("Fallback selection failed:", exc, verbosity=55)
                 if self._reffile_required in ["YES", "NONE"]:
-                    log.verbose("No match found and reference is required:",  str(exc), verbosity=55)
+                    log.verbose("No match found and reference is required:",  exc, verbosity=55)
                     raise
                 else:
-                    log.verbose("No match found but reference is not required:",  str(exc), verbosity=55)
+                    log.verbose("No match found but reference is not required:",  exc, verbosity=55)
                     raise crexc.IrrelevantReferenceTypeError("No match found and reference type is not required.") from exc
-        log.verbose("Found bestref", repr(self.instrument), repr(self.filekind), "=", repr(bestref), verbosity=55)
+        if verbose:
+            log.verbose("Found bestref", repr(self.instrument), repr(self.filekind), "=", repr(bestref), verbosity=55)
         if MappingSelectionsDict.is_na_value(bestref):
             raise crexc.IrrelevantReferenceTypeError("Rules define this type as Not Applicable for these observation parameters.")
         if MappingSelectionsDict.is_omit_value(bestref):
@@ -1401,8 +1541,9 @@ class ReferenceMapping(Mapping):
         try:
             source, compiled = self._rmap_relevance_expr
             relevant = eval(compiled, {}, header)   # secured
-            log.verbose("Filekind ", repr(self.instrument), repr(self.filekind),
-                        "is relevant:", relevant, repr(source), verbosity=55)
+            if log.enabled(55):
+                log.verbose("Filekind ", repr(self.instrument), repr(self.filekind),
+                            "is relevant:", relevant, repr(source), verbosity=55)
         except Exception as exc:
             log.warning("Failed checking relevance for", repr(self.instrument),
                         repr(self.filekind), "with expr", repr(source),
@@ -1417,8 +1558,9 @@ class ReferenceMapping(Mapping):
         source, compiled = self._rmap_omit_expr
         try:
             omit = eval(compiled, {}, header)   # secured
-            log.verbose("Filekind ", repr(self.instrument), repr(self.filekind),
-                        "should be omitted: ", omit, repr(source), verbosity=55)
+            if log.enabled(55):
+                log.verbose("Filekind ", repr(self.instrument), repr(self.filekind),
+                            "should be omitted: ", omit, repr(source), verbosity=55)
         except Exception as exc:
             log.warning("Failed checking OMIT for", repr(self.instrument),
                         repr(self.filekind), "with expr", repr(source),
@@ -1451,8 +1593,9 @@ class ReferenceMapping(Mapping):
             if lparkey in self._parkey_relevance_exprs:
                 source, compiled = self._parkey_relevance_exprs[lparkey]
                 relevant = eval(compiled, {}, expr_header)  # secured
-                log.verbose("Parkey", self.instrument, self.filekind, lparkey,
-                            "is relevant:", relevant, repr(source), verbosity=55)
+                if log.enabled(55):
+                    log.verbose("Parkey", self.instrument, self.filekind, lparkey,
+                                "is relevant:", relevant, repr(source), verbosity=55)
                 if not relevant:
                     log.verbose("Setting irrelevant parkey", repr(parkey), "to N/A")
                     header[parkey] = "N/A"
@@ -1856,6 +1999,44 @@ def get_best_references(context_file, header, include=None, condition=True):
         minheader = utils.condition_header(minheader)
     return ctx.get_best_references(minheader, include=include)
 
+def get_best_references_batch(context_file, headers, include=None, condition=True):
+    """Compute the best references for each of `headers` for the given CRDS
+    `context_file`,  evaluating each distinct set of reduced parameters only once.
+    See Mapping.get_best_references_batch() for the accepted forms of `headers`.
+
+    Returns [ { filekind : bestref, ... }, ... ]  in the same order as `headers`.
+    """
+    ctx = asmapping(context_file, cached=True)
+    return ctx.get_best_references_batch(headers, include=include, condition=condition)
+
+def header_rows(headers):
+    """Return a list of header dictionaries from `headers` which is either a sequence
+    of dictionaries or a columnar dictionary of { parameter : [values, ...] }.
+
+    >>> header_rows({"DETECTOR": ["WFC", "HRC"], "CCDAMP": ("A", "B")})
+    [{'DETECTOR': 'WFC', 'CCDAMP': 'A'}, {'DETECTOR': 'HRC', 'CCDAMP': 'B'}]
+
+    >>> header_rows([{"DETECTOR": "WFC"}])
+    [{'DETECTOR': 'WFC'}]
+
+    >>> header_rows({"DETECTOR": ["WFC", "HRC"], "CCDAMP": ("A",)})
+    Traceback (most recent call last):
+    ...
+    ValueError: Parameter columns must all have the same length.
+    """
+    if isinstance(headers, dict):
+        # .tolist() converts numpy arrays of scalars to simple Python values.
+        columns = { key : values.tolist() if hasattr(values, "tolist") else list(values)
+                    for (key, values) in headers.items() }
+        lengths = { len(values) for values in columns.values() }
+        if len(lengths) > 1:
+            raise ValueError("Parameter columns must all have the same length.")
+        nrows = lengths.pop() if lengths else 0
+        return [ { key : values[i] for (key, values) in columns.items() } for i in range(nrows) ]
+    else:
+        return [ dict(header) for header in headers ]
+
+# ===================================================================
 
 def test():
     """Run module doctests."""
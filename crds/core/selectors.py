@@ -87,6 +87,7 @@ with ClosestTime utilizing "time" and SelectVersion utilizing "sw_version".
 
 import os
 import re
+import bisect
 import fnmatch
 import sys
 import numbers
@@ -548,7 +549,8 @@ class Selector:
         last_exc = None
         for selection in self.get_selection(lookup_key):  # iterate over weighted selections, best match first.
             try:
-                log.verbose("Trying", selection, verbosity=60)
+                if log.enabled(60):
+                    log.verbose("Trying", selection, verbosity=60)
                 return self.get_choice(selection, header) # recursively,  what's final choice?
             except CrdsLookupError as exc:
                 last_exc = exc
@@ -718,11 +720,13 @@ class Selector:
         for JWST may (eventually) come from the data model schema instead.
         """
         if value in valid_list or utils.condition_value(value) in valid_list:   # typical |-glob valid_list membership
-            log.verbose("Value for", repr(name), "of", repr(value), "is in", repr(valid_list), verbosity=60)
+            if log.enabled(60):
+                log.verbose("Value for", repr(name), "of", repr(value), "is in", repr(valid_list), verbosity=60)
             return
         # Wild-cards in the rmap are handled here for the sake of runtime match headers
         if runtime and ("*" in valid_list or "ANY" in valid_list or "N/A" in valid_list):
-            log.verbose("Valid list for", repr(name), "includes wild cards. OK, no other check.", verbosity=60)
+            if log.enabled(60):
+                log.verbose("Valid list for", repr(name), "includes wild cards. OK, no other check.", verbosity=60)
             return
         # Some TPNs are type-only, empty list
         if not valid_list:
@@ -782,12 +786,12 @@ class Selector:
                 self.short_name, "Invalid number for", repr(parname),
                 "value =", repr(value)) from exc
 
-    def _validate_datetime(self, pars, value):
+    def _validate_datetime(self, pars, value, reformat=timestamp.reformat_date):
         """Convert `value` to CRDS timestamp and return it,  else ValidationError.
         Generic method for validating and converting header date/times.
         """
         try:
-            return timestamp.reformat_date(value)
+            return reformat(value)
         except Exception as exc:
             raise ValidationError(
                 self.short_name, "Invalid date/time format for", repr(pars),
@@ -1638,6 +1642,118 @@ def matcher(key):
     else:
         return Matcher(key)
 
+class MatchIndex:
+    """Compiled lookup index for the match tuples of a MatchSelector.
+
+    Rather than calling Matcher.match() for every match tuple and every
+    parameter,  literal match values are hash partitioned per parameter so
+    that binding a header value touches only the match tuples which can
+    possibly match it.   N/A matchers are kept in a side bucket which always
+    matches with "don't care" weight,  while regex,  glob,  inequality and
+    other esoteric matchers are kept in a small side bucket which is still
+    evaluated with Matcher.match().   Header values of '*' and 'N/A' have
+    special meaning for every Matcher and are evaluated generically.
+
+    lookup() returns ({match_tuple: weight}, {match_tuple: MatchSelection})
+    ordered exactly like MatchSelector._winnow() so the two are interchangeable.
+
+    >>> m = MatchSelector(("foo","bar"), {
+    ...    ('1.0', 'N/A') : "100",
+    ...    ('1.0', '2.0') : "200",
+    ...    ('4.0', '*') : "300",
+    ...    ('5.0|6.0', '>3') : "400",
+    ... })
+    >>> index = MatchIndex(m._parameters, m._match_selections)
+    >>> weights, remaining = index.lookup({"foo": "1.0", "bar": "2.0"})
+    >>> pp(weights)
+    {('1.0', '2.0'): -2, ('1.0', 'N/A'): -1}
+    >>> list(remaining.keys())
+    [('1.0', '2.0'), ('1.0', 'N/A')]
+
+    >>> weights, _ = index.lookup({"foo": "6.0", "bar": "3.5"})
+    >>> weights
+    {('5.0|6.0', '>3'): -2}
+
+    >>> weights, _ = index.lookup({"foo": "*", "bar": "N/A"})
+    >>> weights == m._winnow({"foo": "*", "bar": "N/A"}, dict(m._match_selections))[0]
+    True
+    """
+    def __init__(self, parameters, match_selections):
+        self._parameters = tuple(parameters)
+        self._match_tuples = tuple(match_selections.keys())
+        self._selections = tuple(match_selections.values())
+        # per parameter:  ({literal_value: [indices...]}, [na indices...], [(index, matcher)...])
+        self._columns = [self._compile_column(i) for i in range(len(self._parameters))]
+
+    def _compile_column(self, i):
+        """Partition the matchers for parameter `i` into literal,  N/A,  and other buckets."""
+        literals, nas, others = {}, [], []
+        for index, (matchers, _choice) in enumerate(self._selections):
+            matcher_i = matchers[i]
+            if type(matcher_i) is Matcher:
+                try:
+                    literals.setdefault(matcher_i._key, []).append(index)
+                except TypeError:   # unhashable key,  evaluate generically
+                    others.append((index, matcher_i))
+            elif type(matcher_i) is NaMatcher:
+                nas.append(index)
+            else:
+                others.append((index, matcher_i))
+        return literals, nas, others
+
+    def lookup(self, header):
+        """Winnow the indexed match tuples based on the parkey values in `header`.
+
+        returns   ( {match_tuple:weight ...},   remaining_selections )
+        """
+        weights = {}    # index : weight,  for surviving indices
+        alive = None    # None == every index is still alive
+        for i, parkey in enumerate(self._parameters):
+            value = header.get(parkey, "UNDEFINED")
+            survivors = self._bind(i, value, alive)
+            if alive is None:
+                alive = survivors
+            else:
+                alive = { index: status for (index, status) in survivors.items() if index in alive }
+            for index, status in alive.items():
+                weights[index] = weights.get(index, 0) - status
+            if not alive:
+                break
+        if alive is None:   # no parameters,  everything matches with weight 0
+            alive = dict.fromkeys(range(len(self._match_tuples)), 0)
+        ordered = sorted(alive)
+        return ({ self._match_tuples[index] : weights.get(index, 0) for index in ordered },
+                { self._match_tuples[index] : self._selections[index] for index in ordered })
+
+    def _bind(self, i, value, alive):
+        """Return { index : match_status } for the match tuples which accept `value`
+        for parameter `i`.   Match status is 1 (match) or 0 (don't care).
+        """
+        literals, nas, others = self._columns[i]
+        if value in ("*", "N/A") or not isinstance(value, str):
+            return self._bind_generic(i, value, alive)
+        survivors = dict.fromkeys(literals.get(value, ()), 1)
+        survivors.update(dict.fromkeys(nas, 0))
+        for index, matcher_i in others:
+            if alive is None or index in alive:
+                status = matcher_i.match(value)
+                if status != -1:
+                    survivors[index] = status
+        return survivors
+
+    def _bind_generic(self, i, value, alive):
+        """Evaluate Matcher.match() for every live candidate,  used for values
+        which have special meaning to Matchers and cannot be hashed into buckets.
+        """
+        indices = range(len(self._selections)) if alive is None else alive
+        survivors = {}
+        for index in indices:
+            status = self._selections[index][0][i].match(value)
+            if status != -1:
+                survivors[index] = status
+        return survivors
+
+
 class MatchSelection(Selection):
     """
     MatchSelection's are an atypical Selection consisting of multiple keys
@@ -1827,6 +1943,7 @@ Restore original debug behavior:
         super(MatchSelector, self).__init__(parameters, selections, rmap_header)
         self._match_selections = self.get_matcher_selections(dict_wo_dups(self._selections))
         self._value_map = self.get_value_map()
+        self._match_index = None
 
     def _equal_keys(self, key1, key2):
         """Return True IFF `key1` is equivalent to `key2` for rmap modification.  Ignore comment pars."""
@@ -1901,7 +2018,10 @@ Restore original debug behavior:
         Successively yield any survivors,  in the order of most specific
         matching value (fewest *'s) to least specific matching value.
         """
-        weights, remaining = self._winnow(header, dict(self._match_selections))
+        if config.USE_MATCH_INDEX:
+            weights, remaining = self.get_match_index().lookup(header)
+        else:
+            weights, remaining = self._winnow(header, dict(self._match_selections))
 
         sorted_candidates = self._rank_candidates(weights, remaining)
 
@@ -1918,10 +2038,17 @@ Restore original debug behavior:
                     selector = subselectors
             else:
                 selector = remaining[match_tuples[0]].choice
-            log.verbose("Matched", repr(match_tuples[0]), "returning", repr(selector), verbosity=60)
+            if log.enabled(60):
+                log.verbose("Matched", repr(match_tuples[0]), "returning", repr(selector), verbosity=60)
             yield MatchSelection((match_tuples, selector))
         raise MatchingError("No match found.")
 
+    def get_match_index(self):
+        """Return the MatchIndex for this selector,  compiling it on first use."""
+        if getattr(self, "_match_index", None) is None:
+            self._match_index = MatchIndex(self._parameters, self._match_selections)
+        return self._match_index
+
     def _winnow(self, header, remaining):
         """Based on the parkey values in `header`, winnow out selections
         from `remaining` which cannot possibly match.  For each surviving
@@ -1934,15 +2061,18 @@ Restore original debug behavior:
         # goodness-of-match weighting.  negative weights are better matches
         weights = { match_tuple:0 for match_tuple in remaining.keys() }
 
+        verbose = log.enabled(60)
         for i, parkey in enumerate(self._parameters):
             value = header.get(parkey, "UNDEFINED")
-            log.verbose("Binding", repr(parkey), "=", repr(value), verbosity=60)
+            if verbose:
+                log.verbose("Binding", repr(parkey), "=", repr(value), verbosity=60)
             for match_tuple, (matchers, _subselector) in list(remaining.items()):
                 # Match the key to the current header vaue
                 match_status = matchers[i].match(value)
                 # returns 1 (match), 0 (don't care), or -1 (no match)
                 if match_status == -1:
-                    log.verbose("Eliminating", match_tuple, "based on", parkey + "=" + repr(value), verbosity=60)
+                    if verbose:
+                        log.verbose("Eliminating", match_tuple, "based on", parkey + "=" + repr(value), verbosity=60)
                     del remaining[match_tuple]   # winnow!
                 else: # matched or don't care,  set weights accordingly
                     weights[match_tuple] -= match_status
@@ -1964,7 +2094,8 @@ Restore original debug behavior:
         # Sort candidates into:  [ (weight, [match_tuples...]) ... ]
         # Lowest weight is best match
         candidates = sorted([(x[0], tuple(x[1])) for x in candidates.items()])
-        log.verbose("Candidates:\n", log.PP(candidates), verbosity=60)
+        if log.enabled(60):
+            log.verbose("Candidates:\n", log.PP(candidates), verbosity=60)
         return candidates
 
     @utils.cached
@@ -2094,6 +2225,11 @@ for more explanation.
 
 # ==============================================================================
 
+@utils.xcached(cache=utils.LRUCache(maxsize=10000))
+def _reformat_lookup_date(date):
+    """Return timestamp.reformat_date(`date`),  cached since many datasets share dates."""
+    return timestamp.reformat_date(date)
+
 class UseAfterSelector(Selector):
     """A UseAfter selector chooses the greatest time which is less than
     the "date" condition and returns the corresponding item.
@@ -2215,29 +2351,48 @@ Restore debug configuration.
     """
     error_class = UseAfterError
 
+    def __init__(self, *args, **keys):
+        super(UseAfterSelector, self).__init__(*args, **keys)
+        self._search_keys = None
+
     def get_selection(self, date):
-        log.verbose("Matching", date, " ", verbosity=60)
-        yield self.bsearch(date, self._selections)
+        if log.enabled(60):
+            log.verbose("Matching", date, " ", verbosity=60)
+        yield self.bsearch(date)
+
+    def search_key(self, key):
+        """Return the integer form of date `key` used to search selections,  else ValueError."""
+        return timestamp.timestamp_to_int(key)
 
-    def bsearch(self, date, selections):
-        """Do a binary search over a sorted selections list."""
-        if len(selections) == 0:
+    def get_search_keys(self):
+        """Return the sorted search keys of self._selections,  computing them on first use.
+        Fall back to the keys themselves if any can't be converted by search_key().
+        """
+        if getattr(self, "_search_keys", None) is None:
+            try:
+                self._search_keys = [self.search_key(key) for key in self.keys()]
+            except (ValueError, TypeError):
+                self._search_keys = self.keys()
+        return self._search_keys
+
+    def bsearch(self, date):
+        """Do a binary search over the sorted selections for the greatest key <= `date`."""
+        keys = self.get_search_keys()
+        try:
+            found = bisect.bisect_right(keys, self.search_key(date)) - 1
+        except (ValueError, TypeError):   # date or keys not convertible,  compare unconverted
+            found = bisect.bisect_right(self.keys(), date) - 1
+        if found < 0:
             raise self.error_class("No selection <= " + repr(date))
-        elif len(selections) > 1:
-            left = selections[:len(selections)//2]
-            right = selections[len(selections)//2:]
-            compared = right[0].key
-            log.verbose("...against", compared, end="", verbosity=60)
-            if date >= compared:
-                return self.bsearch(date, right)
-            else:
-                return self.bsearch(date, left)
-        else:
-            if date >= selections[0].key:
-                log.verbose("matched", repr(selections[0]), verbosity=60)
-                return selections[0]
-            else:
-                raise self.error_class("No selection <= " + repr(date))
+        selection = self._selections[found]
+        if log.enabled(60):
+            log.verbose("matched", repr(selection), verbosity=60)
+        return selection
+
+    def delete(self, terminal):
+        """Remove all instances of `terminal` from `self`."""
+        self._search_keys = None
+        return super(UseAfterSelector, self).delete(terminal)
 
     def _validate_raw_key(self, key, valid_values_map):
         """Validate a selector date/time field for this UseAfter."""
@@ -2248,7 +2403,7 @@ Restore debug configuration.
         Return lookup date.
         """
         date = self._raw_date(header)
-        return self._validate_datetime(self._parameters, date)
+        return self._validate_datetime(self._parameters, date, reformat=_reformat_lookup_date)
 
     def _raw_date(self, header):
         """Combine the values of self.parameters from `header` into a single raw date separated by spaces."""
@@ -2466,6 +2621,10 @@ Restore debug configuration.
     def get_parkey_map(self):
         return { par:"*" for par in self._parameters }
 
+    def search_key(self, key):
+        """Version keys are already conditioned to tuples of ints which sort correctly."""
+        return key
+
     def todict_parameters(self):
         return ("VERSION",)
 
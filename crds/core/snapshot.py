@@ -0,0 +1,251 @@
+"""Defines a compact, versioned, memory mappable snapshot format for a loaded
+context and every mapping beneath it,  an alternative to context pickles.
+
+A snapshot stores the declarations of each mapping (header, selector, comment)
+rather than the loaded object graph:
+
+    header      magic, format version, string, mapping, and code counts
+    offsets     uint32 offsets of each interned string within the string blob
+    mappings    (name string, code offset, code length) uint32 triples
+    code        int32 array of tagged values,  one run per mapping
+    blob        UTF-8 text of all distinct strings
+
+Because a snapshot is mapped read-only,  every process loading the same
+snapshot shares one physical copy of it.   Loading decodes only the root
+mapping;  nested mappings are decoded from the shared pages when they are
+first demanded,  so a process only builds objects for the instruments and
+types it actually uses.   Strings are decoded once per snapshot so repeated
+values like parkeys,  match values,  and USEAFTER dates share one object.
+"""
+import os
+import sys
+import mmap
+import struct
+from array import array
+
+from . import rmap, selectors, log
+from . import exceptions as crexc
+
+# ===================================================================
+
+MAGIC = b"CRDSSNAP"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sIIII")    # magic, version, n_strings, n_mappings, n_code
+_ENTRY = struct.Struct("<III")        # name string, code offset, code length
+
+# value tags in the code array
+T_NONE, T_TRUE, T_FALSE, T_STR, T_INT, T_FLOAT, T_TUPLE, T_LIST, T_DICT, T_PARAMS = range(10)
+
+_DICT_ITEMS = type({}.items())
+
+_MAPPING_CLASSES = {
+    "pipeline" : rmap.PipelineContext,
+    "instrument" : rmap.InstrumentContext,
+    "reference" : rmap.ReferenceMapping,
+    }
+
+# ===================================================================
+
+class _Encoder:
+    """Accumulates the interned strings and code of the mappings in a snapshot."""
+    def __init__(self):
+        self.strings = {}
+        self.code = array("i")
+
+    def intern(self, string):
+        """Return the index of `string` in the string table."""
+        return self.strings.setdefault(string, len(self.strings))
+
+    def encode(self, value):
+        """Append the code for `value` to the code array."""
+        code = self.code
+        if value is None:
+            code.append(T_NONE)
+        elif value is True:
+            code.append(T_TRUE)
+        elif value is False:
+            code.append(T_FALSE)
+        elif isinstance(value, str):
+            code.extend((T_STR, self.intern(value)))
+        elif isinstance(value, int):
+            code.extend((T_INT, self.intern(str(value))))
+        elif isinstance(value, float):
+            code.extend((T_FLOAT, self.intern(repr(value))))
+        elif isinstance(value, (tuple, list)):
+            code.extend((T_TUPLE if isinstance(value, tuple) else T_LIST, len(value)))
+            for item in value:
+                self.encode(item)
+        elif isinstance(value, dict):
+            code.extend((T_DICT, len(value)))
+            for key, item in value.items():
+                self.encode(key)
+                self.encode(item)
+        elif isinstance(value, selectors.Parameters):
+            code.extend((T_PARAMS, self.intern(repr(value))))
+            selections = value.selections
+            self.encode(dict(selections) if isinstance(selections, _DICT_ITEMS) else selections)
+        else:
+            raise crexc.CrdsError("Can't snapshot mapping value " + repr(value))
+
+def _closure(mapping):
+    """Return { basename : mapping } for `mapping` and every mapping nested beneath it."""
+    mappings = {mapping.basename : mapping}
+    if isinstance(mapping, rmap.ContextMapping):
+        for nested in mapping.selections.normal_values():
+            mappings.update(_closure(nested))
+    return mappings
+
+def _mapping_text(mapping):
+    """Return the source text of loaded `mapping`."""
+    if os.path.dirname(mapping.filename):
+        path = mapping.filename
+    else:
+        path = rmap.locate_mapping(mapping.filename)
+    with open(path) as handle:
+        return handle.read()
+
+def dumps(mapping):
+    """Return the bytes of a snapshot of loaded `mapping` and all its nested mappings."""
+    encoder = _Encoder()
+    entries = []
+    for name, nested in sorted(_closure(mapping).items()):
+        namespace = rmap.Mapping._load_namespace(_mapping_text(nested), name)
+        declarations = {key : namespace[key] for key in ("header", "selector", "comment") if key in namespace}
+        start = len(encoder.code)
+        encoder.encode(declarations)
+        entries.append((encoder.intern(name), start, len(encoder.code) - start))
+    encoded = [string.encode("utf-8") for string in encoder.strings]
+    offsets = array("I", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    entries.sort(key=lambda entry: entry[0] != encoder.strings[mapping.basename])   # root first
+    code = encoder.code
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        code.byteswap()
+    return b"".join([
+        _HEADER.pack(MAGIC, VERSION, len(encoded), len(entries), len(code)),
+        offsets.tobytes(),
+        b"".join(_ENTRY.pack(*entry) for entry in entries),
+        code.tobytes(),
+        b"".join(encoded),
+        ])
+
+# ===================================================================
+
+class ContextSnapshot:
+    """A read-only memory mapped snapshot from which mappings are loaded on demand."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_strings, n_mappings, n_code = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise crexc.CrdsError("Unsupported context snapshot " + repr(path) +
+                                  " with format " + repr(magic) + " version " + repr(version))
+        view = memoryview(self._mmap)
+        position = _HEADER.size
+        self._offsets = self._array(view, position, n_strings + 1, "I")
+        position += 4 * (n_strings + 1)
+        entries = [_ENTRY.unpack_from(self._mmap, position + i * _ENTRY.size) for i in range(n_mappings)]
+        position += n_mappings * _ENTRY.size
+        self._code = self._array(view, position, n_code, "i")
+        position += 4 * n_code
+        self._blob = view[position:]
+        self._strings = [None] * n_strings
+        self._entries = {self._string(name) : (start, length) for (name, start, length) in entries}
+        self.root = self._string(entries[0][0])
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr(self.path) + ")"
+
+    def __getstate__(self):
+        return dict(path=self.path)
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    @staticmethod
+    def _array(view, position, count, typecode):
+        """Return `count` uint32 or int32 values at `position` of `view`."""
+        values = view[position : position + 4 * count].cast(typecode)
+        if sys.byteorder != "little":
+            values = array(typecode, values)
+            values.byteswap()
+        return values
+
+    def _string(self, index):
+        """Return interned string `index`,  decoding it on first use."""
+        string = self._strings[index]
+        if string is None:
+            string = str(self._blob[self._offsets[index] : self._offsets[index + 1]], "utf-8")
+            self._strings[index] = string
+        return string
+
+    def _decode(self, position):
+        """Return (value encoded at code `position`, position following it)."""
+        code = self._code
+        tag = code[position]
+        if tag == T_STR:
+            return self._string(code[position + 1]), position + 2
+        elif tag == T_DICT:
+            result = {}
+            position += 2
+            for _ in range(code[position - 1]):
+                key, position = self._decode(position)
+                result[key], position = self._decode(position)
+            return result, position
+        elif tag == T_TUPLE or tag == T_LIST:
+            items = []
+            position += 2
+            for _ in range(code[position - 1]):
+                item, position = self._decode(position)
+                items.append(item)
+            return (tuple(items) if tag == T_TUPLE else items), position
+        elif tag == T_PARAMS:
+            selections, after = self._decode(position + 2)
+            return selectors.SELECTORS[self._string(code[position + 1])](selections), after
+        elif tag == T_INT:
+            return int(self._string(code[position + 1])), position + 2
+        elif tag == T_FLOAT:
+            return float(self._string(code[position + 1])), position + 2
+        return {T_NONE : None, T_TRUE : True, T_FALSE : False}[tag], position + 1
+
+    def mapping_names(self):
+        """Return the names of all mappings in the snapshot."""
+        return sorted(self._entries)
+
+    def load_mapping(self, mapping, **keys):
+        """Construct `mapping` from the snapshot,  loading nested mappings from
+        the snapshot as they are demanded.
+        """
+        name = os.path.basename(mapping)
+        log.verbose("Loading mapping", repr(name), "from snapshot", repr(self.path), verbosity=55)
+        try:
+            start, length = self._entries[name]
+        except KeyError:
+            raise crexc.CrdsError("Mapping " + repr(name) + " is not in snapshot " + repr(self.path))
+        declarations, end = self._decode(start)
+        assert end == start + length, "Corrupt context snapshot " + repr(self.path)
+        header, selector, comment = rmap.Mapping._interpret_namespace(declarations)
+        cls = _MAPPING_CLASSES[header["mapping"].lower()]
+        keys["loader"] = self.load_mapping
+        keys["comment"] = comment
+        return cls(name, header, selector, **keys)
+
+def load(path, **keys):
+    """Load the root mapping of the snapshot at `path`."""
+    snapshot = ContextSnapshot(path)
+    return snapshot.load_mapping(snapshot.root, **keys)
+
+# ===================================================================
+
+def test():
+    """Run module doctest."""
+    import doctest
+    from crds.core import snapshot
+    return doctest.testmod(snapshot)
+
+if __name__ == "__main__":
+    print(test())
@@ -5,9 +5,7 @@ a date and time in a sortable string representation (isoformat).
 import datetime
 import re
 
-from astropy.time import Time
-
-from . import config, exceptions, log
+from . import config, exceptions, log, utils
 
 # =======================================================================
 
@@ -29,6 +27,7 @@ def format_date(date, sep=" "):
     return date.isoformat(sep)
 
 T_SEPARATED_DATE_RE = re.compile(r"^\d\d\d\d[-/]\d\d[-/]\d\dT\d\d(:\d\d){1,2}(\.\d{1,6})?$")
+ISO_DATE_RE = re.compile(r"^(\d{4})-(\d\d)-(\d\d)(?:[ T](\d\d):(\d\d)(?::(\d\d(?:\.\d{1,6})?))?)?$")
 ALPHABETICAL_RE = re.compile(r"[A-Za-z]{3,10}")
 ASTROPY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
@@ -58,6 +57,7 @@ def parse_date(date):
     >>> isinstance(dtval, datetime.datetime)
     True
 
+    >>> from astropy.time import Time
     >>> parse_date(Time("1999-12-21T05:42:35"))
     datetime.datetime(1999, 12, 21, 5, 42, 35)
 
@@ -75,9 +75,33 @@ def parse_date(date):
     """
     if isinstance(date, datetime.datetime):
         date = str(date)
-
-    if isinstance(date, Time):
-        date = date.utc.strftime(ASTROPY_TIME_FORMAT)
+    elif not isinstance(date, str):
+        from astropy.time import Time   # deferred,  slow import
+        if isinstance(date, Time):
+            date = date.utc.strftime(ASTROPY_TIME_FORMAT)
+    return _parse_date_str(date)
+
+@utils.xcached(cache=utils.LRUCache(maxsize=10000))
+def _parse_date_str(date):
+    """Parse date-time string `date` into a datetime object,  caching the result
+    since the same dates are parsed repeatedly.
+
+    >>> _parse_date_str('1999-12-21T05:42:35.5')
+    datetime.datetime(1999, 12, 21, 5, 42, 35, 500000)
+
+    >>> _parse_date_str('1999-12-21')
+    datetime.datetime(1999, 12, 21, 0, 0)
+    """
+    match = ISO_DATE_RE.match(date)
+    if match:  # fast path for YYYY-MM-DD[( |T)HH:MM[:SS[.ffffff]]]
+        year, month, day, hour, minute, second = match.groups()
+        if hour is None:
+            return datetime.datetime(int(year), int(month), int(day))
+        second = float(second or "00")
+        isecond = int(second)
+        imicrosecond = int((second-isecond) * 10**6)   # as parse_time()
+        return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute),
+                                 isecond, imicrosecond)
 
     if "UNDEFINED" in date:
         raise exceptions.InvalidDatetimeError(
@@ -507,6 +531,29 @@ def is_datetime(datetime_str):
         raise exceptions.CrdsError(str(exc)) from exc
     return datetime_str
 
+# Standard CRDS dates as formatted by format_date(),  which omits zero microseconds.
+INTEGER_TIMESTAMP_RE = re.compile(r"^(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)(?:\.(?!000000)(\d{6}))?$")
+
+def timestamp_to_int(date):
+    """Convert standard CRDS date `date` to an integer YYYYMMDDhhmmssffffff which
+    orders the same as the date strings do,  else raise ValueError.
+
+    >>> timestamp_to_int('2001-03-21 12:00:00')
+    20010321120000000000
+
+    >>> timestamp_to_int('2001-03-21 12:00:00.000250')
+    20010321120000000250
+
+    >>> timestamp_to_int('2001-03-21T12:00:00')
+    Traceback (most recent call last):
+    ...
+    ValueError: Not a standard CRDS date: '2001-03-21T12:00:00'
+    """
+    match = INTEGER_TIMESTAMP_RE.match(date)
+    if match is None:
+        raise ValueError("Not a standard CRDS date: " + repr(date))
+    fields = match.groups()
+    return int("".join(fields[:6]) + (fields[6] or "000000"))
 
 # ============================================================================
 def reformat_useafter(filename, header):
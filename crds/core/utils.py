@@ -11,7 +11,10 @@ import re
 import hashlib
 import io
 import functools
-from collections import Counter, defaultdict
+import importlib
+from collections import Counter, defaultdict, OrderedDict
+from collections.abc import MutableMapping
+import threading
 import datetime
 import ast
 import gc
@@ -260,6 +263,79 @@ class xcached:
         cached.__doc__ = cached.uncached.__doc__
         return cached
 
+class LRUCache(MutableMapping):
+    """A dictionary which discards its least recently used items when it holds more
+    than `maxsize` items or when the sum of sizeof(value) exceeds `maxbytes`.  Either
+    limit can be a callable,  e.g. a config getter,  evaluated as items are added.
+    Suitable as the `cache` of a @xcached function.
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache["a"] = 1
+    >>> cache["b"] = 2
+    >>> cache["a"]
+    1
+    >>> cache["c"] = 3
+    >>> sorted(cache)
+    ['a', 'c']
+
+    >>> cache = LRUCache(maxsize=10, maxbytes=5, sizeof=len)
+    >>> cache["a"] = "xxx"
+    >>> cache["b"] = "yyy"
+    >>> list(cache), cache.nbytes
+    (['b'], 3)
+    """
+    def __init__(self, maxsize, maxbytes=None, sizeof=sys.getsizeof):
+        self._items = OrderedDict()   # { key : (value, nbytes) }
+        self._maxsize = maxsize
+        self._maxbytes = maxbytes
+        self._sizeof = sizeof
+        self._lock = threading.RLock()
+        self.nbytes = 0
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr({ key : value for (key, (value, _nbytes)) in self._items.items() }) + ")"
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __getitem__(self, key):
+        with self._lock:
+            value, _nbytes = self._items[key]
+            self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        maxsize = self._maxsize() if callable(self._maxsize) else self._maxsize
+        maxbytes = self._maxbytes() if callable(self._maxbytes) else self._maxbytes
+        nbytes = self._sizeof(value) if maxbytes is not None else 0
+        with self._lock:
+            if key in self._items:
+                del self[key]
+            self._items[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while len(self._items) > 1 and (len(self._items) > maxsize or
+                                            (maxbytes is not None and self.nbytes > maxbytes)):
+                _key, (_value, old_nbytes) = self._items.popitem(last=False)
+                self.nbytes -= old_nbytes
+            if maxsize <= 0:
+                self.clear()
+
+    def __delitem__(self, key):
+        with self._lock:
+            _value, nbytes = self._items.pop(key)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
 class CachedFunction:
     """Class to support the @cached function decorator.   Called at runtime
     for typical caching version of function.
@@ -267,8 +343,8 @@ class CachedFunction:
 
     cache_set = set()
 
-    def __init__(self, func, omit_from_key=None):
-        self.cache = dict()
+    def __init__(self, func, omit_from_key=None, cache=None):
+        self.cache = dict() if cache is None else cache
         self.uncached = func
         self.omit_from_key = [] if omit_from_key is None else omit_from_key
         self.cache_set.add(self)
@@ -278,6 +354,8 @@ class CachedFunction:
 
     def cache_key(self, *args, **keys):
         """Compute the cache key for the given parameters."""
+        if not self.omit_from_key:
+            return args + tuple(keys.items())
         args = tuple([ a for (i, a) in enumerate(args) if i not in self.omit_from_key])
         keys = tuple([item for item in keys.items() if item[0] not in self.omit_from_key])
         return args + keys
@@ -285,12 +363,15 @@ class CachedFunction:
     def _readonly(self, *args, **keys):
         """Compute (cache_key, func(*args, **keys)).   Do not add to cache."""
         key = self.cache_key(*args, **keys)
-        if key in self.cache:
-            log.verbose("Cached call", self.uncached.__name__, repr(key), verbosity=80)
-            return key, self.cache[key]
-        else:
-            log.verbose("Uncached call", self.uncached.__name__, repr(key), verbosity=80)
+        try:   # a single lookup,  since other threads can evict key from an LRUCache
+            value = self.cache[key]
+        except KeyError:
+            if log.enabled(80):
+                log.verbose("Uncached call", self.uncached.__name__, repr(key), verbosity=80)
             return key, self.uncached(*args, **keys)
+        if log.enabled(80):
+            log.verbose("Cached call", self.uncached.__name__, repr(key), verbosity=80)
+        return key, value
 
     def readonly(self, *args, **keys):
         """Compute or fetch func(*args, **keys) but do not add to cache.
@@ -304,7 +385,8 @@ class CachedFunction:
         return func(*args, **keys)
         """
         key, result = self._readonly(*args, **keys)
-        self.cache[key] = result
+        if key not in self.cache:
+            self.cache[key] = result
         return result
 
     def __get__(self, obj, objtype):
@@ -315,7 +397,7 @@ def clear_function_caches():
     "Clear all the caches created using @utils.cached or @utils.xcached."""
     for cache_func in CachedFunction.cache_set:
         log.verbose("Clearing cache for", repr(cache_func.uncached), verbosity=80)
-        cache_func.cache = dict()
+        cache_func.cache.clear()
 
 def list_cached_functions():
     """List all the functions supporting caching under @utils.cached or @utils.xcached."""
@@ -848,6 +930,25 @@ def get_object(*args):
         exec(import_cmd, namespace, namespace)
         return namespace[cls]
 
+class LazyModule:
+    """Stand-in for module `name` which imports it on first attribute access,  for
+    heavy dependencies like astropy which many programs importing CRDS never use.
+
+    >>> json = LazyModule("json")
+    >>> json
+    LazyModule('json')
+    >>> json.dumps([1])
+    '[1]'
+    """
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr(self._name) + ")"
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
 # ==============================================================================
 
 DONT_CARE_RE = re.compile(r"^" + r"|".join([
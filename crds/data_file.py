@@ -1,7 +1,7 @@
 """This module defines limited facilities for extracting information from
 reference and datasets,  generally in the form of header dictionaries.
 """
-from crds.core  import utils, log
+from crds.core  import utils, log, config
 
 # =============================================================================
 
@@ -9,6 +9,7 @@ from crds.io.abstract import hijack_warnings, convert_to_eval_header, ensure_key
 from crds.io.factory import file_factory, get_observatory, get_filetype, is_dataset
 from crds.io.geis import is_geis, is_geis_data, is_geis_header, get_conjugate
 from crds.io.fits import fits_open, fits_open_trapped, get_fits_header_union
+from crds.io import header_cache
 
 # import asdf
 # import yaml
@@ -44,7 +45,8 @@ def get_header(filepath, needed_keys=(), original_name=None, observatory=None):
 # A clearer name
 get_unconditioned_header = get_header
 
-@utils.cached
+@utils.xcached(cache=utils.LRUCache(config.HEADER_CACHE_SIZE.get, config.get_header_cache_bytes,
+                                     header_cache.header_nbytes))
 # @utils.gc_collected
 def get_free_header(filepath, needed_keys=(), original_name=None, observatory=None):
     """Return the complete unconditioned header dictionary of a reference file.
@@ -57,13 +59,22 @@ def get_free_header(filepath, needed_keys=(), original_name=None, observatory=No
 
     get_free_header() is a cached function to prevent repeat file reads.
     Although parameters are given default values,  for caching to work correctly
-    even default parameters should be specified positionally.
+    even default parameters should be specified positionally.   The cache keeps
+    the most recently used headers bounded by CRDS_HEADER_CACHE_SIZE and
+    CRDS_HEADER_CACHE_MEGABYTES.   If CRDS_PERSISTENT_HEADER_CACHE is set,
+    headers are also saved on disk for reuse until their files change.
 
     Since get_free_header() is cached,  loading file updates requires first
     clearing the function cache.
     """
-    file_obj = file_factory(filepath, original_name, observatory)
-    header = file_obj.get_header(needed_keys, checksum=False)
+    persistent = header_cache.get_persistent_header_cache()
+    parameters = (tuple(needed_keys), original_name, observatory)
+    header = persistent.get(filepath, parameters) if persistent is not None else None
+    if header is None:
+        file_obj = file_factory(filepath, original_name, observatory)
+        header = file_obj.get_header(needed_keys, checksum=False)
+        if persistent is not None:
+            persistent.put(filepath, parameters, header)
     log.verbose("Header of", repr(filepath), "=", log.PP(header), verbosity=90)
     return header
 
@@ -630,6 +630,9 @@ def dnr_check(header):
     else:
         return False
 
+# Header keywords read by dnr_check() which must be part of rmap lookup cache keys.
+dnr_check.cache_keys = ("DETECTOR", "CCDGAIN")
+
 # ============================================================================
 
 def fits_to_parkeys(header):
@@ -4,13 +4,13 @@ file access in CRDS.
 '''
 from collections.abc import Mapping
 import functools
+import sys
 import warnings
 import re
 
 # ================================================================================================
 
 import datetime
-from astropy.time import Time
 
 # ================================================================================================
 
@@ -22,6 +22,15 @@ from crds.core import exceptions, config, log, utils, timestamp
 
 # ================================================================================================
 
+def _is_astropy_time(value):
+    """Return True IFF `value` is an astropy Time,  without importing astropy.time
+    when no Time can exist yet.
+    """
+    time_module = sys.modules.get("astropy.time")
+    return time_module is not None and isinstance(value, time_module.Time)
+
+# ================================================================================================
+
 DUPLICATES_OK = ["COMMENT", "HISTORY", "NAXIS","EXTNAME","EXTVER"]
 APPEND_KEYS = ["COMMENT", "HISTORY"]
 
@@ -331,7 +340,7 @@ class AbstractFile:
             rval = str(value)
         elif isinstance(value, (list, tuple)):
             rval = tuple(self._simple_type(val) for val in value)
-        elif isinstance(value, (datetime.datetime, Time)):
+        elif isinstance(value, datetime.datetime) or _is_astropy_time(value):
             rval = timestamp.reformat_date(value).replace(" ", "T")
         else:
             rval = "SUPRESSED_NONSTD_TYPE: " + repr(str(value.__class__.__name__))
@@ -9,7 +9,6 @@ import os
 
 # ============================================================================
 
-from astropy.io import fits as pyfits
 
 # ============================================================================
 
@@ -20,6 +19,8 @@ from astropy.io import fits as pyfits
 
 from crds.core import config, utils, constants
 
+pyfits = utils.LazyModule("astropy.io.fits")    # deferred,  slow import
+
 # ============================================================================
 
 def file_factory(filepath, original_name=None, observatory=None):
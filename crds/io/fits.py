@@ -4,6 +4,7 @@ Created on Feb 15, 2017
 @author: jmiller
 '''
 import re
+import math
 
 # ============================================================================
 
@@ -12,15 +13,14 @@ import uuid
 import os
 import io
 
-from astropy.io import fits
-
-import numpy as np
-
 # ============================================================================
 
 from crds.core import config, utils, log
 
-from .abstract import AbstractFile, hijack_warnings
+from .abstract import AbstractFile, hijack_warnings, APPEND_KEYS
+
+fits = utils.LazyModule("astropy.io.fits")    # deferred,  slow import
+np = utils.LazyModule("numpy")
 
 # ============================================================================
 
@@ -69,6 +69,97 @@ def get_fits_header_union(filepath, needed_keys=(), original_name=None, observat
 
 # ============================================================================
 
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+END_CARD = "END" + " " * (CARD_SIZE - 3)
+
+# Keywords scan_fits_header() can match without parsing every card.
+SCANNABLE_KEYWORD_RE = re.compile(r"^[A-Z0-9_-]{1,8}$")
+
+class FitsScanError(Exception):
+    """The headers of a FITS file cannot be scanned without astropy."""
+
+def scan_fits_header(filepath, needed_keys):
+    """Return the (keyword, value) card pairs defining `needed_keys` in all
+    the headers of plain FITS file `filepath`,  in file order.
+
+    Headers are read block by block and data units are skipped by seeking.
+    Only cards defining `needed_keys` are parsed and verified,  so values are
+    the same as those astropy produces.  Scanning stops once every needed key
+    has been found,  unless it is a key like HISTORY whose values accumulate.
+
+    Raises FitsScanError for anything other than a well formed uncompressed
+    FITS file.
+    """
+    needed = {key.upper() for key in needed_keys}
+    remaining = set(needed)
+    exhaustive = needed & set(APPEND_KEYS)
+    union = []
+    with open(filepath, "rb") as handle:
+        primary = True
+        while remaining or exhaustive:
+            images = _read_header_images(handle, primary)
+            if images is None:
+                break
+            for i, image in enumerate(images):
+                keyword = image[:8].strip().upper()
+                if keyword in needed:
+                    continued = i + 1
+                    while continued < len(images) and images[continued][:8] == "CONTINUE":
+                        continued += 1
+                    card = fits.Card.fromstring("".join(images[i:continued]))
+                    card.verify("fix")
+                    union.append((card.keyword, str(card.value)))
+                    remaining.discard(card.keyword)
+            if remaining or exhaustive:
+                handle.seek(_data_size(images, primary), os.SEEK_CUR)
+            primary = False
+    return union
+
+def _read_header_images(handle, primary):
+    """Return the card images of the next header in `handle` excluding END,
+    or None at the end of the file.
+    """
+    images = []
+    while True:
+        block = handle.read(BLOCK_SIZE)
+        if not block and not images and not primary:
+            return None
+        if len(block) != BLOCK_SIZE:
+            raise FitsScanError("Truncated FITS header or missing END.")
+        text = block.decode("latin-1")
+        if not images and not text.startswith("SIMPLE  =" if primary else "XTENSION="):
+            raise FitsScanError("Not a FITS header.")
+        for start in range(0, BLOCK_SIZE, CARD_SIZE):
+            image = text[start:start + CARD_SIZE]
+            if image == END_CARD:
+                return images
+            if image.startswith("END"):
+                raise FitsScanError("Malformed END card.")
+            images.append(image)
+
+def _data_size(images, primary):
+    """Return the padded size of the data unit following the header card `images`."""
+    values = {}
+    for image in images:
+        keyword = image[:8].rstrip()
+        if keyword in ("BITPIX", "GCOUNT", "PCOUNT", "GROUPS") or keyword.startswith("NAXIS"):
+            values[keyword] = image[10:].split("/", 1)[0].strip()
+    try:
+        naxis = int(values["NAXIS"])
+        axes = [int(values["NAXIS" + str(i)]) for i in range(1, naxis + 1)]
+        if primary and values.get("GROUPS") == "T" and axes and axes[0] == 0:
+            axes = axes[1:]   # random groups
+        elif not axes:
+            return 0
+        size = abs(int(values["BITPIX"])) // 8 * int(values.get("GCOUNT", 1)) * \
+            (int(values.get("PCOUNT", 0)) + math.prod(axes))
+    except (KeyError, ValueError) as exc:
+        raise FitsScanError("Can't determine data size: " + str(exc)) from exc
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+# ============================================================================
+
 class FitsFile(AbstractFile):
 
     format = "FITS"
@@ -157,7 +248,16 @@ class FitsFile(AbstractFile):
         """Get the union of keywords from all header extensions of FITS
         file `fname`.  In the case of collisions, keep the first value
         found as extensions are loaded in numerical order.
+
+        When only specific `needed_keys` are requested,  the headers are scanned
+        directly,  falling back to astropy if the scan fails.
         """
+        if self._scannable(needed_keys, keys):
+            try:
+                return scan_fits_header(self.filepath, needed_keys)
+            except Exception as exc:
+                log.verbose("Scanning FITS header of", repr(self.filepath), "failed:", str(exc),
+                            ": using astropy.", verbosity=70)
         union = []
         with fits_open(self.filepath, **keys) as hdulist:
             for hdu in hdulist:
@@ -169,6 +269,13 @@ class FitsFile(AbstractFile):
                     union.append((key, value))
         return union
 
+    def _scannable(self, needed_keys, keys):
+        """Return True IFF the header read for `needed_keys` with fits_open() `keys`
+        can be done by scan_fits_header().
+        """
+        return (config.FITS_SCAN_HEADERS and bool(needed_keys) and not keys.get("checksum") and
+                all(SCANNABLE_KEYWORD_RE.match(str(key).upper()) for key in needed_keys))
+
     def get_array_properties(self, array_name, keytype="A"):
         """Return a Struct defining the properties of the FITS array in extension named `array_name`."""
         with fits_open(self.filepath) as hdulist:
@@ -0,0 +1,117 @@
+"""This module defines the on-disk header cache optionally used by
+crds.data_file.get_free_header() to skip re-reading the headers of files which
+have not changed since an earlier run,  e.g. when repeating crds bestrefs --files
+over the same datasets.
+
+Headers are stored in an sqlite3 database keyed on the absolute file path and the
+header reading parameters.   Each header is only valid while the size and
+modification time of its file are unchanged.
+"""
+import os.path
+import sys
+import pickle
+import sqlite3
+import threading
+
+from crds.core import config, log, utils
+
+# ===================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS headers (
+    path TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    header BLOB NOT NULL,
+    PRIMARY KEY (path, parameters)
+);
+"""
+
+def file_stamp(filepath):
+    """Return a string identifying the current size and modification time of `filepath`."""
+    stat = os.stat(filepath)
+    return str(stat.st_size) + ":" + str(stat.st_mtime_ns)
+
+def header_nbytes(header):
+    """Return the approximate memory used by dictionary `header` in bytes,  including
+    the data of any array values.
+    """
+    nbytes = sys.getsizeof(header)
+    for key, value in header.items():
+        nbytes += sys.getsizeof(key) + sys.getsizeof(value) + getattr(value, "nbytes", 0)
+    return nbytes
+
+class PersistentHeaderCache:
+    """An sqlite3 database of file headers keyed on file path,  header reading parameters,
+    and file size and modification time.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr(self.path) + ")"
+
+    def get(self, filepath, parameters):
+        """Return the saved header of `filepath` read with `parameters`,  or None if there
+        is none or `filepath` has changed since it was saved.
+        """
+        try:
+            stamp = file_stamp(filepath)
+        except OSError:
+            return None
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT stamp, header FROM headers WHERE path = ? AND parameters = ?",
+                (os.path.abspath(filepath), repr(parameters))).fetchone()
+        if row is None or row[0] != stamp:
+            return None
+        log.verbose("Using saved header of", repr(filepath), "from", repr(self.path), verbosity=80)
+        return pickle.loads(row[1])
+
+    def put(self, filepath, parameters, header):
+        """Save `header` of `filepath` read with `parameters`,  replacing any prior header."""
+        try:
+            row = (os.path.abspath(filepath), repr(parameters), file_stamp(filepath),
+                   pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as exc:
+            log.verbose("Not saving header of", repr(filepath), ":", str(exc), verbosity=80)
+            return
+        with self._lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?)", row)
+
+    def clear(self):
+        """Remove all saved headers."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM headers")
+
+@utils.cached
+def _open_header_cache(path):
+    """Return the PersistentHeaderCache at `path`,  or None if it cannot be opened."""
+    try:
+        utils.ensure_dir_exists(path)
+        return PersistentHeaderCache(path)
+    except (OSError, sqlite3.Error) as exc:
+        log.verbose_warning("Can't open header cache", repr(path), ":", str(exc))
+        return None
+
+def get_persistent_header_cache():
+    """Return the PersistentHeaderCache defined by CRDS_PERSISTENT_HEADER_CACHE,  or None
+    if it is disabled or the CRDS cache is readonly.
+    """
+    if not config.PERSISTENT_HEADER_CACHE or config.get_cache_readonly():
+        return None
+    return _open_header_cache(config.get_header_cache_path())
+
+# ===================================================================
+
+def test():
+    import doctest
+    from crds.io import header_cache
+    return doctest.testmod(header_cache)
+
+if __name__ == "__main__":
+    print(test())
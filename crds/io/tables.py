@@ -6,6 +6,7 @@ readonly row acess to each segment.
 
 import os.path
 
+import numpy as np
 from astropy import table
 
 from crds.core import utils, log
@@ -51,37 +52,90 @@ def clear_cache():
 
 
 class SimpleTable:
-    """A simple class to encapsulate astropy tables for basic CRDS readonly table row and colname access."""
+    """A simple class to encapsulate astropy tables for basic CRDS readonly table row and colname access.
+
+    Table data is held as one NumPy array per column,  copied out of FITS files so no file
+    stays open,  and row tuples are only constructed when `rows` is first accessed.
+    """
     def __init__(self, filename, segment=1):
         self.filename = filename
         self.segment = segment
         self.basename = os.path.basename(filename)
-        self._columns = None  # dynamic,  independent of astropy
+        self._rows = None
+        self._groups = {}
         if filename.endswith(".fits"):
-            with data_file.fits_open(filename) as hdus:
+            with data_file.fits_open(filename, memmap=True) as hdus:
                 tab = hdus[segment].data
                 self.colnames = tuple(name.upper() for name in tab.columns.names)
-                self.rows = tuple(tuple(row) for row in tab)   # readonly
+                arrays = tuple(tab.field(name).copy() for name in tab.columns.names)   # release mmap
+                self.nrows = len(tab)
         else:
             tab = table.Table.read(filename)
             self.colnames = tuple(name.upper() for name in tab.columns)
-            self.rows = tuple(tuple(row) for row in tab)   # readonly
+            arrays = tuple(tab[name] for name in tab.columns)
+            self.nrows = len(tab)
+        self._arrays = arrays   # readonly
+        self._columns = dict(zip(self.colnames, arrays))
         log.verbose("Creating", repr(self), verbosity=60)
 
     @property
     def columns(self):
-        """Based on the row tuples,  create columns dict dynamically.  This permits closing astropy Table during __init__.
+        """Returns { colname : column_array, ... }"""
+        return self._columns
+
+    @property
+    def rows(self):
+        """Based on the column arrays,  create and cache the tuple of row tuples.
 
-        Retuns { colname : column, ... }
+        Returns ( (col_value, ...), ... )
         """
-        if self._columns is None:
-            self._columns = dict(list(zip(self.colnames, list(zip(*self.rows)))))
-        return self._columns
+        if self._rows is None:
+            if self._arrays:
+                self._rows = tuple(zip(*[_column_cells(array) for array in self._arrays]))
+            else:
+                self._rows = ((),) * self.nrows
+        return self._rows
+
+    def row(self, index):
+        """Return the tuple of column values for row `index`."""
+        if self._rows is not None:
+            return self._rows[index]
+        return tuple(array[index] for array in self._arrays)
+
+    def column_groups(self, colname):
+        """Group the rows of `colname` by their distinct values,  caching the result.
+
+        Returns (values, inverse) where `values` is the sequence of distinct column
+        values and `inverse` is an integer array mapping each row to its value index.
+        Columns which can't be grouped,  e.g. array valued or masked cells,  yield one
+        group per row.
+        """
+        colname = colname.upper()
+        if colname not in self._groups:
+            column = self._columns[colname]
+            groups = None
+            if column.ndim == 1 and column.dtype.kind not in "OV" and not isinstance(column, np.ma.MaskedArray):
+                try:
+                    values, inverse = np.unique(column, return_inverse=True)
+                    groups = (values, inverse.reshape(-1))
+                except TypeError:
+                    pass
+            if groups is None:
+                groups = (column, np.arange(self.nrows))
+            self._groups[colname] = groups
+        return self._groups[colname]
 
     def __repr__(self):
         return (self.__class__.__name__ + "(" + repr(self.basename) + ", " + repr(self.segment) + ", colnames=" +
-                repr(self.colnames) + ", nrows=" + str(len(self.rows)) + ")")
+                repr(self.colnames) + ", nrows=" + str(self.nrows) + ")")
+
+
 
+def _column_cells(array):
+    """Return the list of cell values of column `array`,  the same values as indexing it."""
+    if isinstance(array, np.char.chararray):
+        return np.char.rstrip(array).tolist()   # chararray indexing strips and returns str/bytes
+    return list(array)
 
 
 def test():
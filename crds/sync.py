@@ -28,12 +28,13 @@ import os.path
 import re
 import shutil
 import glob
+from concurrent.futures import ThreadPoolExecutor
 
 # ============================================================================
 
 import crds
 from crds.core import log, config, utils, rmap, heavy_client, cmdline, crds_cache_locking
-from crds import data_file
+from crds import data_file, uses
 from crds.core.log import srepr
 from crds.client import api
 
@@ -232,6 +233,8 @@ class SyncScript(cmdline.ContextsScript):
                           help='Check cached files against the CRDS database and report anomalies.')
         self.add_argument('-s', '--check-sha1sum', action='store_true', dest='check_sha1sum',
                           help='For --check-files,  also verify file sha1sums.')
+        self.add_argument('--checksum-workers', metavar='N', type=int, default=config.get_checksum_workers(),
+                          help='For --check-sha1sum,  compute N file sha1sums concurrently.  Defaults to CRDS_CHECKSUM_WORKERS or 1.')
         self.add_argument('-r', '--repair-files', action='store_true', dest='repair_files',
                           help='Repair or re-download files noted as bad by --check-files')
         self.add_argument('--purge-rejected', action='store_true', dest='purge_rejected',
@@ -295,6 +298,9 @@ class SyncScript(cmdline.ContextsScript):
             self.args.purge_blacklisted or self.args.purge_rejected):
             self.verify_files(verify_file_list)
 
+        # add newly sync'ed mappings to the crds uses index if one has been built
+        uses.update_uses_index(self.observatory)
+
         # context pickles should only be (re)generated after mappings are fully sync'ed and verified
         if self.args.save_pickles:
             self.pickle_contexts(self.contexts)
@@ -419,6 +425,8 @@ class SyncScript(cmdline.ContextsScript):
         for path in rmap.list_pickles("*.pmap", self.observatory, full_path=True):
             if os.path.exists(path):
                 utils.remove(path, self.observatory)
+        for path in glob.glob(config.locate_snapshot("*.pmap", self.observatory)):
+            utils.remove(path, self.observatory)
 
     def pickle_contexts(self, contexts):
         """Save pickled versions of `contexts` in the CRDS cache.
@@ -576,16 +584,44 @@ class SyncScript(cmdline.ContextsScript):
             return
         bytes_so_far = 0
         total_bytes = api.get_total_bytes(infos)
-        for nth_file, file in enumerate(files):
-            bfile = os.path.basename(file)
-            if infos[bfile] == "NOT FOUND":
-                log.error("CRDS has no record of file", repr(bfile))
-            else:
-                self.verify_file(file, infos[bfile], bytes_so_far, total_bytes, nth_file, len(files))
-                bytes_so_far += int(infos[bfile]["size"])
-
-    def verify_file(self, file, info, bytes_so_far, total_bytes, nth_file, total_files):
-        """Check one `file` against the provided CRDS database `info` dictionary."""
+        workers = max(1, self.args.checksum_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sha1sums = self.start_checksums(executor, files, infos) if workers > 1 else {}
+            try:
+                for nth_file, file in enumerate(files):
+                    bfile = os.path.basename(file)
+                    if infos[bfile] == "NOT FOUND":
+                        log.error("CRDS has no record of file", repr(bfile))
+                    else:
+                        self.verify_file(file, infos[bfile], bytes_so_far, total_bytes, nth_file, len(files),
+                                         sha1sums.get(file))
+                        bytes_so_far += int(infos[bfile]["size"])
+            finally:
+                for future in sha1sums.values():
+                    future.cancel()
+
+    def start_checksums(self, executor, files, infos):
+        """Submit the sha1sums verify_file() will need for `files` to `executor`,  returning
+        { file : future } so that hashing overlaps file I/O and verification.
+        """
+        sha1sums = {}
+        for file in files:
+            info = infos[os.path.basename(file)]
+            if info == "NOT FOUND" or not (self.args.check_sha1sum or config.is_mapping(file)):
+                continue
+            path = config.locate_file(file, observatory=self.observatory)
+            try:
+                if os.stat(path).st_size != int(info["size"]):
+                    continue
+            except OSError:
+                continue
+            sha1sums[file] = executor.submit(utils.checksum, path)
+        return sha1sums
+
+    def verify_file(self, file, info, bytes_so_far, total_bytes, nth_file, total_files, sha1sum=None):
+        """Check one `file` against the provided CRDS database `info` dictionary.
+        `sha1sum` is an optional future for the checksum of `file` computed in the background.
+        """
         path = config.locate_file(file, observatory=self.observatory)
         base = os.path.basename(file)
         n_bytes = int(info["size"])
@@ -608,7 +644,7 @@ class SyncScript(cmdline.ContextsScript):
                                   "CRDS size=" + srepr(info["size"]))
         elif self.args.check_sha1sum or config.is_mapping(base):
             log.verbose("Computing checksum for", repr(base), "of size", repr(size), verbosity=60)
-            sha1sum = utils.checksum(path)
+            sha1sum = sha1sum.result() if sha1sum is not None else utils.checksum(path)
             if info["sha1sum"] == "none":
                 log.warning("CRDS doesn't know the checksum for", repr(base))
             elif info["sha1sum"] != sha1sum:
@@ -17,6 +17,7 @@ reference or mapping file.
 """
 import sys
 import os.path
+import sqlite3
 
 from crds.core import config, cmdline, utils, log, rmap
 
@@ -39,16 +40,130 @@ def mapping_type_names(observatory, ending):
              for (name, mapping) in load_all_mappings(observatory).items()
              if name.endswith(ending) }
 
+# ============================================================================
+
+USES_INDEX_NAME = "uses_index.sqlite3"
+
+_USES_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS uses (used TEXT, user TEXT, PRIMARY KEY (used, user));
+CREATE INDEX IF NOT EXISTS uses_user ON uses (user);
+"""
+
+_USERS_QUERY = """
+WITH RECURSIVE users(name) AS (
+    SELECT user FROM uses WHERE used = ?
+    UNION
+    SELECT uses.user FROM uses JOIN users ON uses.used = users.name
+)
+SELECT name FROM users
+"""
+
+class UsesIndex:
+    """Persistent reverse index from each file to the mappings which directly mention
+    it,  stored as a sqlite3 database in the CRDS config directory.   Only mappings
+    added to or removed from the cache since the last update are loaded or dropped.
+    """
+    def __init__(self, observatory, path):
+        self.observatory = observatory
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript(_USES_INDEX_SCHEMA)
+        self._indexed = None
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr(self.observatory) + ", " + repr(self.path) + ")"
+
+    def update(self):
+        """Index mappings newly added to the cache and forget mappings removed from it.
+        Mappings are never modified once named,  so only their names are compared.
+        """
+        if self._indexed is None:
+            self._indexed = {row[0] for row in self.connection.execute("SELECT name FROM mappings")}
+        cached = set(rmap.list_mappings("*map", self.observatory))
+        added = sorted(cached - self._indexed)
+        removed = sorted(self._indexed - cached)
+        if not added and not removed:
+            return
+        log.verbose("Updating uses index", repr(self.path), "adding", len(added),
+                    "and removing", len(removed), "mappings.")
+        loaded, edges = [], []
+        for name in added:
+            with log.error_on_exception("Failed loading", repr(name)):
+                edges.extend((used, name) for used in _mentioned_files(name))
+                loaded.append(name)
+        with self.connection:
+            for name in removed + loaded:
+                self.connection.execute("DELETE FROM uses WHERE user = ?", (name,))
+            self.connection.executemany("DELETE FROM mappings WHERE name = ?", [(name,) for name in removed])
+            self.connection.executemany("INSERT OR IGNORE INTO mappings VALUES (?)", [(name,) for name in loaded])
+            self.connection.executemany("INSERT OR IGNORE INTO uses VALUES (?, ?)", edges)
+        self._indexed = (self._indexed - set(removed)) | set(loaded)
+
+    def is_indexed(self, mapping):
+        """Return True IFF `mapping` is an indexed mapping in the cache."""
+        return mapping in self._indexed
+
+    def users(self, filename):
+        """Return the set of mappings which mention `filename` directly or through nested mappings."""
+        return {row[0] for row in self.connection.execute(_USERS_QUERY, (filename,))}
+
+def _mentioned_files(mapping):
+    """Return the names of the files which `mapping` refers to directly,  without loading
+    any nested mappings.
+    """
+    loaded = rmap.fetch_mapping(mapping)
+    if isinstance(loaded, rmap.ReferenceMapping):
+        return loaded.reference_names()
+    return sorted({os.path.basename(name) for name in loaded.selector.values() if not rmap.is_special_value(name)})
+
+def locate_uses_index(observatory):
+    """Return the path of the uses index for `observatory` in the CRDS cache."""
+    return config.locate_config(USES_INDEX_NAME, observatory)
+
+@utils.cached
+def _open_uses_index(observatory, path):
+    """Return the UsesIndex for `observatory` at `path`,  falling back to a private
+    in-memory index when the cache is readonly or the database cannot be opened.
+    """
+    if path != ":memory:":
+        try:
+            utils.ensure_dir_exists(path)
+            return UsesIndex(observatory, path)
+        except (OSError, sqlite3.Error) as exc:
+            log.verbose_warning("Can't open uses index", repr(path), ":", str(exc), ": using in-memory index.")
+    return UsesIndex(observatory, ":memory:")
+
+def get_uses_index(observatory):
+    """Return the up-to-date UsesIndex for the mappings in the CRDS cache for `observatory`."""
+    path = ":memory:" if config.get_cache_readonly() else locate_uses_index(observatory)
+    if path != ":memory:" and not os.path.exists(path):   # removed since opened,  start over
+        _open_uses_index.cache.pop(_open_uses_index.cache_key(observatory, path), None)
+    index = _open_uses_index(observatory, path)
+    index.update()
+    return index
+
+def update_uses_index(observatory):
+    """Incrementally update the persistent uses index for `observatory` if it exists,
+    e.g. after new mappings are synced.
+    """
+    if not config.get_cache_readonly() and os.path.exists(locate_uses_index(observatory)):
+        get_uses_index(observatory)
+
+# ============================================================================
+
 def uses_files(files, observatory, ending):
-    """Alternate approach to uses that works by loading all mappings instead of grepping
-    them on the file system.
+    """Return the mappings with names ending in `ending` which refer to any of `files`,
+    directly or through nested mappings,  based on the persistent uses index.
     """
+    index = get_uses_index(observatory)
     referrers = set()
     for filename in files:
         config.check_filename(filename)
-        loaded = mapping_type_names(observatory, ending)
-        for_filename = set(name for name in loaded if filename in loaded[name])
-        referrers |= for_filename
+        referrers |= {name for name in index.users(filename) if name.endswith(ending)}
+        if filename.endswith(ending) and index.is_indexed(filename):
+            referrers.add(filename)
     return sorted(list(referrers))
 
 def _findall_rmaps_using_reference(filename, observatory="hst"):
@@ -67,25 +182,13 @@ def _findall_mappings_using_reference(reference, observatory="hst"):
     """Return the basenames of all mapping files in the hierarchy which
     mentions reference `reference`.
     """
-    mappings = []
-    for rmap in _findall_rmaps_using_reference(reference, observatory):
-        mappings.append(rmap)
-        for imap in _findall_imaps_using_rmap(rmap, observatory):
-            mappings.append(imap)
-            for pmap in _findall_pmaps_using_imap(imap, observatory):
-                mappings.append(pmap)
-    return sorted(list(set(mappings)))
+    return uses_files([reference], observatory, "map")
 
 def _findall_mappings_using_rmap(rmap, observatory="hst"):
     """Return the basenames of all mapping files in the hierarchy which
     mentions reference mapping `rmap`.
     """
-    mappings = []
-    for imap in _findall_imaps_using_rmap(rmap, observatory):
-        mappings.append(imap)
-        for pmap in _findall_pmaps_using_imap(imap, observatory):
-            mappings.append(pmap)
-    return sorted(list(set(mappings)))
+    return sorted(set(uses_files([rmap], observatory, "imap") + uses_files([rmap], observatory, "pmap")))
 
 def uses(files, observatory="hst"):
     """Return the list of mappings which use any of `files`."""
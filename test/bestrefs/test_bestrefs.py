@@ -4,9 +4,9 @@ import re
 import json
 import datetime
 import shutil
-from crds.core import log
+from crds.core import log, config
 from crds.bestrefs import bestrefs as br
-from crds.bestrefs import BestrefsScript
+from crds.bestrefs import BestrefsScript, headers, result_store
 from crds import assign_bestrefs
 from crds.hst.locate import header_to_reftypes as hst_header_to_reftypes
 from crds.tobs.locate import header_to_reftypes as tobs_header_to_reftypes
@@ -138,6 +138,97 @@ def test_bestrefs_3_files_default_context_from_server(default_shared_state, capl
         assert msg.strip() in out
 
 
+@pytest.mark.hst
+@pytest.mark.bestrefs
+def test_bestrefs_jobs_matches_serial(default_shared_state, caplog, hst_data):
+    """Test --jobs produces the same output and status as a serial run."""
+    files = f"""{hst_data}/j8bt05njq_raw.fits {hst_data}/j8bt05njq_raw_broke.fits
+        {hst_data}/j8bt06o6q_raw.fits {hst_data}/j8bt09jcq_raw.fits"""
+    results = []
+    for jobs in ["", "--jobs 2"]:
+        argv = f"""bestrefs.py --new-context hst.pmap --files {files} --print-affected
+            --compare-source-bestrefs --dump-unique-errors {jobs}"""
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="CRDS"):
+            BestrefsScript(argv)()
+            messages = [record.getMessage() for record in caplog.records if "Command:" not in record.getMessage()]
+        results.append((log.status(), messages))
+    assert results[0] == results[1]
+
+
+@pytest.mark.hst
+@pytest.mark.bestrefs
+def test_bestrefs_jobs_fetch_headers_once(default_shared_state, hst_data, tmp_path, monkeypatch):
+    """Test --jobs fetches each dataset header once,  in the parent,  and workers use it."""
+    fetches = tmp_path / "fetches"
+    get_lookup_parameters = headers.HeaderGenerator.get_lookup_parameters
+    def logged_get_lookup_parameters(self, source):
+        with open(fetches, "a") as handle:
+            handle.write(f"{os.getpid()} {source}\n")
+        return get_lookup_parameters(self, source)
+    monkeypatch.setattr(headers.HeaderGenerator, "get_lookup_parameters", logged_get_lookup_parameters)
+    files = f"""{hst_data}/j8bt05njq_raw.fits {hst_data}/j8bt06o6q_raw.fits {hst_data}/j8bt09jcq_raw.fits"""
+    argv = f"""bestrefs.py --new-context hst_0001.pmap --old-context hst.pmap --files {files} --jobs 2"""
+    BestrefsScript(argv)()
+    fetched = [line.split() for line in fetches.read_text().splitlines()]
+    assert {pid for (pid, _source) in fetched} == {str(os.getpid())}
+    assert len(fetched) == 2 * len(files.split())
+
+
+@pytest.mark.hst
+@pytest.mark.bestrefs
+def test_bestrefs_result_store_matches_computed(default_shared_state, caplog, hst_data, tmp_path, monkeypatch):
+    """Test --result-store reuses stored results and produces the same output as computing them."""
+    store_path = str(tmp_path / "bestrefs_results.sqlite3")
+    monkeypatch.setattr(config, "get_bestrefs_result_store_path", lambda: store_path)
+    files = f"""{hst_data}/j8bt05njq_raw.fits {hst_data}/j8bt06o6q_raw.fits {hst_data}/j8bt09jcq_raw.fits"""
+    results = []
+    for store in ["", "--result-store", "--result-store", "--result-store --jobs 2"]:
+        argv = f"""bestrefs.py --new-context hst.pmap --files {files} --print-affected
+            --compare-source-bestrefs {store}"""
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="CRDS"):
+            BestrefsScript(argv)()
+            messages = [record.getMessage() for record in caplog.records if "Command:" not in record.getMessage()]
+        results.append((log.status(), messages))
+    assert results[0] == results[1] == results[2] == results[3]
+    store = result_store.BestrefsResultStore(store_path)
+    assert store.connection.execute("SELECT COUNT(*) FROM bestrefs").fetchone()[0] > 0
+
+
+@pytest.mark.bestrefs
+def test_result_store_get_put(tmp_path):
+    """Test stored bestrefs are returned only for the same context, instrument, and parameters."""
+    store = result_store.BestrefsResultStore(str(tmp_path / "results.sqlite3"))
+    key = result_store.parameters_key({"INSTRUME": "ACS", "DETECTOR": "WFC"}, ["biasfile"])
+    assert store.get("hst_0001.pmap", "acs", key) is None
+    store.put("hst_0001.pmap", "acs", key, {"BIASFILE": "a.fits"})
+    assert store.get("hst_0001.pmap", "ACS", key) == {"BIASFILE": "a.fits"}
+    assert store.get("hst_0002.pmap", "acs", key) is None
+    assert store.get("hst_0001.pmap", "acs",
+        result_store.parameters_key({"INSTRUME": "ACS", "DETECTOR": "HRC"}, ["biasfile"])) is None
+    assert store.get("hst_0001.pmap", "acs",
+        result_store.parameters_key({"INSTRUME": "ACS", "DETECTOR": "WFC"}, ["darkfile"])) is None
+    store.clear()
+    assert store.get("hst_0001.pmap", "acs", key) is None
+
+
+@pytest.mark.hst
+@pytest.mark.bestrefs
+def test_result_store_context_identity(hst_serverless_state, hst_data, tmp_path):
+    """Test a context's stored results identity changes when a mapping file it loads is edited."""
+    path = str(tmp_path / "hst_acs_biasfile.rmap")
+    shutil.copy(f"{hst_data}/hst_acs_biasfile.rmap", path)
+    identity = result_store.context_identity(path)
+    assert identity.startswith("hst_acs_biasfile.rmap@")
+    result_store.context_identity.cache.clear()
+    assert result_store.context_identity(path) == identity
+    os.utime(path, ns=(0, 0))
+    result_store.context_identity.cache.clear()
+    assert result_store.context_identity(path) != identity
+    result_store.context_identity.cache.clear()
+
+
 @pytest.mark.hst
 @pytest.mark.bestrefs
 def test_bestrefs_broken_dataset_file(default_shared_state, caplog, hst_data):
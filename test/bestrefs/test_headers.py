@@ -0,0 +1,102 @@
+"""This tests pipelined dataset header fetching against a local stub JSON-RPC server."""
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from pytest import mark, fixture
+
+from crds.core import utils
+from crds.client import api
+from crds.bestrefs import headers
+
+DATASET_IDS = ["J8BT{:05d}:J8BT{:05d}".format(i, i) for i in range(95)]
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves get_dataset_ids and get_dataset_headers_by_id,  recording the most header RPCs
+    in flight at once.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("localhost", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.header_calls = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        method, params = request["method"], request["params"]
+        if method == "get_dataset_ids":
+            result = DATASET_IDS
+        elif method == "get_dataset_headers_by_id":
+            server = self.server
+            with server.lock:
+                server.header_calls += 1
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            time.sleep(0.05)
+            with server.lock:
+                server.in_flight -= 1
+            result = {dataset_id : {"INSTRUME" : "ACS", "DATA_SET" : dataset_id,
+                                    "DATE-OBS" : "2002-07-18", "TIME-OBS" : "18:09:15"}
+                      for dataset_id in params[1]}
+        body = json.dumps({"result" : result, "error" : None, "id" : request["id"]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@fixture
+def stub_server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    old_url, old_proxy = api.URL, api.S
+    api.set_crds_server("http://localhost:{}".format(server.server_address[1]))
+    try:
+        yield server
+    finally:
+        api.URL, api.S = old_url, old_proxy
+        server.shutdown()
+        server.server_close()
+
+
+@mark.bestrefs
+def test_header_segments_pipelined(stub_server):
+    """Test header segments are generated in order with `workers` RPCs in flight."""
+    segments = list(api.get_dataset_header_segments("hst_0001.pmap", DATASET_IDS, 10, workers=3))
+    assert [list(segment) for segment in segments] == [DATASET_IDS[i:i+10] for i in range(0, 95, 10)]
+    assert stub_server.max_in_flight == 3
+
+
+@mark.bestrefs
+def test_header_segments_serial(stub_server):
+    """Test 0 workers fetches one header segment at a time."""
+    segments = list(api.get_dataset_header_segments("hst_0001.pmap", DATASET_IDS, 10, workers=0))
+    assert [list(segment) for segment in segments] == [DATASET_IDS[i:i+10] for i in range(0, 95, 10)]
+    assert stub_server.max_in_flight == 1
+
+
+@mark.bestrefs
+def test_instrument_header_generator_prefetch(stub_server, monkeypatch):
+    """Test InstrumentHeaderGenerator yields every dataset while prefetching each segment once."""
+    monkeypatch.setenv("CRDS_HEADER_RPC_WORKERS", "3")
+    generator = headers.InstrumentHeaderGenerator(
+        "hst_0001.pmap", ["acs"], None, False, utils.Struct(max_headers_per_rpc=10))
+    sources = []
+    for source in generator:
+        assert generator.get_lookup_parameters(source)["DATA_SET"] == source
+        sources.append(source)
+    assert sources == DATASET_IDS
+    assert stub_server.header_calls == 10
+    assert stub_server.max_in_flight == 3
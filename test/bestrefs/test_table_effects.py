@@ -4,8 +4,9 @@ from pytest import mark
 
 from crds.core import log, utils
 from crds import data_file
+from crds.io import tables
 
-from crds.bestrefs import BestrefsScript
+from crds.bestrefs import BestrefsScript, table_effects
 
 # For log capture tests, need to ensure that the CRDS
 # logger propagates its events.
@@ -107,3 +108,56 @@ def test_table_effects_reprocess_no(default_shared_state, caplog):
     1 sources processed
     0 source updates
     0 errors"""
+
+
+@mark.hst
+@mark.bestrefs
+@mark.table_effects
+def test_table_effects_mode_select(hst_serverless_state, hst_data):
+    """Test: vectorized mode_select() returns the same rows as a row by row scan."""
+    tab = tables.tables(f"{hst_data}/v8q14451j_idc.fits")[0]
+    cmp_equal = (table_effects.cmp_equal, {"wildcards": ["ANY"]})
+    constraints = {
+        "filter1": ("F555W",) + cmp_equal,
+        "filter2": ("CLEAR2L",) + cmp_equal,
+        "detchip": (1,) + cmp_equal,
+    }
+    expected = [row for row in tab.rows
+                if row[2] == "F555W" and row[3] == "CLEAR2L" and row[0] == 1]
+    assert len(expected) == 2
+    assert list(table_effects.mode_select(tab, constraints)) == expected
+    constraints["filter1"] = (["F555W", "F475W"],) + cmp_equal
+    assert len(list(table_effects.mode_select(tab, constraints))) == 4
+
+
+@mark.hst
+@mark.bestrefs
+@mark.table_effects
+def test_table_effects_verdict_cache(hst_serverless_state, hst_data, tmp_path, monkeypatch):
+    """Test: DeepLook verdicts are reused for the same references and modes,  and persist."""
+    old_reference = f"{hst_data}/x2i1559gl_wcp.fits"
+    new_reference = f"{hst_data}/xaf1429el_wcp.fits"
+    table_effects.clear_verdicts()
+
+    def verdict(opt_elem):
+        deep_look = table_effects.DeepLook.from_filekind("stis", "bpixtab")
+        deep_look.are_different({"OPT_ELEM": opt_elem}, old_reference, new_reference)
+        return deep_look.is_different, deep_look.message
+
+    assert verdict("G230L") == (True, "Selection rules have executed and the selected rows are different.")
+    assert verdict("G185M") == (False, "Selection rules have executed and the selected rows are the same.")
+
+    def no_tables(filename):
+        raise AssertionError("tables should not be re-examined")
+    monkeypatch.setattr(tables, "tables", no_tables)
+
+    assert verdict("G230L")[0] is True
+    assert verdict("G185M")[0] is False
+
+    verdicts_file = str(tmp_path / "verdicts.json")
+    table_effects.save_verdicts(verdicts_file)
+    table_effects.clear_verdicts()
+    table_effects.load_verdicts(verdicts_file)
+    assert verdict("G230L")[0] is True
+    assert verdict("G185M")[0] is False
+    table_effects.clear_verdicts()
@@ -5,6 +5,7 @@ import logging
 from metrics_logger.decorators import metrics_logger
 from crds.core import utils, log, exceptions
 from crds import data_file, certify
+from crds.io import tables
 from crds.certify import CertifyScript, generic_tpn, validators, mapping_parser
 
 
@@ -2881,6 +2882,51 @@ def test_table_mode_checks_missing_modes(hst_data):
                             compare_old_reference=True)
 
 
+@mark.hst
+@mark.certify
+def test_table_mode_dictionary_duplicates(tmp_path):
+    from astropy.io import fits
+    filename = str(tmp_path / "modes_tab.fits")
+    fits.BinTableHDU.from_columns([
+        fits.Column(name="OPT_ELEM", format="8A", array=np.array(["G140L", "G130M", "G140L", "G130M"])),
+        fits.Column(name="CENWAVE", format="J", array=np.array([1280, 1300, 1280, 1309])),
+        fits.Column(name="VALUE", format="E", array=np.array([1.0, np.nan, 2.0, 3.0])),
+    ]).writeto(filename)
+    tab = tables.tables(filename)[0]
+    with log.capture_output() as output:
+        modes, all_cols = certify.certify.table_mode_dictionary("new reference", tab, ["OPT_ELEM", "CENWAVE"])
+    assert all_cols == ["OPT_ELEM", "CENWAVE", "VALUE"]
+    assert list(modes) == [
+        (("OPT_ELEM", "G140L"), ("CENWAVE", 1280)),
+        (("OPT_ELEM", "G130M"), ("CENWAVE", 1300)),
+        (("OPT_ELEM", "G130M"), ("CENWAVE", 1309)),
+    ]
+    assert modes[(("OPT_ELEM", "G130M"), ("CENWAVE", 1300))] == (
+        1, (("OPT_ELEM", "G130M"), ("CENWAVE", 1300), ("VALUE", "nan")))
+    assert output.counts[1] == 1
+    assert "Duplicate definitions in new reference 'modes_tab.fits[1]'" in output.records[-1][1]
+    assert "(0, " in output.records[-1][1] and "(2, " in output.records[-1][1]
+
+
+@mark.hst
+@mark.certify
+def test_table_mode_changed_modes(hst_data):
+    old_table = tables.tables(f"{hst_data}/x2i1559gl_wcp.fits")[0]
+    new_table = tables.tables(f"{hst_data}/xaf1429el_wcp.fits")[0]
+    old_modes, _ = certify.certify.table_mode_dictionary("old reference", old_table, ["OPT_ELEM"])
+    new_modes, _ = certify.certify.table_mode_dictionary("new reference", new_table, ["OPT_ELEM"])
+    certifier = certify.certify.ReferenceCertifier.__new__(certify.certify.ReferenceCertifier)
+    changed = certifier.changed_modes(old_table, new_table, old_modes, new_modes)
+    assert changed == {
+        (("OPT_ELEM", "G185M"),): False,
+        (("OPT_ELEM", "G225M"),): False,
+        (("OPT_ELEM", "G285M"),): False,
+        (("OPT_ELEM", "G230L"),): True,
+    }
+    for mode in changed:
+        assert changed[mode] == bool(certifier.compare_row_values(mode, old_modes[mode][1], new_modes[mode][1]))
+
+
 @mark.hst
 @mark.certify
 def test_UnknownCertifier_missing(hst_data):
@@ -0,0 +1,66 @@
+"""This tests the asyncio client API of crds.client.aio with simulated downloads."""
+import os
+import time
+import asyncio
+import threading
+
+from pytest import mark, fixture, raises
+
+from crds.core import exceptions
+from crds.client import api, aio
+
+FILES = ["aio_00{}_drk.fits".format(i) for i in range(4)]
+
+
+@fixture
+def downloads(tmp_path, monkeypatch):
+    """Replace server downloads with slow local writes,  returning the names downloaded."""
+    monkeypatch.setenv("CRDS_PATH", str(tmp_path))
+    monkeypatch.delenv("CRDS_REFPATH", raising=False)
+    monkeypatch.delenv("CRDS_READONLY_CACHE", raising=False)
+    monkeypatch.setattr(api, "get_download_metadata",
+                        lambda: {name : {"size" : 10, "sha1sum" : "none"} for name in FILES})
+    fetched = []
+    lock = threading.Lock()
+    def download(self, name, localpath):
+        with lock:
+            fetched.append(name)
+        time.sleep(0.1)
+        os.makedirs(os.path.dirname(localpath), exist_ok=True)
+        with open(localpath, "wb") as handle:
+            handle.write(b"0123456789")
+    monkeypatch.setattr(api.FileCacher, "download", download)
+    return fetched
+
+
+@mark.core
+@mark.aio
+def test_aio_downloads_deduplicated(downloads):
+    """Test concurrent requests for the same files download each file once."""
+    async def fetch_all():
+        requests = [aio.FileCacher("hst_0001.pmap").get_local_files(FILES[i:] + FILES[:i])
+                    for i in range(len(FILES))]
+        return await asyncio.gather(*requests)
+    results = asyncio.run(fetch_all())
+    assert sorted(downloads) == sorted(FILES)
+    assert sum(n_downloads for (_paths, n_downloads, _bytes) in results) == len(FILES)
+    assert sum(n_bytes for (_paths, _downloads, n_bytes) in results) == 10 * len(FILES)
+    for localpaths, _downloads, _bytes in results:
+        assert localpaths == {name : api.FileCacher("hst_0001.pmap").locate(name) for name in FILES}
+        assert all(os.path.exists(path) for path in localpaths.values())
+
+    # files already cached are not downloaded again
+    assert asyncio.run(aio.FileCacher("hst_0001.pmap").get_local_files(FILES))[1:] == (0, 0)
+    assert len(downloads) == len(FILES)
+
+
+@mark.core
+@mark.aio
+def test_aio_download_failure(downloads):
+    """Test a file unknown to the server raises or is reported as configured."""
+    cacher = aio.FileCacher("hst_0001.pmap")
+    with raises(exceptions.CrdsDownloadError):
+        asyncio.run(cacher.get_local_files(["aio_unknown_drk.fits"]))
+    cacher = aio.FileCacher("hst_0001.pmap", raise_exceptions=False)
+    assert asyncio.run(cacher.get_local_files(["aio_unknown_drk.fits"]))[1:] == (1, 0)
+    assert downloads == []
@@ -1,7 +1,9 @@
 from pytest import mark
 import os
 import re
-from crds.core import log, heavy_client, utils
+import pickle
+import logging
+from crds.core import log, heavy_client, utils, rmap, snapshot
 from crds.core import config as crds_config
 from crds.core.exceptions import *
 from crds.client import api
@@ -233,7 +235,42 @@ def test_pickled_mappings(default_shared_state):
     os.chmod(pickle_file, 0o666)
     heavy_client.remove_pickled_mapping("jwst_0016.pmap")
     assert not os.path.exists(pickle_file)
-    
+
+
+@mark.jwst
+@mark.core
+@mark.heavy_client
+def test_context_snapshots(default_shared_state, monkeypatch, caplog):
+    monkeypatch.setenv("CRDS_USE_CONTEXT_SNAPSHOTS", "1")
+    snapshot_file = crds_config.locate_snapshot("jwst_0016.pmap", "jwst")
+    assert snapshot_file == f"{default_shared_state.cache}/pickles/jwst/jwst_0016.pmap.snap"
+    with caplog.at_level(logging.INFO, logger="CRDS"):
+        p1 = heavy_client.get_pickled_mapping("jwst_0016.pmap", cached=False, use_pickles=True, save_pickles=True)
+        assert os.path.exists(snapshot_file)
+        p2 = heavy_client.load_pickled_mapping("jwst_0016.pmap")
+    assert "Saved context snapshot" in caplog.text
+    assert "Loaded context snapshot" in caplog.text
+    assert "pickled context" not in caplog.text
+    assert p2.name == "jwst_0016.pmap"
+    assert p2.todict() == p1.todict()
+    heavy_client.remove_pickled_mapping("jwst_0016.pmap")
+    assert not os.path.exists(snapshot_file)
+
+
+@mark.jwst
+@mark.core
+@mark.heavy_client
+def test_context_snapshot_roundtrip(default_shared_state, tmp_path):
+    pmap = rmap.load_mapping("jwst_0016.pmap")
+    path = str(tmp_path / "jwst_0016.pmap.snap")
+    with open(path, "wb") as handle:
+        handle.write(snapshot.dumps(pmap))
+    loaded = snapshot.load(path)
+    assert loaded.name == "jwst_0016.pmap"
+    assert loaded.selections.normal_keys() == pmap.selections.normal_keys()
+    assert loaded.todict() == pmap.todict()
+    assert pickle.loads(pickle.dumps(loaded)).todict() == pmap.todict()
+
 
 @mark.jwst
 @mark.core
@@ -0,0 +1,98 @@
+"""Import time regression tests.   Each test runs a fresh Python process and checks
+that importing crds and doing a best references lookup with a warm cache does not
+import heavy dependencies which aren't needed,  e.g. astropy and numpy.
+"""
+from pytest import mark
+import os
+import sys
+import shutil
+import subprocess
+
+from crds.core import rmap
+
+# ==================================================================================
+
+HEAVY_MODULES = [
+    "astropy", "numpy", "asdf", "requests", "multiprocessing",
+    "crds.bestrefs", "crds.certify", "crds.diff", "crds.sync",
+]
+
+def imported_heavy_modules(code, **env):
+    """Run `code` in a new Python configured only by CRDS `env` and return the
+    HEAVY_MODULES it imports.
+    """
+    code += "\nimport sys\nprint(' '.join(sys.modules))\n"
+    environ = {var : value for (var, value) in os.environ.items() if not var.startswith("CRDS_")}
+    environ.update(env)
+    result = subprocess.run([sys.executable, "-c", code], env=environ,
+                            capture_output=True, text=True, check=True)
+    modules = set(result.stdout.split())
+    return [name for name in HEAVY_MODULES if name in modules]
+
+def write_hst_context(cache, hst_data):
+    """Write a context with one ACS darkfile rmap to `cache` and create empty
+    files for its references so that the cache is complete.
+    """
+    mappings = os.path.join(cache, "mappings", "hst")
+    references = os.path.join(cache, "references", "hst", "acs")
+    configs = os.path.join(cache, "config", "hst")
+    for path in [mappings, references, configs]:
+        os.makedirs(path)
+    with open(os.path.join(configs, "server_config"), "w") as handle:
+        handle.write(repr({
+            "observatory" : "hst", "operational_context" : "hst_imports.pmap",
+            "edit_context" : "hst_imports.pmap", "bad_files" : "", "bad_files_list" : [],
+            "force_remote_mode" : False, "crds_version" : {"str" : "11.0"}, "last_synced" : "now",
+            "mappings" : [], "checksum_rmaps_enabled" : False, "reference_url" : {}, "mapping_url" : {},
+        }))
+    with open(os.path.join(mappings, "hst_imports.pmap"), "w") as handle:
+        handle.write("header = {'mapping' : 'PIPELINE', 'name' : 'hst_imports.pmap', "
+                     "'observatory' : 'HST', 'parkey' : ('INSTRUME',), 'derived_from' : 'test'}\n"
+                     "selector = {'ACS' : 'hst_acs_imports.imap'}\n")
+    with open(os.path.join(mappings, "hst_acs_imports.imap"), "w") as handle:
+        handle.write("header = {'mapping' : 'INSTRUMENT', 'name' : 'hst_acs_imports.imap', "
+                     "'instrument' : 'ACS', 'observatory' : 'HST', 'parkey' : ('REFTYPE',), 'derived_from' : 'test'}\n"
+                     "selector = {'darkfile' : 'hst_acs_darkfile_comment.rmap'}\n")
+    shutil.copy(os.path.join(hst_data, "hst_acs_darkfile_comment.rmap"), mappings)
+    for name in rmap.load_mapping(os.path.join(mappings, "hst_acs_darkfile_comment.rmap")).reference_names():
+        open(os.path.join(references, name), "w").close()
+
+
+@mark.core
+@mark.imports
+def test_import_crds_lazy():
+    assert imported_heavy_modules("import crds") == []
+
+
+@mark.hst
+@mark.core
+@mark.imports
+def test_import_crds_getreferences_lazy(hst_data, tmp_path):
+    write_hst_context(str(tmp_path), hst_data)
+    code = """
+import crds
+refs = crds.getreferences(
+    {'INSTRUME' : 'ACS', 'DETECTOR' : 'HRC', 'CCDAMP' : 'ABCD', 'CCDGAIN' : '1.0',
+     'DATE-OBS' : '2002-07-18', 'TIME-OBS' : '18:09:15'},
+    reftypes=['darkfile'], context='hst_imports.pmap', observatory='hst')
+assert refs['darkfile'].endswith('.fits'), refs
+"""
+    assert imported_heavy_modules(
+        code, CRDS_PATH=str(tmp_path), CRDS_MODE="local", CRDS_OBSERVATORY="hst",
+        CRDS_SERVER_URL="https://hst-serverless-mode.stsci.edu",
+        CRDS_IGNORE_MAPPING_CHECKSUM="1") == []
+
+
+@mark.core
+@mark.imports
+def test_simple_type_lazy():
+    code = """
+import datetime
+from crds.io import abstract
+simple = abstract.AbstractFile.__new__(abstract.AbstractFile)._simple_type
+assert simple("a") == "a"
+assert simple(1) == "1"
+assert simple([2.5]) == ("2.5",)
+assert simple(datetime.datetime(2002, 7, 18)).startswith("2002-07-18")
+"""
+    assert imported_heavy_modules(code) == []
@@ -1,4 +1,6 @@
 from crds.core import log, config, crds_cache_locking
+from crds.client import api
+import os
 import logging
 import time
 import multiprocessing
@@ -36,6 +38,22 @@ def try_multiprocessing():
         print(reader.read())
 
 
+def leased_download(paths):
+    """Download a file to `localpath` under its lease,  recording real downloads in `record_path`."""
+    localpath, record_path = paths
+    def download_unleased(name, path):
+        with open(record_path, "a") as record:
+            record.write(str(os.getpid()) + "\n")
+        time.sleep(0.5)
+        with open(path, "w") as output:
+            output.write(name)
+    cacher = api.FileCacher("hst_0001.pmap")
+    cacher.download_unleased = download_unleased
+    cacher.download("x_drk.fits", localpath)
+    with open(localpath) as output:
+        return output.read()
+
+
 @mark.multimission
 @mark.locking
 def test_default_locking(default_shared_state, capsys):
@@ -126,6 +144,57 @@ def test_default_readonly(default_shared_state, capsys):
     
 
 
+@mark.multimission
+@mark.locking
+def test_download_lease_one_download(tmp_path):
+    """Test concurrent processes download a file once and all use it."""
+    paths = (str(tmp_path / "references" / "x_drk.fits"), str(tmp_path / "downloads"))
+    pool = multiprocessing.get_context("fork").Pool(5)
+    try:
+        assert pool.map(leased_download, [paths]*5) == ["x_drk.fits"]*5
+    finally:
+        pool.close()
+    with open(paths[1]) as record:
+        assert len(record.read().split()) == 1
+    assert sorted(os.listdir(tmp_path / "references")) == ["x_drk.fits"]
+
 
+@mark.multimission
+@mark.locking
+def test_download_lease_file_exists(tmp_path):
+    """Test a lease acquired after the file was downloaded skips downloading it again."""
+    paths = (str(tmp_path / "references" / "x_drk.fits"), str(tmp_path / "downloads"))
+    assert leased_download(paths) == "x_drk.fits"
+    with open(api.partial_path(paths[0]), "w") as partial:
+        partial.write("x_")
+    assert leased_download(paths) == "x_drk.fits"
+    with open(paths[1]) as record:
+        assert len(record.read().split()) == 1
+    assert sorted(os.listdir(tmp_path / "references")) == ["x_drk.fits"]
+    assert not crds_cache_locking.CrdsDownloadLease(paths[0]).acquire()
 
 
+@mark.multimission
+@mark.locking
+def test_download_lease_stale(tmp_path):
+    """Test leases of dead owners and idle leases are broken and live leases are not."""
+    path = str(tmp_path / "x_drk.fits")
+    process = multiprocessing.get_context("fork").Process(target=time.sleep, args=(0,))
+    process.start()
+    process.join()
+    dead = crds_cache_locking.CrdsDownloadLease(path)
+    dead.owner = dead.owner.replace(" {} ".format(os.getpid()), " {} ".format(process.pid))
+    assert dead._create()
+    lease = crds_cache_locking.CrdsDownloadLease(path, timeout=60)
+    assert lease.acquire()
+    assert lease._read() == lease.owner
+
+    idle = crds_cache_locking.CrdsDownloadLease(path, timeout=60)
+    assert not idle._is_stale(lease.owner)
+    os.utime(lease.lockname, (time.time() - 120,)*2)
+    assert idle._is_stale(lease.owner)
+    assert idle.acquire()
+    lease.release()   # no longer owned,  not removed
+    assert idle._read() == idle.owner
+    idle.release()
+    assert not os.path.exists(idle.lockname)
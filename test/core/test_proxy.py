@@ -0,0 +1,228 @@
+"""This tests JSON-RPC batching,  compression,  and connection reuse of crds.client.proxy against
+a local stub server.
+"""
+import json
+import gzip
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from pytest import mark, fixture, raises
+
+from crds.core import exceptions
+from crds.client import api, proxy
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves JSON-RPC methods `echo` and `fail`.   If `modern` is set,  batches and gzip
+    compressed requests are accepted and responses are gzip compressed when the client
+    accepts them.   Records the client connections,  requests,  and request encodings.
+    """
+    daemon_threads = True
+
+    def __init__(self, modern):
+        super().__init__(("localhost", 0), StubHandler)
+        self.modern = modern
+        self.batch_status = None
+        self.gzip_status = None
+        self.connections = set()
+        self.requests = []
+        self.encodings = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def do_POST(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        server.encodings.append(self.headers.get("Content-Encoding"))
+        if self.headers.get("Content-Encoding") == "gzip" and server.gzip_status:
+            self.send_error(server.gzip_status, "gzip failed")
+            return
+        if self.headers.get("Content-Encoding") == "gzip" and server.modern:
+            data = gzip.decompress(data)
+        try:
+            body = json.loads(data)
+        except ValueError:
+            self.send_json({"result" : None, "error" : {"code" : -32700, "message" : "Parse error"}, "id" : None})
+            return
+        server.requests.append(body)
+        if isinstance(body, list):
+            if server.batch_status:
+                self.send_error(server.batch_status, "batch failed")
+                return
+            if not server.modern:
+                self.send_error(400, "batches not supported")
+                return
+            self.send_json([self.reply(call) for call in reversed(body)])
+        elif body["method"] == "garbage":
+            self.send_response(200)
+            self.send_header("Content-Length", "9")
+            self.end_headers()
+            self.wfile.write(b"{garbage}")
+        else:
+            self.send_json(self.reply(body))
+
+    def send_json(self, reply):
+        data = json.dumps(reply).encode("utf-8")
+        self.send_response(200)
+        if self.server.modern and "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def reply(self, call):
+        if call["method"] == "fail":
+            return {"result" : None, "error" : {"message" : "failed " + repr(call["params"])}, "id" : call["id"]}
+        return {"result" : call["params"], "error" : None, "id" : call["id"]}
+
+    def log_message(self, *args):
+        pass
+
+
+@fixture(params=[True, False], ids=["modern", "minimal"])
+def stub_server(request):
+    server = StubServer(request.param)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    old_url, old_proxy = api.URL, api.S
+    api.set_crds_server("http://localhost:{}".format(server.server_address[1]))
+    try:
+        yield server
+    finally:
+        api.URL, api.S = old_url, old_proxy
+        proxy._BATCH_UNSUPPORTED.clear()
+        proxy._GZIP_UNSUPPORTED.clear()
+        server.shutdown()
+        server.server_close()
+
+
+@mark.core
+@mark.proxy
+def test_proxy_reuses_connection(stub_server):
+    """Test successive calls are made over one keep-alive connection."""
+    assert [api.S.echo(i) for i in range(5)] == [[i] for i in range(5)]
+    assert len(stub_server.connections) == 1
+
+
+@mark.core
+@mark.proxy
+def test_proxy_batch(stub_server):
+    """Test batched calls return results in order,  in one request when the server supports
+    batches and in separate requests otherwise.
+    """
+    calls = [("echo", (1, 2)), ("echo", {"a" : 3}), ("echo", ("x",))]
+    assert api.call_batch(calls) == [[1, 2], {"a" : 3}, ["x"]]
+    assert api.call_batch(calls) == [[1, 2], {"a" : 3}, ["x"]]
+    if stub_server.modern:
+        assert [len(request) for request in stub_server.requests] == [3, 3]
+    else:   # one rejected batch,  then separate calls only
+        assert isinstance(stub_server.requests[0], list)
+        assert not any(isinstance(request, list) for request in stub_server.requests[1:])
+        assert len(stub_server.requests) == 7
+
+
+@mark.core
+@mark.proxy
+def test_proxy_batch_error(stub_server):
+    """Test a failed call in a batch raises its ServiceError."""
+    with raises(exceptions.ServiceError, match="failed"):
+        api.call_batch([("echo", (1,)), ("fail", (2,))])
+
+
+@mark.core
+@mark.proxy
+def test_proxy_batch_transport_error(stub_server):
+    """Test a batch failing with a server error raises instead of disabling batches."""
+    stub_server.batch_status = 503
+    with raises(exceptions.ServiceError, match="503"):
+        api.call_batch([("echo", (1,)), ("echo", (2,))])
+    stub_server.batch_status = None
+    assert api.call_batch([("echo", (1,)), ("echo", (2,))]) == [[1], [2]]
+    if stub_server.modern:
+        assert isinstance(stub_server.requests[-1], list)
+
+
+@mark.core
+@mark.proxy
+def test_mapping_names_map_batched(stub_server):
+    """Test mapping and reference names of several contexts are fetched in one batch."""
+    contexts = ["hst_0001.pmap", "hst_0002.pmap", "hst_0003.pmap"]
+    assert api.get_mapping_names_map(contexts) == {context : [context] for context in contexts}
+    assert api.get_reference_names_map(contexts) == {context : [context] for context in contexts}
+    if stub_server.modern:
+        assert [len(request) for request in stub_server.requests] == [3, 3]
+
+
+@mark.core
+@mark.proxy
+def test_proxy_gzip_requests(stub_server, monkeypatch):
+    """Test large requests are sent gzip compressed unless the server rejects them."""
+    monkeypatch.setenv("CRDS_JSONRPC_GZIP_MIN_BYTES", "1000")
+    assert api.S.echo("x" * 1000) == ["x" * 1000]
+    assert api.S.echo("x" * 1000) == ["x" * 1000]
+    assert api.S.echo("small") == ["small"]
+    if stub_server.modern:
+        assert stub_server.encodings == ["gzip", "gzip", None]
+    else:   # one rejected request resent uncompressed,  then uncompressed only
+        assert stub_server.encodings == ["gzip", None, None, None]
+
+
+@mark.core
+@mark.proxy
+@mark.parametrize("status, fallback", [(415, True), (503, False)])
+def test_proxy_gzip_rejected(stub_server, monkeypatch, status, fallback):
+    """Test only the HTTP statuses of servers rejecting gzip requests disable compression."""
+    monkeypatch.setenv("CRDS_JSONRPC_GZIP_MIN_BYTES", "1000")
+    stub_server.gzip_status = status
+    if fallback:
+        assert api.S.echo("x" * 1000) == ["x" * 1000]
+        assert stub_server.encodings == ["gzip", None]
+    else:
+        with raises(exceptions.ServiceError, match="503"):
+            api.S.echo("x" * 1000)
+        assert not proxy._GZIP_UNSUPPORTED
+
+
+@mark.core
+@mark.proxy
+def test_proxy_streams_large_responses(stub_server, monkeypatch):
+    """Test compressed responses and responses of CRDS_JSONRPC_STREAM_MIN_BYTES or more are decoded incrementally."""
+    streamed = []
+    load_json_stream = proxy.load_json_stream
+    def spy(chunks, *args):
+        streamed.append(True)
+        return load_json_stream(chunks, *args)
+    monkeypatch.setattr(proxy, "load_json_stream", spy)
+    assert api.S.echo("x" * 1000) == ["x" * 1000]
+    assert streamed == ([True] if stub_server.modern else [])   # gzipped Content-Length is not the decoded size
+    streamed.clear()
+    monkeypatch.setenv("CRDS_JSONRPC_STREAM_MIN_BYTES", "1000")
+    assert api.S.echo("x" * 1000) == ["x" * 1000]
+    assert streamed == [True]
+
+
+@mark.core
+@mark.proxy
+def test_proxy_invalid_response(stub_server, caplog):
+    """Test an invalid JSON response is logged and raises."""
+    with raises(exceptions.ServiceError):
+        api.S.garbage()
+    assert "Invalid CRDS jsonrpc response:\n {garbage}" in caplog.text
+
+
+@mark.core
+@mark.proxy
+def test_load_json_stream_chunks():
+    """Test a JSON response decodes the same however it is split into chunks."""
+    value = {"result" : {"\u00e9.fits" : {"size" : 12345, "sha1sum" : "\u2603" * 10}, "b" : [1.5e10, None, True]},
+             "error" : None, "id" : "1"}
+    text = json.dumps(value, ensure_ascii=False, indent=1).encode("utf-8")
+    for size in range(1, len(text) + 1):
+        chunks = [text[i : i + size] for i in range(0, len(text), size)]
+        for depth in range(4):
+            assert proxy.load_json_stream(chunks, depth) == value
+    with raises(ValueError):
+        proxy.load_json_stream([text[:-1]])
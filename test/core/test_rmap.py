@@ -1,12 +1,14 @@
 """This module tests some of the more complex features of the basic rmap infrastructure.
 """
-from pytest import mark, fixture
+from pytest import mark, fixture, raises
 import os
 import json
+import glob
+import numpy as np
 import pickle
 import sys
 import crds
-from crds import rmap, log, utils
+from crds import rmap, log, utils, selectors, timestamp
 from crds import config as crds_config
 from crds.core.exceptions import *
 import logging
@@ -2123,3 +2125,169 @@ selector = Bracket({
 
     def test_recursive_tear_down(self):
         os.remove(self.result_filename)
+
+
+# ==================================================================================
+
+def _match_selectors(selector):
+    """Yield every MatchSelector nested within `selector`,  including itself."""
+    if isinstance(selector, selectors.MatchSelector):
+        yield selector
+    for choice in selector.choices():
+        if isinstance(choice, selectors.Selector):
+            yield from _match_selectors(choice)
+
+def _match_index_headers(selector):
+    """Generate lookup headers for `selector` exercising literal,  esoteric,  and special values."""
+    keys = list(selector._match_selections)
+    stride = max(1, len(keys) // 20)   # sample large rmaps to bound the run time
+    for k, key in list(enumerate(keys))[::stride]:
+        header = dict(zip(selector._parameters, key))
+        yield header
+        other = keys[(k + 1) % len(keys)]
+        for i, parkey in enumerate(selector._parameters):
+            for value in ("*", "N/A", "UNDEFINED", other[i]):
+                yield dict(header, **{parkey: value})
+            yield {name: value for (name, value) in header.items() if name != parkey}
+
+@mark.core
+@mark.rmap
+@mark.selectors
+def test_match_index_equivalence(default_test_cache_state, test_mappath):
+    """The compiled MatchIndex must produce the same weights and candidate ranking
+    as the original MatchSelector._winnow() for every rmap in the test cache.
+    """
+    rmaps = sorted(glob.glob(os.path.join(test_mappath, "**", "*.rmap"), recursive=True))
+    assert rmaps
+    checked = 0
+    for path in rmaps:
+        try:
+            mapping = rmap.load_mapping(path, ignore_checksum=True)
+        except Exception:
+            continue   # the test cache deliberately contains broken rmaps
+        for selector in _match_selectors(mapping.selector):
+            index = selector.get_match_index()
+            for header in _match_index_headers(selector):
+                expected = selector._rank_candidates(*selector._winnow(header, dict(selector._match_selections)))
+                got = selector._rank_candidates(*index.lookup(header))
+                assert got == expected, (path, header)
+                checked += 1
+    assert checked
+
+
+@mark.hst
+@mark.core
+@mark.rmap
+def test_rmap_get_best_references_batch(default_shared_state, hst_data):
+    r = rmap.get_cached_mapping(f"{hst_data}/hst_acs_darkfile_comment.rmap")
+    header1 = {
+        'CCDAMP': 'ABCD',
+        'CCDGAIN': '1.0',
+        'DARKCORR': 'PERFORM',
+        'DATE-OBS': '2002-07-18',
+        'DETECTOR': 'WFC',
+        'TIME-OBS': '18:09:15.773332'
+    }
+    header2 = dict(header1, **{'DATE-OBS': '2010-01-01', 'TIME-OBS': '00:00:00'})
+    headers = [header1, header2, header1, dict(header1, ROOTNAME='J8BT01A1Q')]
+    expected = [r.get_best_references(utils.condition_header(r.minimize_header(header))) for header in headers]
+    assert r.get_best_references_batch(headers) == expected
+    columns = {key: np.array([header[key] for header in headers]) for key in header1}
+    assert r.get_best_references_batch(columns) == expected[:3] + expected[:1]
+    assert rmap.get_best_references_batch(r, headers) == expected
+
+
+@mark.core
+@mark.rmap
+def test_rmap_lookup_cache(default_shared_state, hst_data):
+    r = rmap.get_cached_mapping(f"{hst_data}/hst_acs_darkfile_comment.rmap")
+    r.clear_lookup_cache()
+    header1 = {
+        'CCDAMP': 'ABCD',
+        'CCDGAIN': '1.0',
+        'DARKCORR': 'PERFORM',
+        'DATE-OBS': '2002-07-18',
+        'DETECTOR': 'WFC',
+        'TIME-OBS': '18:09:15.773332'
+    }
+    header2 = dict(header1, **{'DATE-OBS': '2010-01-01', 'TIME-OBS': '00:00:00'})
+    first = r.get_best_ref(header1)
+    assert r.get_best_ref(dict(header1, ROOTNAME='J8BT01A1Q')) == first
+    second = r.get_best_ref(header2)
+    assert r.lookup_cache_info() == dict(hits=1, misses=2, size=2, maxsize=crds_config.LOOKUP_CACHE_SIZE.get())
+    r.clear_lookup_cache()
+    assert r._get_best_ref_trapped(header1) == first
+    assert r._get_best_ref_trapped(header2) == second
+    assert r.lookup_cache_info()["size"] == 0
+
+
+@mark.core
+@mark.rmap
+def test_mapping_parser_equivalence(default_test_cache_state, test_mappath, test_data, monkeypatch):
+    """Loading with the dedicated mapping parser must produce the same todict() output,
+    or the same error,  as compiling and exec'ing every mapping in the test cache.
+    """
+    paths = sorted(glob.glob(os.path.join(test_mappath, "**", "*.*map"), recursive=True) +
+                   glob.glob(os.path.join(test_data, "**", "*.*map"), recursive=True))
+    assert paths
+
+    def load_all(setting):
+        monkeypatch.setenv("CRDS_USE_MAPPING_PARSER", setting)
+        loaded = {}
+        for path in paths:
+            try:
+                loaded[path] = rmap.load_mapping(path, ignore_checksum=True).todict()
+            except Exception as exc:
+                loaded[path] = repr(exc)
+        return loaded
+
+    assert load_all("1") == load_all("0")
+
+
+@mark.hst
+@mark.core
+@mark.rmap
+def test_rmap_lookup_verbose_logging(default_shared_state, hst_data):
+    r = rmap.get_cached_mapping(f"{hst_data}/hst_acs_darkfile_comment.rmap")
+    header = {
+        'CCDAMP': 'ABCD',
+        'CCDGAIN': '1.0',
+        'DARKCORR': 'PERFORM',
+        'DATE-OBS': '2002-07-18',
+        'DETECTOR': 'HRC',
+        'TIME-OBS': '18:09:15.773332'
+    }
+    old_verbose = log.set_verbose(0)
+    try:
+        with log.capture_output() as quiet:
+            quiet_ref = r._get_best_ref_trapped(header)
+        log.set_verbose(60)
+        with log.capture_output() as verbose:
+            verbose_ref = r._get_best_ref_trapped(header)
+    finally:
+        log.set_verbose(old_verbose)
+    assert quiet_ref == verbose_ref
+    assert quiet.records == []
+    messages = "\n".join(message for (_level, message) in verbose.records)
+    assert "Candidates:" in messages
+    assert "Found bestref 'acs' 'darkfile' = " + repr(verbose_ref) in messages
+
+
+@mark.hst
+@mark.core
+@mark.rmap
+def test_rmap_useafter_bisect(default_shared_state, hst_data):
+    r = rmap.get_cached_mapping(f"{hst_data}/hst_acs_darkfile_comment.rmap")
+    useafter = r.selector.choices()[0]
+    keys = useafter.keys()
+    assert useafter.get_search_keys() == [timestamp.timestamp_to_int(key) for key in keys]
+    assert useafter.bsearch(keys[0]).key == keys[0]
+    assert useafter.bsearch(keys[1] + ".500000").key == keys[1]
+    assert useafter.bsearch("2100-01-01 00:00:00").key == keys[-1]
+    assert useafter.bsearch(keys[1].replace(" ", "T")).key == keys[1]   # unconverted fallback
+    with raises(selectors.UseAfterError):
+        useafter.bsearch("1900-01-01 00:00:00")
+    selectors._reformat_lookup_date.cache.clear()
+    header = {"DATE-OBS" : "2002/07/18", "TIME-OBS" : "18:09:15"}
+    assert useafter.choose(header) == useafter.choose(header)
+    assert list(selectors._reformat_lookup_date.cache.keys()) == [("2002/07/18 18:09:15",)]
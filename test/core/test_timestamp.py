@@ -0,0 +1,37 @@
+from pytest import mark, raises
+import datetime
+
+# ==================================================================================
+
+from crds.core import timestamp
+from crds.core.exceptions import InvalidDatetimeError
+
+# ==================================================================================
+
+
+@mark.core
+@mark.timestamp
+def test_timestamp_parse_date_iso_fast_path():
+    for date in ["1999-12-21", "1999-12-21 05:42", "1999-12-21T05:42:35",
+                 "1999-12-21 05:42:35.123", "1999-12-21T05:42:35.619000"]:
+        assert timestamp._parse_date_str(date) == timestamp.parse_numerical_date(date.replace("T", " "))
+    with raises(ValueError, match="day is out of range for month"):
+        timestamp.parse_date("2003-09-35 01:28:00")
+    with raises(InvalidDatetimeError):
+        timestamp.parse_date("2008-10-15T08:44:44.619 UNDEFINED")
+
+
+@mark.core
+@mark.timestamp
+def test_timestamp_parse_date_cached():
+    timestamp._parse_date_str.cache.clear()
+    assert timestamp.parse_date("12/21/1999 05:42:35") == datetime.datetime(1999, 12, 21, 5, 42, 35)
+    assert timestamp.parse_date(datetime.datetime(1999, 12, 21, 5, 42)) == datetime.datetime(1999, 12, 21, 5, 42)
+    assert list(timestamp._parse_date_str.cache) == [("12/21/1999 05:42:35",), ("1999-12-21 05:42:00",)]
+
+
+@mark.core
+@mark.timestamp
+def test_timestamp_parse_date_astropy_time():
+    from astropy.time import Time
+    assert timestamp.parse_date(Time("1999-12-21T05:42:35.123")) == datetime.datetime(1999, 12, 21, 5, 42, 35)
@@ -1,6 +1,7 @@
-from pytest import mark
+import gzip
+from pytest import mark, raises
 from crds import data_file
-from crds.io import factory
+from crds.io import factory, fits
 
 ARRAY_PROPS = {'SHAPE': (4,),
  'KIND': 'TABLE',
@@ -217,3 +218,33 @@ def test_get_array_properties_extension_number4(hst_serverless_state, hst_data):
                 assert ARRAY_PROPS[k] == v
             else:
                 assert v == names[i]
+
+
+@mark.hst
+@mark.io
+@mark.factory
+def test_fits_scanned_header(hst_serverless_state, hst_data, monkeypatch):
+    filepath = f"{hst_data}/x2i1559gl_wcp.fits"
+    needed_keys = ("INSTRUME", "DETECTOR", "EXTNAME", "NAXIS2", "HISTORY", "MISSING")
+    fits_file = fits.FitsFile(filepath)
+    scanned = fits_file._reduce_header(fits.scan_fits_header(filepath, needed_keys), needed_keys)
+    monkeypatch.setenv("CRDS_FITS_SCAN_HEADERS", "0")
+    astropy_header = fits_file._reduce_header(fits_file.get_raw_header(needed_keys, checksum=False), needed_keys)
+    assert scanned == astropy_header
+    assert scanned["EXTNAME"] == "_WCP"
+    assert scanned["MISSING"] == "UNDEFINED"
+
+
+@mark.hst
+@mark.io
+@mark.factory
+def test_fits_scanned_header_fallback(hst_serverless_state, hst_data, tmp_path):
+    filepath = f"{hst_data}/x2i1559gl_wcp.fits"
+    zipped = str(tmp_path / "x2i1559gl_wcp.fits.gz")
+    with open(filepath, "rb") as source, gzip.open(zipped, "wb") as target:
+        target.write(source.read())
+    with raises(fits.FitsScanError):
+        fits.scan_fits_header(zipped, ("DETECTOR",))
+    zipped_file = fits.FitsFile(zipped)
+    header = zipped_file._reduce_header(zipped_file.get_raw_header(("DETECTOR",), checksum=False), ("DETECTOR",))
+    assert header == {"DETECTOR": "NUV"}
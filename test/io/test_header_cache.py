@@ -0,0 +1,66 @@
+import os
+import shutil
+
+from pytest import mark
+
+from crds import data_file
+from crds.core import utils
+from crds.io import header_cache
+
+
+@mark.hst
+@mark.io
+@mark.header_cache
+def test_header_cache_bounded(hst_serverless_state, hst_data, monkeypatch):
+    monkeypatch.setenv("CRDS_HEADER_CACHE_SIZE", "2")
+    data_file.clear_header_cache()
+    for name in ["s7g1700gl_dead.fits", "x2i1559gl_wcp.fits", "xaf1429el_wcp.fits"]:
+        data_file.get_free_header(f"{hst_data}/{name}", (), None, "hst")
+    assert len(data_file.get_free_header.cache) == 2
+    assert (f"{hst_data}/s7g1700gl_dead.fits", (), None, "hst") not in data_file.get_free_header.cache
+    monkeypatch.setenv("CRDS_HEADER_CACHE_MEGABYTES", "0")
+    data_file.get_free_header(f"{hst_data}/s7g1700gl_dead.fits", (), None, "hst")
+    assert len(data_file.get_free_header.cache) == 1
+    data_file.clear_header_cache()
+    assert data_file.get_free_header.cache.nbytes == 0
+
+
+@mark.hst
+@mark.io
+@mark.header_cache
+def test_header_cache_persistent(hst_serverless_state, hst_data, tmp_path, monkeypatch):
+    monkeypatch.setenv("CRDS_PERSISTENT_HEADER_CACHE", "1")
+    monkeypatch.setenv("CRDS_CFGPATH", str(tmp_path / "config"))
+    fits_path = str(tmp_path / "dead.fits")
+    shutil.copy(f"{hst_data}/s7g1700gl_dead.fits", fits_path)
+    data_file.clear_header_cache()
+    header = data_file.get_free_header(fits_path, (), None, "hst")
+    assert os.path.exists(str(tmp_path / "config" / "header_cache.sqlite3"))
+
+    def no_reads(*args, **keys):
+        raise AssertionError("header should come from the persistent cache")
+
+    data_file.clear_header_cache()
+    with monkeypatch.context() as patches:
+        patches.setattr(data_file, "file_factory", no_reads)
+        assert data_file.get_free_header(fits_path, (), None, "hst") == header
+
+    data_file.clear_header_cache()
+    stat = os.stat(fits_path)
+    os.utime(fits_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert header_cache.get_persistent_header_cache().get(fits_path, ((), None, "hst")) is None
+    assert data_file.get_free_header(fits_path, (), None, "hst") == header
+    data_file.clear_header_cache()
+
+
+@mark.io
+@mark.header_cache
+def test_cached_function_concurrent_eviction():
+    """Test a key evicted from an LRUCache by another thread during lookup is recomputed."""
+    class EvictingCache(utils.LRUCache):
+        def __getitem__(self, key):
+            self.clear()   # as if evicted by another thread
+            return super().__getitem__(key)
+    double = utils.CachedFunction(lambda x: x * 2, cache=EvictingCache(maxsize=10))
+    assert double(2) == 4
+    assert double(2) == 4
@@ -1,3 +1,6 @@
+import os
+import warnings
+
 from pytest import mark
 from crds.io import tables
 
@@ -39,3 +42,36 @@ def test_csv_table(hst_serverless_state, hst_data):
     assert tab.columns['OBSID'][0] == 3102
     expected = "SimpleTable('ascii_tab.csv', 1, colnames=('OBSID', 'REDSHIFT', 'X', 'Y', 'OBJECT'), nrows=2)"
     assert str(tab) == expected
+
+
+@mark.hst
+@mark.io
+@mark.tables
+def test_table_column_groups(hst_serverless_state, hst_data):
+    FITS_FILE = f"{hst_data}/v8q14451j_idc.fits"
+    tab = tables.tables(FITS_FILE)[0]
+    assert tab.nrows == len(tab.rows) == 694
+    values, inverse = tab.column_groups("filter1")
+    assert len(inverse) == tab.nrows
+    assert sorted(set(tab.columns["FILTER1"])) == sorted(values)
+    for i in range(0, tab.nrows, 50):
+        assert values[inverse[i]] == tab.rows[i][2]
+        assert tab.row(i) == tab.rows[i]
+    assert tab.column_groups("FILTER1") is tab.column_groups("filter1")
+
+
+@mark.hst
+@mark.io
+@mark.tables
+@mark.skipif(not os.path.isdir("/proc/self/fd"), reason="requires /proc/self/fd")
+def test_tables_release_files(hst_serverless_state, hst_data):
+    """Test cached tables hold no open files."""
+    tables.clear_cache()
+    open_fds = len(os.listdir("/proc/self/fd"))
+    for name in sorted(os.listdir(hst_data)):
+        if name.endswith(".fits"):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                tables.tables(os.path.join(hst_data, name))
+    assert len(os.listdir("/proc/self/fd")) <= open_fds
+    tables.clear_cache()
@@ -1,7 +1,11 @@
 from pytest import mark, fixture
 import os
+import threading
+import functools
+from http import server
 import crds
-from crds.core import config, rmap
+from crds.core import config, log, rmap, utils
+from crds.client import api
 from crds.sync import SyncScript
 
 
@@ -131,3 +135,76 @@ class TestSync:
 
     def test_sync_dataset_ids(self):
         self.run_script("crds.sync --contexts hst.pmap --dataset-ids LA9K03CBQ:LA9K03CBQ --fetch-references")
+
+
+@fixture
+def hst_data_server(hst_data):
+    """Serve the HST test data directory over HTTP on an arbitrary local port."""
+    handler = functools.partial(server.SimpleHTTPRequestHandler, directory=hst_data)
+    httpd = server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@mark.hst
+@mark.sync
+def test_download_files_parallel(hst_temp_cache_state, hst_data, hst_data_server, monkeypatch):
+    names = ["hst_cos_deadtab.rmap", "hst_acs_darkfile.rmap", "hst_acs_biasfile.rmap", "hst_cos_bpixtab.rmap"]
+    metadata = {
+        name: dict(size=str(os.path.getsize(os.path.join(hst_data, name))),
+                   sha1sum=utils.checksum(os.path.join(hst_data, name)))
+        for name in names
+    }
+    metadata["hst_cos_bpixtab.rmap"]["sha1sum"] = "0" * 40
+    monkeypatch.setattr(api, "get_download_metadata", lambda: metadata)
+    monkeypatch.setenv("CRDS_MAPPING_URI", hst_data_server)
+    monkeypatch.setenv("CRDS_DOWNLOAD_WORKERS", "3")
+    cacher = api.FileCacher("hst.pmap", raise_exceptions=False)
+    localpaths = {name: cacher.locate(name) for name in names}
+    n_bytes = cacher.download_files(names, localpaths)
+    good = names[:-1]
+    assert n_bytes == sum(int(metadata[name]["size"]) for name in good)
+    for name in good:
+        assert utils.checksum(localpaths[name]) == metadata[name]["sha1sum"]
+    assert not os.path.exists(localpaths["hst_cos_bpixtab.rmap"])
+
+
+@mark.hst
+@mark.sync
+def test_download_resumes_partial_file(hst_temp_cache_state, hst_data, hst_data_server, monkeypatch):
+    name = "hst_acs_biasfile.rmap"
+    original = os.path.join(hst_data, name)
+    metadata = {name: dict(size=str(os.path.getsize(original)), sha1sum=utils.checksum(original))}
+    monkeypatch.setattr(api, "get_download_metadata", lambda: metadata)
+    monkeypatch.setenv("CRDS_MAPPING_URI", hst_data_server)
+    cacher = api.FileCacher("hst.pmap", raise_exceptions=False)
+    localpath = cacher.locate(name)
+    utils.ensure_dir_exists(localpath)
+    with open(original, "rb") as infile, open(api.partial_path(localpath), "wb") as partial:
+        partial.write(infile.read(1000))
+    assert cacher.download_files([name], {name: localpath}) == int(metadata[name]["size"])
+    assert utils.checksum(localpath) == metadata[name]["sha1sum"]
+    assert not os.path.exists(api.partial_path(localpath))
+
+
+@mark.hst
+@mark.sync
+def test_verify_files_parallel_checksums(hst_temp_cache_state, hst_data, monkeypatch):
+    names = ["hst_cos_deadtab.rmap", "hst_acs_darkfile.rmap", "hst_acs_biasfile.rmap"]
+    infos = {}
+    for name in names:
+        original = os.path.join(hst_data, name)
+        infos[name] = dict(size=str(os.path.getsize(original)), sha1sum=utils.checksum(original),
+                           rejected="false", blacklisted="false", state="operational")
+        localpath = config.locate_file(name, "hst")
+        utils.ensure_dir_exists(localpath)
+        with open(original, "rb") as infile, open(localpath, "wb") as outfile:
+            outfile.write(infile.read())
+    infos["hst_acs_biasfile.rmap"]["sha1sum"] = "0" * 40
+    monkeypatch.setattr(api, "get_file_info_map", lambda observatory, files, fields: infos)
+    script = SyncScript("crds.sync --check-sha1sum --checksum-workers 3")
+    script.verify_files(names)
+    assert log.errors() == 1
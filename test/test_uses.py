@@ -1,10 +1,14 @@
 """This module contains doctests and unit tests which exercise the crds.uses
 module that identifies mappings that reference a file.
 """
+import os
+import shutil
+
 from pytest import mark
 
-from crds.core import log
+from crds.core import config, log
 
+from crds import uses
 from crds.uses import UsesScript
 
 # For log capture tests, need to ensure that the CRDS
@@ -93,3 +97,27 @@ def test_uses_imap(hst_shared_cache_state, capsys):
     """
     for msg in expected.splitlines():
         assert msg.strip() in out
+
+
+@mark.hst
+@mark.uses
+def test_uses_index_incremental(hst_temp_cache_state, hst_data):
+    """Test the persistent uses index picks up added and removed mappings"""
+
+    def add_mapping(name):
+        path = config.locate_mapping(name, "hst")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy(os.path.join(hst_data, name), path)
+        return path
+
+    for name in ["hst.pmap", "hst_cos.imap", "hst_cos_flatfile.rmap"]:
+        add_mapping(name)
+    assert uses.uses(["v2e20129l_flat.fits"], "hst") == ["hst.pmap", "hst_cos.imap", "hst_cos_flatfile.rmap"]
+    assert uses.uses(["hst_cos_flatfile.rmap"], "hst") == ["hst.pmap", "hst_cos.imap"]
+    assert os.path.exists(uses.locate_uses_index("hst"))
+
+    assert uses.uses(["hst_acs_darkfile.rmap"], "hst") == []
+    path = add_mapping("hst_acs.imap")
+    assert uses.uses(["hst_acs_darkfile.rmap"], "hst") == ["hst.pmap", "hst_acs.imap"]
+    os.remove(path)
+    assert uses.uses(["hst_acs_darkfile.rmap"], "hst") == []